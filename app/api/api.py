@@ -1,10 +1,15 @@
-# app/api/api.py
-
-from fastapi import APIRouter
-from app.api.endpoints import videos, jobs, overlays, video_versions
-
-api_router = APIRouter()
-api_router.include_router(videos.router)
-api_router.include_router(jobs.router)
-api_router.include_router(overlays.router)
-api_router.include_router(video_versions.router)
\ No newline at end of file
+# app/api/api.py
+
+from fastapi import APIRouter
+from app.api.endpoints import videos, jobs, overlays, video_versions, uploads, streaming, cache, pipelines, previews
+
+api_router = APIRouter()
+api_router.include_router(videos.router)
+api_router.include_router(jobs.router)
+api_router.include_router(overlays.router)
+api_router.include_router(video_versions.router)
+api_router.include_router(uploads.router)
+api_router.include_router(streaming.router)
+api_router.include_router(cache.router)
+api_router.include_router(pipelines.router)
+api_router.include_router(previews.router)
\ No newline at end of file
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.dependencies import get_db
+from app.schemas.cache import CacheStatsResponse
+from app.utils.artifacts import cache_stats
+
+router = APIRouter(
+    prefix="/cache",
+    tags=["cache"]
+)
+
+@router.get("/stats", response_model=CacheStatsResponse, summary="Derived-artifact cache usage and hit/miss counters")
+def get_cache_stats(db: Session = Depends(get_db)):
+    return cache_stats(db)
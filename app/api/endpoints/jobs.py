@@ -1,65 +1,261 @@
-import os
-from pathlib import Path
-from fastapi import APIRouter, Depends, status, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from app.dependencies import get_db
-from app.models.models import Job, JobStatus
-from app.schemas.job import JobResponse
-
-# Define the project root to correctly build file paths
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-
-router = APIRouter(
-    prefix="/jobs",
-    tags=["jobs"]
-)
-
-@router.get(
-    "/{job_id}",
-    response_model=JobResponse,
-    summary="Get the status of a specific job"
-)
-def get_job_status(
-    job_id: int,
-    db: Session = Depends(get_db)
-):
-    job = db.query(Job).filter(Job.id == job_id).first()
-    if not job:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Job not found"
-        )
-    return job
-
-@router.get(
-    "/{job_id}/result",
-    summary="Get the result of a completed job"
-)
-def get_job_result(
-    job_id: int,
-    db: Session = Depends(get_db)
-):
-    job = db.query(Job).filter(Job.id == job_id).first()
-    if not job:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Job not found."
-        )
-
-    if job.status != JobStatus.done:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Job status is '{job.status.value}', not 'done'."
-        )
-    
-    # Construct the absolute path
-    file_path = PROJECT_ROOT / job.output_file
-
-    if not job.output_file or not os.path.exists(file_path):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Processed file not found."
-        )
-
-    return FileResponse(path=file_path, media_type="video/mp4", filename=os.path.basename(file_path))
+import asyncio
+import os
+from pathlib import Path
+from fastapi import APIRouter, Depends, Query, Request, status, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_async_db, get_client_id
+from typing import List
+from app.crud.job import enqueue_jobs, package_job_fields, quality_export_job_fields, request_cancel, trim_job_fields
+from app.models.models import Job, JobStatus, Video, VideoVersion
+from app.schemas.job import MAX_BATCH_JOBS, BatchJobCreate, BatchPackageJob, BatchTrimJob, JobResponse
+from app.schemas.quality_export import VideoVersionResponse
+from app.utils.admission import admit_jobs_async
+from app.utils.ffmpeg import video_file_path
+from app.utils.file_response import file_response
+from app.utils.job_events import FINAL_STATUSES, format_sse, job_event, job_events
+from app.utils.metadata_cache import cached_response, json_entry
+
+# Define the project root to correctly build file paths
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Seconds between keep-alive comments on an idle event stream
+EVENT_KEEPALIVE_SECONDS = 15
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+async def _job_event_stream(request: Request, snapshot: list[dict], queue: asyncio.Queue):
+    try:
+        open_jobs = set()
+        for payload in snapshot:
+            yield format_sse(payload)
+            if payload["status"] not in FINAL_STATUSES:
+                open_jobs.add(payload["id"])
+
+        while open_jobs:
+            if await request.is_disconnected():
+                break
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if payload["id"] not in open_jobs:
+                continue
+            yield format_sse(payload)
+            if payload["status"] in FINAL_STATUSES:
+                open_jobs.discard(payload["id"])
+    finally:
+        job_events.unsubscribe(queue)
+
+async def _get_job(db: AsyncSession, job_id: int) -> Job:
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found."
+        )
+    return job
+
+async def _stream_job_events(request: Request, job_ids: list[int], db: AsyncSession) -> StreamingResponse:
+    # Subscribe before reading the current state so no transition is missed
+    queue = job_events.subscribe(job_ids)
+    try:
+        jobs = (await db.scalars(select(Job).where(Job.id.in_(job_ids)).order_by(Job.id))).all()
+        snapshot = [job_event(job) for job in jobs]
+    except Exception:
+        job_events.unsubscribe(queue)
+        raise
+    finally:
+        await db.close() # Don't hold a pooled connection for the life of the stream
+
+    missing = set(job_ids) - {payload["id"] for payload in snapshot}
+    if missing:
+        job_events.unsubscribe(queue)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Jobs not found: {sorted(missing)}"
+        )
+
+    return StreamingResponse(
+        _job_event_stream(request, snapshot, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get(
+    "/",
+    response_model=List[JobResponse],
+    summary="Get the status of several jobs"
+)
+async def get_jobs_status(
+    ids: List[int] = Query(..., max_length=MAX_BATCH_JOBS, description="Job ids, e.g. ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Returns the jobs that exist among `ids`, ordered by id, from a single query."""
+    return (await db.scalars(select(Job).where(Job.id.in_(set(ids))).order_by(Job.id))).all()
+
+@router.post(
+    "/batch",
+    response_model=List[JobResponse],
+    status_code=status.HTTP_201_CREATED,
+    summary="Create many trim, quality export and package jobs at once"
+)
+async def create_jobs_batch(
+    batch: BatchJobCreate,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    """
+    Checks every job against one query for all the videos involved, then
+    inserts them in a single statement. Nothing is created when any job is
+    invalid; the 422 response lists the problems by the job's index, and a
+    batch that doesn't fit in the queues is refused whole with 429. Jobs
+    are returned in the order they were given.
+    """
+    video_ids = {spec.video_id for spec in batch.jobs}
+    videos = {
+        video.id: video
+        for video in await db.execute(
+            select(Video.id, Video.filename, Video.original_video_id).where(Video.id.in_(video_ids))
+        )
+    }
+
+    errors = []
+    jobs = []
+    for index, spec in enumerate(batch.jobs):
+        video = videos.get(spec.video_id)
+        if not video:
+            errors.append({"index": index, "detail": f"Video {spec.video_id} not found."})
+        elif isinstance(spec, BatchTrimJob):
+            if spec.start_time >= spec.end_time:
+                errors.append({"index": index, "detail": "start_time must be less than end_time."})
+            else:
+                jobs.append(trim_job_fields(video, spec, video_file_path(video)))
+        elif isinstance(spec, BatchPackageJob):
+            jobs.append(package_job_fields(video.id))
+        else:
+            jobs.append(quality_export_job_fields(video.id, spec))
+
+    if errors:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+
+    await admit_jobs_async(db, client_id, [job["job_type"] for job in jobs])
+    return await enqueue_jobs(db, [{**job, "client_id": client_id} for job in jobs])
+
+@router.get(
+    "/events",
+    summary="Stream status and progress of several jobs (Server-Sent Events)"
+)
+async def stream_jobs_events(
+    request: Request,
+    ids: List[int] = Query(..., description="Job ids, e.g. ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Sends the current state of every job, then one `job` event per status or
+    progress change, and ends once all the jobs are done, failed or cancelled.
+    """
+    return await _stream_job_events(request, list(dict.fromkeys(ids)), db)
+
+@router.get(
+    "/{job_id}",
+    response_model=JobResponse,
+    summary="Get the status of a specific job"
+)
+async def get_job_status(
+    job_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Served from the metadata cache, with an ETag for conditional requests.
+    A finished job can't change any more and is cacheable indefinitely.
+    """
+    async def build():
+        job = await _get_job(db, job_id)
+        settled = job.status.value in FINAL_STATUSES and job.completed_at is not None
+        return json_entry(JobResponse, job, settled=settled)
+
+    return await cached_response(request, ("job", job_id), ("jobs",), build)
+
+@router.post(
+    "/{job_id}/cancel",
+    response_model=JobResponse,
+    summary="Cancel a queued or running job"
+)
+async def cancel_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    A queued job is cancelled right away. A running job is stopped by its
+    worker within JOB_WATCHDOG_INTERVAL: its FFmpeg processes are terminated,
+    their partial output removed and the job marked cancelled. Until then it
+    stays processing, with `cancel_requested_at` set.
+    """
+    job = await _get_job(db, job_id)
+    cancelled = await request_cancel(db, job_id)
+    if not cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job status is '{job.status.value}', it can no longer be cancelled."
+        )
+    # Its event reaches the stream through the job event hub (NOTIFY or polling)
+    return cancelled
+
+@router.get(
+    "/{job_id}/events",
+    summary="Stream status and progress of a job (Server-Sent Events)"
+)
+async def stream_job_events(
+    job_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _stream_job_events(request, [job_id], db)
+
+@router.api_route(
+    "/{job_id}/result",
+    methods=["GET", "HEAD"],
+    summary="Get the result of a completed job"
+)
+async def get_job_result(
+    job_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    job = await _get_job(db, job_id)
+
+    if job.status != JobStatus.done:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job status is '{job.status.value}', not 'done'."
+        )
+    
+    # Construct the absolute path
+    file_path = PROJECT_ROOT / job.output_file
+
+    if not job.output_file or not os.path.exists(file_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Processed file not found."
+        )
+
+    return file_response(request, file_path, filename=os.path.basename(file_path))
+
+@router.get(
+    "/{job_id}/versions",
+    response_model=List[VideoVersionResponse],
+    summary="List the video versions (renditions) produced by a job"
+)
+async def get_job_versions(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _get_job(db, job_id)
+    return (await db.scalars(select(VideoVersion).where(VideoVersion.job_id == job_id).order_by(VideoVersion.id))).all()
\ No newline at end of file
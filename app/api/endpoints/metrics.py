@@ -0,0 +1,11 @@
+# app/api/endpoints/metrics.py
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus metrics of this API process (job stage metrics are served by each worker)."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,86 +1,284 @@
-# app/api/endpoints/overlays.py
-
-import os
-import shutil
-from pathlib import Path
-from fastapi import APIRouter, Depends, status, BackgroundTasks, HTTPException, UploadFile, Form
-from sqlalchemy.orm import Session
-from app.dependencies import get_db
-from app.models.models import Video, Job, JobType, JobStatus, OverlayType
-from app.schemas.overlay import OverlayCreate, OverlayResponse, OverlayPosition
-from app.schemas.job import JobResponse
-from app.crud.overlay import create_overlay
-from app.utils.ffmpeg import add_overlay_in_background
-
-# This folder is for the raw overlay files (images, videos)
-OVERLAY_MEDIA_FOLDER = Path("overlays_media")
-OVERLAY_MEDIA_FOLDER.mkdir(exist_ok=True)
-
-router = APIRouter(
-    prefix="/overlays",
-    tags=["overlays"]
-)
-
-@router.post(
-    "/{video_id}",
-    response_model=JobResponse,
-    status_code=status.HTTP_201_CREATED,
-    summary="Create an overlay job for a video"
-)
-def create_overlay_job(
-    video_id: int,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-    overlay_type: OverlayType = Form(...),
-    position: OverlayPosition = Form(...),
-    start_time: float = Form(...),
-    end_time: float = Form(...),
-    content: str | None = Form(None),
-    font_name: str | None = Form(None), # <-- NEW PARAMETER
-    overlay_file: UploadFile | None = None
-):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found.")
-
-    overlay_content = None
-    if overlay_type == OverlayType.text:
-        if not content:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Content is required for text overlay.")
-        overlay_content = content
-    elif overlay_type in [OverlayType.image, OverlayType.watermark, OverlayType.video]:
-        if not overlay_file:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="An overlay file is required.")
-        
-        file_extension = os.path.splitext(overlay_file.filename)[1]
-        overlay_filename = f"overlay_{video_id}_{overlay_type.value}{file_extension}"
-        overlay_path = OVERLAY_MEDIA_FOLDER / overlay_filename
-        
-        with open(overlay_path, "wb") as buffer:
-            shutil.copyfileobj(overlay_file.file, buffer)
-        
-        overlay_content = overlay_filename
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported overlay type.")
-
-    db_job = Job(video_id=video_id, job_type=JobType.overlay, status=JobStatus.pending)
-    db.add(db_job)
-    db.commit()
-    db.refresh(db_job)
-    
-    overlay_data = OverlayCreate(
-        type=overlay_type,
-        content=overlay_content,
-        position=position,
-        start_time=start_time,
-        end_time=end_time,
-        font_name=font_name # <-- PASS NEW PARAMETER
-    )
-    
-    create_overlay(db, video_id=video_id, overlay_data=overlay_data)
-
-    input_path = os.path.join("uploads", video.filename)
-    
-    background_tasks.add_task(add_overlay_in_background, db_job.id, input_path)
-    
-    return db_job
\ No newline at end of file
+# app/api/endpoints/overlays.py
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, HTTPException, UploadFile, Form, File, Query, Request, Response
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.dependencies import get_async_db, get_client_id, get_db
+from app.models.models import Video, Job, JobType, JobStatus, Overlay, OverlayAsset, OverlayType
+from app.schemas.overlay import (
+    OverlayCreate, OverlayLayer, OverlayResponse, OverlayPosition, OverlayRenderMode, OverlayAssetResponse
+)
+from app.schemas.job import JobResponse
+from app.schemas.encoding import EncodingProfileName
+from app.crud.job import with_profile
+from app.crud.overlay import (
+    create_overlay, create_overlay_asset, create_overlays, get_overlay_asset_by_sha256, overlay_assets_query
+)
+from app.utils.admission import admit_jobs
+from app.utils.ffmpeg import video_file_path
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+from app.utils.probe import probe_media
+
+# This folder is for the raw overlay files (images, videos)
+OVERLAY_MEDIA_FOLDER = Path("overlays_media")
+# The asset library: one file per content, named by its SHA-256
+OVERLAY_ASSET_FOLDER = OVERLAY_MEDIA_FOLDER / "assets"
+OVERLAY_ASSET_FOLDER.mkdir(parents=True, exist_ok=True)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+router = APIRouter(
+    prefix="/overlays",
+    tags=["overlays"]
+)
+
+def register_overlay_asset(db: Session, overlay_file: UploadFile) -> tuple[OverlayAsset, bool]:
+    """
+    Adds an uploaded overlay file to the asset library, hashed as it is
+    written and probed once. A file whose content is already in the library
+    is discarded and the existing asset returned. Returns (asset, created).
+    """
+    file_extension = os.path.splitext(overlay_file.filename or "")[1].lower()
+    temp_path = OVERLAY_ASSET_FOLDER / f".upload_{uuid.uuid4().hex}{file_extension}"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as buffer:
+            while chunk := overlay_file.file.read(COPY_BUFFER_SIZE):
+                hasher.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        sha256 = hasher.hexdigest()
+
+        asset = get_overlay_asset_by_sha256(db, sha256)
+        if asset:
+            return asset, False
+
+        try:
+            media_info = probe_media(temp_path)
+        except RuntimeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The overlay file is not an image or video.")
+        file_path = f"{OVERLAY_ASSET_FOLDER.name}/{sha256}{file_extension}"
+        os.replace(temp_path, OVERLAY_MEDIA_FOLDER / file_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+    asset = create_overlay_asset(db, sha256, os.path.basename(overlay_file.filename or file_path), file_path, size, media_info)
+    return asset, True
+
+def _get_asset(db: Session, asset_id: int) -> OverlayAsset:
+    asset = db.get(OverlayAsset, asset_id)
+    if not asset:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Overlay asset {asset_id} not found.")
+    return asset
+
+def _asset_fields(asset: OverlayAsset) -> dict:
+    """OverlayCreate fields of a layer showing `asset`; the probe result comes along so jobs don't probe again."""
+    return {"content": asset.file_path, "asset_id": asset.id, "media_info": asset.media_info}
+
+def check_layer_files(db: Session, layers: List[OverlayLayer], files: List[UploadFile]):
+    for layer in layers:
+        if layer.file is not None and not 0 <= layer.file < len(files):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"No uploaded file at index {layer.file}.")
+        if layer.asset_id is not None:
+            _get_asset(db, layer.asset_id)
+
+def save_overlay_layers(db: Session, layers: List[OverlayLayer], files: List[UploadFile],
+                        time_offset: float = 0.0) -> List[OverlayCreate]:
+    """
+    Adds the files of `layers` to the asset library and returns the overlays
+    to create, with their times moved by `time_offset` onto the source
+    video's timeline. Commits the new assets, so call it before adding the job.
+    """
+    overlays = []
+    for layer in layers:
+        if layer.type == OverlayType.text:
+            source = {"content": layer.content}
+        elif layer.asset_id is not None:
+            source = _asset_fields(_get_asset(db, layer.asset_id))
+        else:
+            source = _asset_fields(register_overlay_asset(db, files[layer.file])[0])
+        overlays.append(OverlayCreate(
+            type=layer.type,
+            position=layer.position,
+            start_time=layer.start_time + time_offset,
+            end_time=layer.end_time + time_offset,
+            font_name=layer.font_name,
+            **source
+        ))
+    return overlays
+
+def _new_overlay_job(db: Session, video: Video, mode: OverlayRenderMode, profile: str | None = None,
+                     client_id: str | None = None) -> Job:
+    db_job = Job(
+        video_id=video.id,
+        job_type=JobType.overlay,
+        status=JobStatus.pending,
+        client_id=client_id,
+        params=with_profile({"input_path": video_file_path(video), "mode": mode.value}, profile)
+    )
+    db.add(db_job)
+    db.flush() # Assigns the id; the job and its layers are committed together
+    return db_job
+
+@router.post(
+    "/assets",
+    response_model=OverlayAssetResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Add an image or video to the overlay asset library"
+)
+def upload_overlay_asset(response: Response, file: UploadFile, db: Session = Depends(get_db)):
+    """
+    Stores the file once per content: uploading a file that is already in the
+    library returns the existing asset (200). Reference it from overlay jobs
+    by `asset_id` instead of uploading it again.
+    """
+    asset, created = register_overlay_asset(db, file)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return asset
+
+@router.get(
+    "/assets",
+    response_model=List[OverlayAssetResponse],
+    summary="List the overlay asset library, one page at a time"
+)
+async def list_overlay_assets(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
+):
+    rows = (await db.execute(overlay_assets_query(limit=limit + 1, after_id=decode_cursor(cursor)))).mappings().all()
+    return paginate(rows, limit, request, response)
+
+@router.get(
+    "/assets/{asset_id}",
+    response_model=OverlayAssetResponse,
+    summary="Get an overlay asset"
+)
+async def get_overlay_asset(asset_id: int, db: AsyncSession = Depends(get_async_db)):
+    asset = await db.get(OverlayAsset, asset_id)
+    if not asset:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Overlay asset {asset_id} not found.")
+    return asset
+
+@router.post(
+    "/{video_id}",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create an overlay job for a video"
+)
+def create_overlay_job(
+    video_id: int,
+    db: Session = Depends(get_db),
+    client_id: str = Depends(get_client_id),
+    overlay_type: OverlayType = Form(...),
+    position: OverlayPosition = Form(...),
+    start_time: float = Form(...),
+    end_time: float = Form(...),
+    content: str | None = Form(None),
+    font_name: str | None = Form(None), # <-- NEW PARAMETER
+    mode: OverlayRenderMode = Form(OverlayRenderMode.auto),
+    profile: EncodingProfileName | None = Form(None),
+    asset_id: int | None = Form(None, description="Overlay asset to show instead of uploading overlay_file"),
+    overlay_file: UploadFile | None = None
+):
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found.")
+    admit_jobs(db, client_id, [JobType.overlay])
+
+    if overlay_type == OverlayType.text:
+        if not content:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Content is required for text overlay.")
+        source = {"content": content}
+    elif overlay_type in [OverlayType.image, OverlayType.watermark, OverlayType.video]:
+        # Assets are committed on their own, before the job exists
+        if asset_id is not None:
+            source = _asset_fields(_get_asset(db, asset_id))
+        elif overlay_file:
+            source = _asset_fields(register_overlay_asset(db, overlay_file)[0])
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="An overlay file or asset_id is required.")
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported overlay type.")
+
+    db_job = _new_overlay_job(db, video, mode, profile, client_id)
+
+    overlay_data = OverlayCreate(
+        type=overlay_type,
+        position=position,
+        start_time=start_time,
+        end_time=end_time,
+        font_name=font_name, # <-- PASS NEW PARAMETER
+        **source
+    )
+    
+    # Commits the overlay together with its job, so the worker always finds it.
+    create_overlay(db, video_id=video_id, overlay_data=overlay_data, job_id=db_job.id)
+    db.refresh(db_job)
+
+    return db_job
+
+@router.post(
+    "/{video_id}/layers",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create an overlay job that composites several layers in one encode"
+)
+def create_layered_overlay_job(
+    video_id: int,
+    db: Session = Depends(get_db),
+    client_id: str = Depends(get_client_id),
+    layers: str = Form(..., description="JSON list of layers, bottom first"),
+    files: List[UploadFile] = File([]),
+    mode: OverlayRenderMode = Form(OverlayRenderMode.auto),
+    profile: EncodingProfileName | None = Form(None)
+):
+    """
+    Renders every layer (text, image, watermark, video) in a single FFmpeg
+    pass. `layers` is a JSON list of objects with `type`, `position`,
+    `start_time`, `end_time` and either `content` (text), `file`, the
+    index of the layer's file in `files`, or `asset_id`, a file of the
+    overlay asset library.
+    """
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found.")
+
+    try:
+        overlay_layers = TypeAdapter(List[OverlayLayer]).validate_json(layers)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    if not overlay_layers:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one layer is required.")
+    check_layer_files(db, overlay_layers, files)
+    admit_jobs(db, client_id, [JobType.overlay])
+
+    overlays = save_overlay_layers(db, overlay_layers, files)
+    db_job = _new_overlay_job(db, video, mode, profile, client_id)
+
+    create_overlays(db, video_id=video_id, overlays=overlays, job_id=db_job.id)
+    db.refresh(db_job)
+
+    return db_job
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=List[OverlayResponse],
+    summary="List the layers of an overlay job"
+)
+async def list_job_overlays(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(Job, job_id)
+    if not job or job.job_type != JobType.overlay:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Overlay job not found.")
+    return (await db.scalars(select(Overlay).where(Overlay.job_id == job_id).order_by(Overlay.id))).all()
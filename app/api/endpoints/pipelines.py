@@ -0,0 +1,92 @@
+# app/api/endpoints/pipelines.py
+
+from typing import List
+from fastapi import APIRouter, Depends, status, HTTPException, UploadFile, Form, File
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import Session
+from app.dependencies import get_client_id, get_db
+from app.models.models import Video, Job, JobType, JobStatus
+from app.schemas.job import JobResponse
+from app.schemas.encoding import EncodingProfileName
+from app.crud.job import with_profile
+from app.schemas.pipeline import OverlayOperation, PipelineOperation, TrimOperation
+from app.crud.overlay import create_overlays
+from app.api.endpoints.overlays import check_layer_files, save_overlay_layers
+from app.utils.admission import admit_jobs
+from app.utils.ffmpeg import video_file_path
+
+router = APIRouter(
+    prefix="/videos",
+    tags=["pipelines"]
+)
+
+@router.post(
+    "/{video_id}/pipeline",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Trim, overlay and export a video in a single encode"
+)
+def create_pipeline_job(
+    video_id: int,
+    db: Session = Depends(get_db),
+    client_id: str = Depends(get_client_id),
+    operations: str = Form(..., description="JSON list of operations, applied in order"),
+    files: List[UploadFile] = File([]),
+    keep_intermediates: bool = Form(False, description="Also write and record the result of every operation but the last"),
+    profile: EncodingProfileName | None = Form(None, description="Encoding profile of every output")
+):
+    """
+    Compiles the operations into one FFmpeg run: the source is decoded once
+    and only the final result is encoded and stored. `operations` is a JSON
+    list of `{"op": "trim", "start_time", "end_time"}` (first, at most once),
+    `{"op": "overlay", "layers": [...]}` (layers as for
+    `POST /overlays/{video_id}/layers`, timed on the trimmed video) and
+    `{"op": "export", "quality"}`.
+    """
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found.")
+
+    try:
+        pipeline = TypeAdapter(List[PipelineOperation]).validate_json(operations)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    if not pipeline:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one operation is required.")
+    if any(isinstance(operation, TrimOperation) for operation in pipeline[1:]):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A trim can only be the first operation.")
+    for operation in pipeline:
+        if isinstance(operation, OverlayOperation):
+            check_layer_files(db, operation.layers, files)
+    admit_jobs(db, client_id, [JobType.pipeline])
+
+    # Layers are stored on the source timeline, like those of overlay jobs
+    time_offset = pipeline[0].start_time if isinstance(pipeline[0], TrimOperation) else 0.0
+    steps = []
+    overlays = []
+    for operation in pipeline:
+        if isinstance(operation, OverlayOperation):
+            # Adds the layer files to the asset library (committed before the job exists)
+            overlays.extend(save_overlay_layers(db, operation.layers, files, time_offset=time_offset))
+            steps.append({"op": "overlay", "layers": len(operation.layers)})
+        else:
+            steps.append(operation.model_dump(mode="json"))
+
+    db_job = Job(
+        video_id=video.id,
+        job_type=JobType.pipeline,
+        status=JobStatus.pending,
+        client_id=client_id
+    )
+    db.add(db_job)
+    db.flush() # Assigns the id; the job and its layers are committed together
+
+    db_job.params = with_profile({
+        "input_path": video_file_path(video),
+        "operations": steps,
+        "keep_intermediates": keep_intermediates,
+    }, profile)
+    create_overlays(db, video_id=video_id, overlays=overlays, job_id=db_job.id)
+    db.refresh(db_job)
+
+    return db_job
@@ -0,0 +1,81 @@
+# app/api/endpoints/previews.py
+
+import os
+import re
+from fastapi import APIRouter, Depends, Request, status, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_async_db, get_client_id
+from app.models.models import JobType, Video
+from app.schemas.job import JobResponse
+from app.schemas.preview import PreviewResponse
+from app.crud.job import enqueue_job_async, preview_job_fields
+from app.utils.admission import admit_jobs_async
+from app.utils.ffmpeg import previews_dir
+from app.utils.file_response import file_response
+
+# Names the preview job writes: poster.jpg, thumb_01.jpg, sprite_001.jpg, sprite.vtt
+PREVIEW_FILE_RE = re.compile(r"^(poster\.jpg|thumb_\d+\.jpg|sprite_\d+\.jpg|sprite\.vtt)$")
+PREVIEW_KEY_RE = re.compile(r"^[0-9a-f]{16}$")
+
+# A preview set's directory is keyed by the source content: its files never change
+IMMUTABLE = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+router = APIRouter(
+    prefix="/videos",
+    tags=["previews"]
+)
+
+@router.post(
+    "/{video_id}/previews",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Render the video's poster, thumbnails and scrubbing sprite sheets"
+)
+async def create_previews_job(
+    video_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    """Uploads get their previews automatically; this renders them for older or processed videos."""
+    video = await db.get(Video, video_id)
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+
+    await admit_jobs_async(db, client_id, [JobType.previews])
+    return await enqueue_job_async(db, **preview_job_fields(video_id), client_id=client_id)
+
+@router.get("/{video_id}/previews", response_model=PreviewResponse, summary="URLs of the video's preview images")
+async def get_previews(video_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    video = await db.get(Video, video_id)
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+    directory = previews_dir(video.id, video.preview_key) if video.preview_key else None
+    if not directory or not os.path.isdir(directory):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video has no previews yet.")
+
+    def url(filename: str) -> str:
+        return str(request.url_for("get_preview_file", video_id=video.id, key=video.preview_key, filename=filename))
+
+    filenames = sorted(os.listdir(directory))
+    return PreviewResponse(
+        video_id=video.id,
+        poster=url("poster.jpg"),
+        thumbnails=[url(name) for name in filenames if name.startswith("thumb_")],
+        sprites=[url(name) for name in filenames if name.startswith("sprite_")],
+        sprites_vtt=url("sprite.vtt"),
+    )
+
+@router.api_route(
+    "/{video_id}/previews/{key}/{filename}",
+    methods=["GET", "HEAD"],
+    summary="Poster, thumbnail, sprite sheet or WebVTT sprite index"
+)
+def get_preview_file(video_id: int, key: str, filename: str, request: Request):
+    if not PREVIEW_KEY_RE.match(key) or not PREVIEW_FILE_RE.match(filename):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+
+    path = os.path.join(previews_dir(video_id, key), filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+    media_type = "text/vtt" if filename.endswith(".vtt") else "image/jpeg"
+    return file_response(request, path, media_type=media_type, headers=IMMUTABLE)
@@ -0,0 +1,66 @@
+# app/api/endpoints/streaming.py
+
+import os
+import re
+from fastapi import APIRouter, Depends, Request, status, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_async_db, get_client_id
+from app.models.models import JobType, Video, VideoQuality
+from app.schemas.job import JobResponse
+from app.crud.job import enqueue_job_async, package_job_fields
+from app.utils.admission import admit_jobs_async
+from app.utils.ffmpeg import hls_package_dir
+from app.utils.file_response import file_response
+
+# Names the packager writes: index.m3u8, init.mp4, seg_00000.m4s, ...
+HLS_FILE_RE = re.compile(r"^(index\.m3u8|init\.mp4|seg_\d+\.m4s)$")
+
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
+
+router = APIRouter(
+    prefix="/videos",
+    tags=["streaming"]
+)
+
+@router.post(
+    "/{video_id}/package",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Package the video's quality versions for HLS streaming"
+)
+async def create_package_job(
+    video_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    video = await db.get(Video, video_id)
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+
+    await admit_jobs_async(db, client_id, [JobType.package])
+    return await enqueue_job_async(db, **package_job_fields(video_id), client_id=client_id)
+
+@router.api_route("/{video_id}/hls/master.m3u8", methods=["GET", "HEAD"], summary="HLS master playlist")
+def get_master_playlist(video_id: int, request: Request):
+    path = os.path.join(hls_package_dir(video_id), "master.m3u8")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video has not been packaged.")
+    return file_response(request, path, media_type=HLS_MEDIA_TYPES[".m3u8"])
+
+@router.api_route(
+    "/{video_id}/hls/{rendition}/{filename}",
+    methods=["GET", "HEAD"],
+    summary="HLS media playlist, init segment or media segment"
+)
+def get_hls_file(video_id: int, rendition: VideoQuality, filename: str, request: Request):
+    if not HLS_FILE_RE.match(filename):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+
+    path = os.path.join(hls_package_dir(video_id), rendition.value, filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+    return file_response(request, path, media_type=HLS_MEDIA_TYPES[os.path.splitext(filename)[1]])
@@ -0,0 +1,308 @@
+# app/api/endpoints/uploads.py
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.dependencies import get_async_db, get_client_id, get_db
+from app.models.models import Job, JobType, JobStatus, UploadSession, UploadStatus
+from app.schemas.job import JobResponse
+from app.schemas.upload import UploadSessionCreate, UploadSessionResponse
+
+UPLOAD_FOLDER = Path("uploads")
+PARTIAL_FOLDER = UPLOAD_FOLDER / ".partial"
+PARTIAL_FOLDER.mkdir(parents=True, exist_ok=True)
+
+# Request bodies are buffered up to this size before each disk write
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+# Running SHA-256 per session as (offset hashed so far, hash object). Only a
+# cache: if it is missing (restart, another API process took the previous
+# chunk) the prefix already on disk is hashed again.
+_hashers: dict[str, tuple[int, "hashlib._Hash"]] = {}
+
+# Seconds between sweeps for expired upload sessions, and the last sweep
+EXPIRE_INTERVAL = 600
+_last_expired = 0.0
+
+router = APIRouter(
+    prefix="/uploads",
+    tags=["uploads"]
+)
+
+def _partial_path(session_id: str) -> Path:
+    return PARTIAL_FOLDER / f"{session_id}.part"
+
+async def _get_session(db: AsyncSession, session_id: str) -> UploadSession:
+    session = await db.get(UploadSession, session_id)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found.")
+    return session
+
+def _hash_prefix(path: Path, length: int):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(WRITE_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+def _expire_sessions(db: Session):
+    """
+    Deletes the upload sessions idle for UPLOAD_SESSION_TTL seconds and
+    their partial files, and drops this process's hashers of sessions that
+    are no longer being uploaded.
+    """
+    global _last_expired
+    if time.monotonic() - _last_expired < EXPIRE_INTERVAL:
+        return
+    _last_expired = time.monotonic()
+
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    expired = (
+        db.query(UploadSession)
+        .filter(UploadSession.status == UploadStatus.uploading, UploadSession.updated_at < cutoff)
+        .all()
+    )
+    for session in expired:
+        _partial_path(session.id).unlink(missing_ok=True)
+        db.delete(session)
+    db.commit()
+    if expired:
+        print(f"Removed {len(expired)} expired upload sessions")
+
+    active = set(db.scalars(
+        select(UploadSession.id)
+        .where(UploadSession.id.in_(list(_hashers)), UploadSession.status == UploadStatus.uploading)
+    ))
+    for session_id in list(_hashers):
+        if session_id not in active:
+            _hashers.pop(session_id, None)
+
+def _write_at(f, position: int, data: bytes, hasher, hash_from: int):
+    """Writes `data` at `position`, hashing only the bytes past `hash_from`."""
+    f.seek(position)
+    f.write(data)
+    if position + len(data) > hash_from:
+        hasher.update(memoryview(data)[max(0, hash_from - position):])
+
+@router.post(
+    "/",
+    response_model=UploadSessionResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Start a resumable chunked upload"
+)
+def create_upload_session(
+    upload_data: UploadSessionCreate,
+    db: Session = Depends(get_db)
+):
+    filename = os.path.basename(upload_data.filename)
+    if not filename:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is missing.")
+
+    _expire_sessions(db)
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        filename=filename,
+        size=upload_data.size,
+        received_bytes=0,
+        expected_sha256=upload_data.sha256.lower() if upload_data.sha256 else None,
+        status=UploadStatus.uploading
+    )
+    _partial_path(session.id).touch()
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+@router.get(
+    "/{session_id}",
+    response_model=UploadSessionResponse,
+    summary="Get the state of an upload, including the offset to resume from"
+)
+async def get_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _get_session(db, session_id)
+
+@router.put(
+    "/{session_id}",
+    response_model=UploadSessionResponse,
+    summary="Upload a byte range of the file"
+)
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Writes the request body at the offset given by its `Content-Range`
+    header (`bytes <first>-<last>/<size>`), straight into the partial file.
+
+    Chunks must start at or before `received_bytes`; bytes that were already
+    received are rewritten but not hashed again. If the connection drops
+    mid-chunk, everything written so far is kept and the client resumes from
+    the `received_bytes` reported by `GET /uploads/{session_id}`.
+    """
+    session = await _get_session(db, session_id)
+    if session.status != UploadStatus.uploading:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is already completed.")
+
+    match = CONTENT_RANGE_RE.match(request.headers.get("content-range", ""))
+    if not match:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A 'Content-Range: bytes <first>-<last>/<size>' header is required."
+        )
+    first, last = int(match.group(1)), int(match.group(2))
+    if match.group(3) != "*" and int(match.group(3)) != session.size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Content-Range size does not match the upload size.")
+    if first > last or last >= session.size:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Invalid byte range.")
+
+    start_offset = session.received_bytes
+    if first > start_offset:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Chunk starts at {first} but only {start_offset} bytes have been received."
+        )
+
+    path = _partial_path(session_id)
+    offset, hasher = _hashers.pop(session_id, (None, None))
+    if offset != start_offset:
+        hasher = await run_in_threadpool(_hash_prefix, path, start_offset)
+
+    position = first
+    hashed_to = start_offset
+    buffer = bytearray()
+    f = await run_in_threadpool(open, path, "r+b")
+    try:
+        async for data in request.stream():
+            if position + len(buffer) + len(data) > last + 1:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is longer than the Content-Range.")
+            buffer.extend(data)
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                await run_in_threadpool(_write_at, f, position, bytes(buffer), hasher, hashed_to)
+                position += len(buffer)
+                hashed_to = max(hashed_to, position)
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write_at, f, position, bytes(buffer), hasher, hashed_to)
+            position += len(buffer)
+            hashed_to = max(hashed_to, position)
+            buffer.clear()
+    except ClientDisconnect:
+        pass
+    finally:
+        await run_in_threadpool(f.close)
+        # Record progress even when the client went away, so it can resume.
+        # The conditional update keeps a concurrent PUT from moving it backwards.
+        if hashed_to > start_offset:
+            result = await db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == session_id, UploadSession.received_bytes == start_offset)
+                .values(received_bytes=hashed_to)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if result.rowcount:
+                _hashers[session_id] = (hashed_to, hasher)
+        else:
+            _hashers[session_id] = (start_offset, hasher)
+
+    await db.refresh(session)
+    return session
+
+@router.post(
+    "/{session_id}/complete",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Finish an upload and start processing it"
+)
+async def complete_upload(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    session = await _get_session(db, session_id)
+    if session.received_bytes != session.size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Only {session.received_bytes} of {session.size} bytes have been received."
+        )
+
+    # Claim the session, so a concurrent complete (or PUT) finds it taken
+    result = await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session_id, UploadSession.status == UploadStatus.uploading)
+        .values(status=UploadStatus.completed)
+        .execution_options(synchronize_session=False)
+    )
+    # Hashing and renaming need no connection; end the transaction first
+    await db.commit()
+    if not result.rowcount:
+        await db.refresh(session)
+        if session.job_id:
+            return await db.get(Job, session.job_id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is already being completed.")
+
+    try:
+        # Hashed again from the file when this process didn't receive every chunk
+        path = _partial_path(session_id)
+        offset, hasher = _hashers.pop(session_id, (None, None))
+        if offset != session.size:
+            hasher = await run_in_threadpool(_hash_prefix, path, session.size)
+        digest = hasher.hexdigest()
+        if session.expected_sha256 and digest != session.expected_sha256:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"SHA-256 mismatch: expected {session.expected_sha256}, got {digest}."
+            )
+
+        # Same directory tree, so this is a rename rather than another copy
+        final_path = UPLOAD_FOLDER / f"temp_upload_{session_id}_{session.filename}"
+        await run_in_threadpool(os.replace, path, final_path)
+
+        db_job = Job(
+            job_type=JobType.upload,
+            status=JobStatus.pending,
+            client_id=client_id,
+            params={"file_path": str(final_path)}
+        )
+        db.add(db_job)
+        await db.flush() # Assigns the id
+        session.sha256 = digest
+        session.job_id = db_job.id
+        await db.commit()
+    except BaseException:
+        # Give the session back, so the client can fix it and complete again
+        await db.rollback()
+        await db.execute(
+            update(UploadSession)
+            .where(UploadSession.id == session_id)
+            .values(status=UploadStatus.uploading)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        raise
+    await db.refresh(db_job)
+
+    return db_job
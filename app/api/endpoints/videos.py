@@ -1,152 +1,214 @@
-import os
-import shutil
-from pathlib import Path
-from typing import List
-from fastapi import APIRouter, UploadFile, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from datetime import datetime
-from app.schemas.job import JobResponse, TrimJobCreate
-from app.schemas.video import VideoResponse
-from app.models.models import Video, Job, JobType, JobStatus
-from app.utils.ffmpeg import get_video_metadata, trim_video_in_background, upload_video_task
-from app.crud.job import create_trim_job
-from app.crud.video import get_videos
-from app.dependencies import get_db
-
-
-from app.schemas.quality_export import QualityExportCreate
-from app.utils.ffmpeg import quality_export_in_background
-
-
-UPLOAD_FOLDER = Path("uploads")
-UPLOAD_FOLDER.mkdir(exist_ok=True)
-
-router = APIRouter(
-    prefix="/videos",
-    tags=["videos"]
-)
-
-@router.post("/upload", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
-async def upload_video(
-    file: UploadFile,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
-    if file.filename is None:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is missing.")
-    
-    db_job = Job(job_type=JobType.upload, status=JobStatus.pending)
-    db.add(db_job)
-    db.commit()
-    db.refresh(db_job)
-
-    temp_filename = f"temp_upload_{db_job.id}_{file.filename}"
-    temp_path = UPLOAD_FOLDER / temp_filename
-    try:
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        db_job.status = JobStatus.failed
-        db.commit()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save video file: {e}"
-        )
-    
-    background_tasks.add_task(upload_video_task, db_job.id, str(temp_path))
-
-    return db_job
-
-@router.get("/", response_model=List[VideoResponse], summary="List all uploaded videos")
-def list_videos(db: Session = Depends(get_db)):
-    """
-    Retrieves all video metadata from the database.
-    """
-    videos = get_videos(db)
-    return videos
-
-@router.post(
-    "/{video_id}/trim",
-    response_model=JobResponse,
-    status_code=status.HTTP_201_CREATED,
-    summary="Create a trimming job for a video"
-)
-def create_trim_job_api(
-    video_id: int,
-    trim_data: TrimJobCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
-    
-    if trim_data.start_time >= trim_data.end_time:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be less than end_time.")
-
-    db_job = create_trim_job(db=db, video_id=video_id, trim_data=trim_data)
-    
-    input_path = os.path.join("uploads", video.filename)
-
-    background_tasks.add_task(trim_video_in_background, db_job.id, input_path)
-
-    return db_job
-
-# app/api/endpoints/videos.py
-# ... (existing imports and other endpoints) ...
-from app.schemas.quality_export import QualityExportCreate
-
-@router.post(
-    "/{video_id}/quality-export",
-    response_model=JobResponse,
-    status_code=status.HTTP_201_CREATED,
-    summary="Create a quality export job for a video"
-)
-def create_quality_export_job(
-    video_id: int,
-    quality_data: QualityExportCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
-    
-    db_job = Job(
-        video_id=video_id,
-        job_type=JobType.quality_export,
-        status=JobStatus.pending
-    )
-    db.add(db_job)
-    db.commit()
-    db.refresh(db_job)
-
-    background_tasks.add_task(
-        quality_export_in_background,
-        job_id=db_job.id,
-        input_video_id=video_id,
-        quality=quality_data.quality
-    )
-
-    return db_job
-
-# app/api/endpoints/videos.py
-# ... (existing imports and endpoints) ...
-from app.models.models import VideoVersion
-from app.schemas.quality_export import VideoVersionResponse
-
-@router.get(
-    "/{video_id}/versions",
-    response_model=List[VideoVersionResponse],
-    summary="List all quality versions for a video"
-)
-def list_video_versions(
-    video_id: int,
-    db: Session = Depends(get_db)
-):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
-        
-    versions = db.query(VideoVersion).filter(VideoVersion.video_id == video_id).all()
-    return versions
\ No newline at end of file
+import shutil
+import uuid
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from app.schemas.job import JobResponse, TrimJobCreate
+from app.schemas.video import VideoListItem
+from app.models.models import Video, Job, JobType, JobStatus, VideoQuality
+from app.crud.job import enqueue_job_async, quality_export_job_fields, trim_job_fields
+from app.crud.video import VIDEO_LIST_FIELDS, video_list_query, video_versions_query
+from app.dependencies import get_async_db, get_client_id
+from app.utils.admission import admit_jobs_async
+from app.utils.ffmpeg import video_file_path
+from app.utils.metadata_cache import cached_response, json_entry
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+
+
+from app.schemas.quality_export import QualityExportCreate
+
+
+UPLOAD_FOLDER = Path("uploads")
+UPLOAD_FOLDER.mkdir(exist_ok=True)
+
+router = APIRouter(
+    prefix="/videos",
+    tags=["videos"]
+)
+
+def _query_key(request: Request) -> tuple:
+    return tuple(sorted(request.query_params.multi_items()))
+
+def _page_headers(response: Response) -> dict:
+    """The paging headers `paginate()` set, for the cached response."""
+    return {name: response.headers[name] for name in ("X-Next-Cursor", "Link") if name in response.headers}
+
+def _save_upload_file(file: UploadFile, path: Path):
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+@router.post("/upload", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
+async def upload_video(
+    file: UploadFile,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    if file.filename is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is missing.")
+    
+    # Copied before the job is inserted, so no connection is held meanwhile
+    temp_filename = f"temp_upload_{uuid.uuid4().hex}_{file.filename}"
+    temp_path = UPLOAD_FOLDER / temp_filename
+    try:
+        # Off the event loop: copying a large spooled upload blocks for seconds
+        await run_in_threadpool(_save_upload_file, file, temp_path)
+    except Exception as e:
+        temp_path.unlink(missing_ok=True)
+        db.add(Job(job_type=JobType.upload, status=JobStatus.failed, client_id=client_id))
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save video file: {e}"
+        )
+
+    db_job = Job(
+        job_type=JobType.upload,
+        status=JobStatus.pending,
+        client_id=client_id,
+        params={"file_path": str(temp_path)}
+    )
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+
+    return db_job
+
+@router.get(
+    "/",
+    response_model=List[VideoListItem],
+    response_model_exclude_unset=True,
+    summary="List uploaded and processed videos, one page at a time"
+)
+async def list_videos(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    derived: Optional[bool] = Query(None, description="true: processed videos only, false: originals only"),
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    min_duration: Optional[float] = None,
+    max_duration: Optional[float] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,filename,duration")
+):
+    """
+    Retrieves video metadata ordered by id. The cursor for the next page is
+    returned in the X-Next-Cursor header; it is absent on the last page.
+    Pages are served from the metadata cache, with an ETag.
+    """
+    selected = None
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(selected) - set(VIDEO_LIST_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {sorted(unknown)}. Available: {list(VIDEO_LIST_FIELDS)}"
+            )
+
+    query = video_list_query(
+        limit=limit + 1,
+        after_id=decode_cursor(cursor),
+        derived=derived,
+        uploaded_after=uploaded_after,
+        uploaded_before=uploaded_before,
+        min_duration=min_duration,
+        max_duration=max_duration,
+        fields=selected
+    )
+    async def build():
+        rows = (await db.execute(query)).mappings().all()
+        page = [dict(row) for row in paginate(rows, limit, request, response)]
+        return json_entry(List[VideoListItem], page, headers=_page_headers(response), exclude_unset=True)
+
+    return await cached_response(request, ("videos", _query_key(request)), ("videos",), build)
+
+@router.post(
+    "/{video_id}/trim",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create a trimming job for a video"
+)
+async def create_trim_job_api(
+    video_id: int,
+    trim_data: TrimJobCreate,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    video = await db.get(Video, video_id)
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+    
+    if trim_data.start_time >= trim_data.end_time:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be less than end_time.")
+
+    await admit_jobs_async(db, client_id, [JobType.trim])
+    input_path = video_file_path(video)
+
+    return await enqueue_job_async(db, **trim_job_fields(video, trim_data, input_path), client_id=client_id)
+
+# app/api/endpoints/videos.py
+# ... (existing imports and other endpoints) ...
+from app.schemas.quality_export import QualityExportCreate
+
+@router.post(
+    "/{video_id}/quality-export",
+    response_model=JobResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create a quality export job for a video"
+)
+async def create_quality_export_job(
+    video_id: int,
+    quality_data: QualityExportCreate,
+    db: AsyncSession = Depends(get_async_db),
+    client_id: str = Depends(get_client_id)
+):
+    video = await db.get(Video, video_id)
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+    
+    await admit_jobs_async(db, client_id, [JobType.quality_export])
+    return await enqueue_job_async(db, **quality_export_job_fields(video_id, quality_data), client_id=client_id)
+
+# app/api/endpoints/videos.py
+# ... (existing imports and endpoints) ...
+from app.schemas.quality_export import VideoVersionResponse
+
+@router.get(
+    "/{video_id}/versions",
+    response_model=List[VideoVersionResponse],
+    summary="List all quality versions for a video"
+)
+async def list_video_versions(
+    video_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    quality: Optional[VideoQuality] = None,
+    version_status: Optional[JobStatus] = Query(None, alias="status")
+):
+    query = video_versions_query(
+        video_id,
+        limit=limit + 1,
+        after_id=decode_cursor(cursor),
+        quality=quality,
+        status=version_status
+    )
+
+    async def build():
+        if (await db.execute(select(Video.id).where(Video.id == video_id))).first() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+        rows = (await db.execute(query)).mappings().all()
+        page = [dict(row) for row in paginate(rows, limit, request, response)]
+        return json_entry(List[VideoVersionResponse], page, headers=_page_headers(response))
+
+    return await cached_response(
+        request, ("video_versions", video_id, _query_key(request)), ("videos", "video_versions"), build
+    )
\ No newline at end of file
@@ -0,0 +1,86 @@
+# app/calibrate.py
+"""
+Measures how fast each encoding profile encodes on this host:
+
+    python -m app.calibrate
+    python -m app.calibrate --profiles fast,balanced --threads 1,2,4 --json
+
+A synthetic 1080p30 clip (FFmpeg's `testsrc2`, so no media files are needed)
+is encoded with every profile, at every quality's resolution and thread
+count, into the null muxer. The reported fps and realtime factor (seconds of
+video encoded per second) tell how many jobs of a kind a worker can run side
+by side, and what WORKER_CONCURRENCY / WORKER_CPU_THREADS to set.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+
+from app.models.models import VideoQuality
+from app.utils.encoding import ENCODING_PROFILES, encoding_args, set_job_threads
+from app.utils.ffmpeg import QUALITY_SCALES
+
+SOURCE_FPS = 30
+SOURCE_SIZE = "1920x1080"
+
+def encode_fps(profile: str, quality: VideoQuality, threads: int, duration: float) -> dict:
+    set_job_threads(threads)
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-filter_threads", str(threads),
+        "-f", "lavfi", "-i", f"testsrc2=size={SOURCE_SIZE}:rate={SOURCE_FPS}:duration={duration}",
+        "-vf", f"scale={QUALITY_SCALES[quality]}",
+        *encoding_args(profile, quality, faststart=False),
+        "-f", "null", os.devnull
+    ]
+    started = time.perf_counter()
+    subprocess.run(command, check=True)
+    seconds = time.perf_counter() - started
+    return {
+        "profile": profile,
+        "quality": quality.value,
+        "threads": threads,
+        "seconds": round(seconds, 3),
+        "fps": round(duration * SOURCE_FPS / seconds, 1),
+        "realtime": round(duration / seconds, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of synthetic video per measurement")
+    parser.add_argument("--profiles", default=",".join(ENCODING_PROFILES), help="comma-separated profile names")
+    parser.add_argument("--qualities", default=",".join(q.value for q in VideoQuality), help="comma-separated qualities")
+    parser.add_argument("--threads", default=f"1,{os.cpu_count() or 1}", help="comma-separated thread counts")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    profiles = [p for p in args.profiles.split(",") if p]
+    unknown = [p for p in profiles if p not in ENCODING_PROFILES]
+    if unknown:
+        parser.error(f"unknown profile(s): {', '.join(unknown)}")
+    qualities = [VideoQuality(q) for q in args.qualities.split(",") if q]
+    thread_counts = sorted({int(t) for t in args.threads.split(",") if t})
+
+    results = []
+    for profile in profiles:
+        for quality in qualities:
+            for threads in thread_counts:
+                try:
+                    results.append(encode_fps(profile, quality, threads, args.duration))
+                except subprocess.CalledProcessError as e:
+                    # e.g. an encoder this FFmpeg build lacks
+                    print(f"{profile} {quality.value} x{threads}: failed ({e})")
+
+    if args.json:
+        print(json.dumps({"cpu_count": os.cpu_count(), "duration": args.duration, "results": results}, indent=2))
+        return
+
+    print(f"{os.cpu_count()} CPUs, {args.duration:g} s of {SOURCE_SIZE}@{SOURCE_FPS} per run")
+    print(f"{'profile':<14}{'quality':>8}{'threads':>9}{'fps':>10}{'realtime':>10}")
+    for r in results:
+        print(f"{r['profile']:<14}{r['quality']:>8}{r['threads']:>9}{r['fps']:>10.1f}{r['realtime']:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,290 @@
-from sqlalchemy.orm import Session
-from app.models.models import Job, Video, JobType, JobStatus
-from app.schemas.job import TrimJobCreate
-from fastapi import HTTPException, status
-
-def create_trim_job(db: Session, video_id: int, trim_data: TrimJobCreate):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video not found"
-        )
-    
-    db_job = Job(
-        video_id=video_id,
-        job_type=JobType.trim,
-        status=JobStatus.pending,
-        start_time=trim_data.start_time,
-        end_time=trim_data.end_time
-    )
-    db.add(db_job)
-    db.commit()
-    db.refresh(db_job)
-    return db_job
\ No newline at end of file
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, case, func, insert, literal, null, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from app.models.models import Job, Video, JobType, JobStatus
+from app.schemas.job import TrimJobCreate
+from app.schemas.quality_export import QualityExportCreate
+from app.utils.job_events import EVENT_COLUMNS, notify_jobs
+
+def enqueue_job(db: Session, job_type: JobType, video_id: int | None = None, params: dict | None = None, **fields):
+    """Inserts a pending job; a worker picks it up once the row is committed."""
+    db_job = Job(
+        video_id=video_id,
+        job_type=job_type,
+        status=JobStatus.pending,
+        params=params,
+        **fields
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+async def enqueue_job_async(db: AsyncSession, job_type: JobType, video_id: int | None = None,
+                            params: dict | None = None, **fields):
+    """`enqueue_job()` for async sessions."""
+    db_job = Job(
+        video_id=video_id,
+        job_type=job_type,
+        status=JobStatus.pending,
+        params=params,
+        **fields
+    )
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+async def enqueue_jobs(db: AsyncSession, jobs: list[dict]) -> list[Job]:
+    """
+    Inserts many pending jobs (each given as `enqueue_job()` keyword
+    arguments) with a single INSERT ... RETURNING and commits them together.
+    """
+    rows = [
+        {"video_id": None, "params": None, "client_id": None, **job, "status": JobStatus.pending}
+        for job in jobs
+    ]
+    result = await db.scalars(insert(Job).returning(Job, sort_by_parameter_order=True), rows)
+    db_jobs = result.all()
+    await db.run_sync(notify_jobs, db_jobs)
+    await db.commit()
+    return db_jobs
+
+# Job arguments per job type, shared by the single and the batch endpoints
+
+def with_profile(params: dict, profile: str | None) -> dict:
+    if profile:
+        params["profile"] = profile
+    return params
+
+def trim_job_fields(video: Video, trim_data: TrimJobCreate, input_path: str) -> dict:
+    return {
+        "job_type": JobType.trim,
+        "video_id": video.id,
+        "params": with_profile({"input_path": input_path}, trim_data.profile),
+        "start_time": trim_data.start_time,
+        "end_time": trim_data.end_time,
+    }
+
+def quality_export_job_fields(video_id: int, quality_data: QualityExportCreate) -> dict:
+    if quality_data.qualities:
+        params = {"input_video_id": video_id, "qualities": [q.value for q in quality_data.qualities]}
+    else:
+        params = {"input_video_id": video_id, "quality": quality_data.quality.value}
+    return {"job_type": JobType.quality_export, "video_id": video_id, "params": with_profile(params, quality_data.profile)}
+
+def package_job_fields(video_id: int) -> dict:
+    return {"job_type": JobType.package, "video_id": video_id, "params": {"video_id": video_id}}
+
+def preview_job_fields(video_id: int) -> dict:
+    return {"job_type": JobType.previews, "video_id": video_id, "params": {"video_id": video_id}}
+
+def mezzanine_job_fields(video_id: int, reasons: list[str]) -> dict:
+    return {"job_type": JobType.mezzanine, "video_id": video_id, "params": {"video_id": video_id, "reasons": reasons}}
+
+def queue_counts_query(client_id: str, since: datetime):
+    """
+    Per job type: jobs waiting, unfinished jobs of `client_id`, and jobs
+    (all, and of `client_id`) finished since `since`. One grouped scan over
+    the open and recently finished jobs.
+    """
+    open_statuses = (JobStatus.pending, JobStatus.processing)
+    ours = Job.client_id == client_id
+    recent = Job.completed_at >= since
+    return (
+        select(
+            Job.job_type,
+            func.sum(case((Job.status == JobStatus.pending, 1), else_=0)).label("queued"),
+            func.sum(case((and_(ours, Job.status.in_(open_statuses)), 1), else_=0)).label("client_open"),
+            func.sum(case((recent, 1), else_=0)).label("finished"),
+            func.sum(case((and_(ours, recent), 1), else_=0)).label("client_finished"),
+        )
+        .where(or_(Job.status.in_(open_statuses), recent))
+        .group_by(Job.job_type)
+    )
+
+def claim_next_job(db: Session, worker_id: str, lease_seconds: int, max_attempts: int):
+    """
+    Atomically claims the next runnable job for `worker_id`: the oldest job
+    of the client with the fewest jobs running, so one client's backlog
+    can't hold every worker while other clients wait.
+
+    A job is runnable when it is pending, or when it is processing but its
+    lease has expired (the worker that held it died). Rows are locked with
+    SKIP LOCKED so concurrent workers never claim the same job. Pass a
+    session with `expire_on_commit=False` to read the returned job without
+    another round-trip.
+    """
+    running = aliased(Job)
+    client_running = (
+        select(func.count(running.id))
+        .where(running.client_id.is_not_distinct_from(Job.client_id), running.status == JobStatus.processing)
+        .correlate(Job)
+        .scalar_subquery()
+    )
+    while True:
+        now = datetime.now(timezone.utc)
+        job = (
+            db.query(Job)
+            .filter(
+                or_(
+                    Job.status == JobStatus.pending,
+                    and_(
+                        Job.status == JobStatus.processing,
+                        or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now),
+                        Job.cancel_requested_at.is_(None)
+                    )
+                )
+            )
+            .order_by(client_running, Job.id)
+            .with_for_update(skip_locked=True)
+            .populate_existing()
+            .first()
+        )
+        if not job:
+            db.commit()
+            return None
+
+        if job.attempts >= max_attempts:
+            # The job keeps taking its worker down with it; stop retrying.
+            job.status = JobStatus.failed
+            job.worker_id = None
+            job.lease_expires_at = None
+            job.completed_at = now
+            db.commit()
+            print(f"Job {job.id} failed after {job.attempts} attempts.")
+            continue
+
+        job.status = JobStatus.processing
+        job.worker_id = worker_id
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        job.attempts = (job.attempts or 0) + 1
+        job.progress = 0.0
+        job.eta_seconds = None
+        db.commit()
+        return job
+
+def renew_leases(db: Session, worker_id: str, job_ids: list[int], lease_seconds: int):
+    """Heartbeat: extends the leases this worker still holds."""
+    if not job_ids:
+        return 0
+    renewed = (
+        db.query(Job)
+        .filter(
+            Job.id.in_(job_ids),
+            Job.worker_id == worker_id,
+            Job.status == JobStatus.processing
+        )
+        .update(
+            {Job.lease_expires_at: datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)},
+            synchronize_session=False
+        )
+    )
+    db.commit()
+    return renewed
+
+def reap_expired_jobs(db: Session, max_attempts: int) -> list[Job]:
+    """
+    Settles the jobs whose worker disappeared (processing, lease expired):
+    cancelled when that was requested meanwhile, failed once they have used
+    up their attempts, otherwise back in the queue. Returns them.
+    """
+    now = datetime.now(timezone.utc)
+    jobs = (
+        db.query(Job)
+        .filter(
+            Job.status == JobStatus.processing,
+            or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+        )
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in jobs:
+        if job.cancel_requested_at:
+            job.status = JobStatus.cancelled
+        elif job.attempts >= max_attempts:
+            job.status = JobStatus.failed
+        else:
+            job.status = JobStatus.pending
+        if job.status != JobStatus.pending:
+            job.completed_at = now
+        job.worker_id = None
+        job.lease_expires_at = None
+    db.commit()
+    return jobs
+
+def finish_interrupted_job(db: Session, job_id: int, cancelled: bool):
+    """
+    Final status of a job stopped by its watchdog: cancelled, or failed when
+    it timed out. A job that got done before it could be stopped stays done.
+    """
+    job = db.get(Job, job_id)
+    if not job or job.status == JobStatus.done:
+        return
+    job.status = JobStatus.cancelled if cancelled else JobStatus.failed
+    job.eta_seconds = None
+    db.commit()
+
+async def request_cancel(db: AsyncSession, job_id: int) -> Job | None:
+    """
+    Cancels a queued job at once; a running one gets `cancel_requested_at`
+    and is stopped by its worker. Returns the job, or None when it had
+    already finished.
+    """
+    now = datetime.now(timezone.utc)
+    queued = Job.status == JobStatus.pending
+    job = await db.scalar(
+        update(Job)
+        .where(Job.id == job_id, Job.status.in_((JobStatus.pending, JobStatus.processing)))
+        .values({
+            Job.status: case((queued, literal(JobStatus.cancelled, Job.status.type)), else_=Job.status),
+            Job.completed_at: case((queued, now), else_=Job.completed_at),
+            Job.cancel_requested_at: now,
+        })
+        .returning(Job)
+        .execution_options(populate_existing=True)
+    )
+    if job is not None:
+        await db.run_sync(notify_jobs, [job])
+    await db.commit()
+    return job
+
+def release_job(db: Session, job_id: int, worker_id: str, requeue: bool = False,
+                stats: dict | None = None, queue_seconds: float | None = None) -> JobStatus | None:
+    """
+    Drops the lease once the worker is done with a job. A task that returned
+    without reaching a final status is marked failed, or put back in the
+    queue when `requeue` is set (its attempts still count). The run's
+    `stats` (see app.utils.metrics.JobStats) are stored in the same UPDATE,
+    along with the completion time of a finished job.
+    Returns the job's final status.
+    """
+    now = datetime.now(timezone.utc)
+    unfinished = literal(JobStatus.pending if requeue else JobStatus.failed, Job.status.type)
+    values = {
+        Job.status: case((Job.status == JobStatus.processing, unfinished), else_=Job.status),
+        Job.completed_at: case((Job.status == JobStatus.processing, null() if requeue else now), else_=now),
+        Job.lease_expires_at: None,
+        Job.queue_seconds: queue_seconds,
+    }
+    if stats:
+        values.update({
+            Job.run_seconds: stats["stages"].get("total"),
+            Job.ffmpeg_seconds: stats["stages"].get("ffmpeg"),
+            Job.cpu_seconds: stats["cpu_seconds"],
+            Job.max_rss_bytes: stats["max_rss_bytes"],
+            Job.stage_seconds: stats["stages"],
+        })
+    row = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.worker_id == worker_id)
+        .values(values)
+        .returning(*EVENT_COLUMNS)
+    ).one_or_none()
+    if row is None:
+        db.commit()
+        return None
+    notify_jobs(db, [row])
+    db.commit()
+    return row.status
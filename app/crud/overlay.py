@@ -1,18 +1,59 @@
-from sqlalchemy.orm import Session
-from app.models.models import Video, Overlay
-from app.schemas.overlay import OverlayCreate
-from fastapi import HTTPException, status
-
-def create_overlay(db: Session, video_id: int, overlay_data: OverlayCreate):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video not found."
-        )
-
-    db_overlay = Overlay(**overlay_data.model_dump(), video_id=video_id)
-    db.add(db_overlay)
-    db.commit()
-    db.refresh(db_overlay)
-    return db_overlay
\ No newline at end of file
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.models import Video, Overlay, OverlayAsset
+from app.schemas.overlay import OverlayCreate
+from fastapi import HTTPException, status
+
+def create_overlay(db: Session, video_id: int, overlay_data: OverlayCreate, job_id: int | None = None):
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found."
+        )
+
+    db_overlay = Overlay(**overlay_data.model_dump(), video_id=video_id, job_id=job_id)
+    db.add(db_overlay)
+    db.commit()
+    db.refresh(db_overlay)
+    return db_overlay
+
+def create_overlays(db: Session, video_id: int, overlays: list[OverlayCreate], job_id: int):
+    """Adds all layers of one overlay job in a single commit."""
+    db_overlays = [
+        Overlay(**overlay_data.model_dump(), video_id=video_id, job_id=job_id)
+        for overlay_data in overlays
+    ]
+    db.add_all(db_overlays)
+    db.commit()
+    return db_overlays
+
+def get_overlay_asset_by_sha256(db: Session, sha256: str) -> OverlayAsset | None:
+    return db.query(OverlayAsset).filter(OverlayAsset.sha256 == sha256).first()
+
+def create_overlay_asset(db: Session, sha256: str, filename: str, file_path: str, size: int,
+                         media_info: dict | None) -> OverlayAsset:
+    """Adds an asset to the library; returns the existing one if the same file was registered meanwhile."""
+    asset = OverlayAsset(sha256=sha256, filename=filename, file_path=file_path, size=size, media_info=media_info)
+    db.add(asset)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return get_overlay_asset_by_sha256(db, sha256)
+    db.refresh(asset)
+    return asset
+
+def overlay_assets_query(limit: int | None = None, after_id: int | None = None):
+    """One keyset page of the overlay asset library, ordered by id."""
+    query = (
+        select(OverlayAsset.id, OverlayAsset.sha256, OverlayAsset.filename, OverlayAsset.size,
+               OverlayAsset.media_info, OverlayAsset.created_at)
+        .order_by(OverlayAsset.id)
+    )
+    if after_id is not None:
+        query = query.where(OverlayAsset.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
@@ -1,6 +1,78 @@
-from sqlalchemy.orm import Session
-from app.models.models import Video
-
-def get_videos(db: Session):
-    return db.query(Video).all()
-
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.models import Video, VideoVersion, VideoQuality, JobStatus
+
+# Columns a video listing can return (never the keyframe index blob)
+VIDEO_LIST_FIELDS = (
+    "id", "filename", "size", "duration", "upload_time", "original_video_id",
+    "container", "video_codec", "audio_codec", "width", "height", "fps",
+    "bitrate", "has_audio", "rotation",
+)
+
+def video_list_query(
+    limit: int | None = None,
+    after_id: int | None = None,
+    derived: bool | None = None,
+    uploaded_after: datetime | None = None,
+    uploaded_before: datetime | None = None,
+    min_duration: float | None = None,
+    max_duration: float | None = None,
+    fields: list[str] | None = None
+):
+    """
+    One keyset page of videos, ordered by id, selecting only the requested
+    `fields` (all of VIDEO_LIST_FIELDS by default; `id` always).
+    """
+    columns = [getattr(Video, name) for name in VIDEO_LIST_FIELDS if fields is None or name == "id" or name in fields]
+    query = select(*columns).order_by(Video.id)
+
+    if after_id is not None:
+        query = query.where(Video.id > after_id)
+    if derived is True:
+        query = query.where(Video.original_video_id.is_not(None))
+    elif derived is False:
+        query = query.where(Video.original_video_id.is_(None))
+    if uploaded_after is not None:
+        query = query.where(Video.upload_time >= uploaded_after)
+    if uploaded_before is not None:
+        query = query.where(Video.upload_time < uploaded_before)
+    if min_duration is not None:
+        query = query.where(Video.duration >= min_duration)
+    if max_duration is not None:
+        query = query.where(Video.duration <= max_duration)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def get_videos(db: Session, **filters):
+    """Row mappings of `video_list_query(**filters)`."""
+    return db.execute(video_list_query(**filters)).mappings().all()
+
+def video_versions_query(
+    video_id: int,
+    limit: int | None = None,
+    after_id: int | None = None,
+    quality: VideoQuality | None = None,
+    status: JobStatus | None = None
+):
+    """One keyset page of a video's quality versions, ordered by id."""
+    query = (
+        select(VideoVersion.id, VideoVersion.video_id, VideoVersion.quality, VideoVersion.file_path,
+               VideoVersion.job_id, VideoVersion.status)
+        .where(VideoVersion.video_id == video_id)
+        .order_by(VideoVersion.id)
+    )
+    if after_id is not None:
+        query = query.where(VideoVersion.id > after_id)
+    if quality is not None:
+        query = query.where(VideoVersion.quality == quality)
+    if status is not None:
+        query = query.where(VideoVersion.status == status)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def get_video_versions(db: Session, video_id: int, **filters):
+    return db.execute(video_versions_query(video_id, **filters)).mappings().all()
+
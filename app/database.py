@@ -1,15 +1,57 @@
-# app/database.py
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-
-from app.core.config import settings
-
-# Create a database engine
-engine = create_engine(settings.DATABASE_URL)
-
-# Create a base class for declarative models
-Base = declarative_base()
-
-# Create a SessionLocal class to be used as a dependency in FastAPI
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+# app/database.py
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.core.config import settings
+
+# Async drivers for the sync drivers DATABASE_URL may name
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def _pool_args(url) -> dict:
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {} # In-memory SQLite gets a single shared connection, not a pool
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def async_database_url():
+    if settings.ASYNC_DATABASE_URL:
+        url = make_url(settings.ASYNC_DATABASE_URL)
+    else:
+        url = make_url(settings.DATABASE_URL)
+        url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    if url.get_driver_name() == "asyncpg":
+        # SQLAlchemy's own cache of asyncpg prepared statements
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    return url
+
+def _async_connect_args(url) -> dict:
+    if url.get_driver_name() == "asyncpg":
+        return {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    return {}
+
+# Create a database engine (workers, scripts and the threadpool endpoints)
+engine = create_engine(settings.DATABASE_URL, **_pool_args(make_url(settings.DATABASE_URL)))
+
+# Async engine for the API's async endpoints; connections are only opened on first use
+_async_url = async_database_url()
+async_engine = create_async_engine(_async_url, connect_args=_async_connect_args(_async_url), **_pool_args(_async_url))
+
+# Create a base class for declarative models
+Base = declarative_base()
+
+# Create a SessionLocal class to be used as a dependency in FastAPI
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async counterpart; objects stay readable after commit, since lazy loads can't run there
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -1,8 +1,47 @@
-from app.database import SessionLocal
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+import ipaddress
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in settings.TRUSTED_PROXIES.split(",") if network.strip()
+]
+
+def _trusted(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host.strip())
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def get_client_id(request: Request) -> str:
+    """
+    Who is asking: the caller's address. Behind a trusted proxy, the client
+    id header it sets or else the address it forwarded for; clients can't
+    pick their own identity, so they can't dodge their limits.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _trusted(peer):
+        return peer
+    client_id = request.headers.get(settings.CLIENT_ID_HEADER)
+    if client_id:
+        return client_id[:255]
+    # The nearest address that isn't one of our proxies
+    for host in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        if host.strip() and not _trusted(host):
+            return host.strip()
+    return peer
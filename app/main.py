@@ -1,9 +1,25 @@
-from fastapi import FastAPI
-from app.api.api import api_router
-
-app = FastAPI(
-    title="Video Processing API",
-    description="A microservice for handling and processing videos."
-)
-
-app.include_router(api_router, prefix="/api/v1")
\ No newline at end of file
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from app.api.api import api_router
+from app.api.endpoints import metrics
+from app.database import async_engine
+from app.utils.metrics import JobQueueCollector, RequestMetricsMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await async_engine.dispose()
+
+app = FastAPI(
+    title="Video Processing API",
+    description="A microservice for handling and processing videos.",
+    lifespan=lifespan
+)
+
+app.add_middleware(RequestMetricsMiddleware)
+REGISTRY.register(JobQueueCollector())
+
+app.include_router(api_router, prefix="/api/v1")
+# Served outside /api/v1, where Prometheus looks by default
+app.include_router(metrics.router)
@@ -1,5 +1,5 @@
-# # app/schemas/__init__.py
-# from .video import VideoCreate, VideoResponse
-# from .job import JobCreate, JobResponse, TrimJobCreate
-# from .overlay import OverlayCreate, OverlayResponse, OverlayPosition
+# # app/schemas/__init__.py
+# from .video import VideoCreate, VideoResponse
+# from .job import JobCreate, JobResponse, TrimJobCreate
+# from .overlay import OverlayCreate, OverlayResponse, OverlayPosition
 # from .quality_export import QualityExportCreate 
\ No newline at end of file
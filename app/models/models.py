@@ -1,91 +1,213 @@
-import enum
-from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey, Enum, Float, Text
-)
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-
-from app.database import Base
-
-# --- Enums for specific fields ---
-class JobType(enum.Enum):
-    upload = "upload"
-    trim = "trim"
-    overlay = "overlay"
-    watermark = "watermark"
-    quality_export = "quality_export"
-
-class JobStatus(enum.Enum):
-    pending = "pending"
-    processing = "processing"
-    done = "done"
-    failed = "failed"
-
-class OverlayType(enum.Enum):
-    text = "text"
-    image = "image"
-    video = "video"
-    watermark = "watermark"
-
-class VideoQuality(enum.Enum):
-    p1080 = "1080p"
-    p720 = "720p"
-    p480 = "480p"
-
-# --- Models ---
-class Video(Base):
-    __tablename__ = "videos"
-
-    id = Column(Integer, primary_key=True)
-    filename = Column(String, index=True)
-    duration = Column(Float)
-    size = Column(Integer)
-    upload_time = Column(DateTime(timezone=True), server_default=func.now())
-    original_video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
-
-    # Relationships
-    jobs = relationship("Job", back_populates="video")
-    overlays = relationship("Overlay", back_populates="video")
-    video_versions = relationship("VideoVersion", back_populates="video")
-    # For trimmed videos linking back to the original
-    original_video = relationship("Video", remote_side=[id])
-
-class Job(Base):
-    __tablename__ = "jobs"
-    id = Column(Integer, primary_key=True)
-    video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
-    job_type = Column(Enum(JobType), default=JobType.upload)
-    status = Column(Enum(JobStatus), default=JobStatus.pending)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    completed_at = Column(DateTime(timezone=True), nullable=True)
-    output_file = Column(String, nullable=True)
-    start_time = Column(Float, nullable=True)
-    end_time = Column(Float, nullable=True)
-
-    video = relationship("Video", back_populates="jobs")
-
-class Overlay(Base):
-    __tablename__ = "overlays"
-
-    id = Column(Integer, primary_key=True)
-    video_id = Column(Integer, ForeignKey("videos.id"))
-    type = Column(Enum(OverlayType))
-    content = Column(Text)
-    position = Column(String)
-    start_time = Column(Float)
-    end_time = Column(Float)
-    font_name = Column(String, nullable=True)
-
-    # Relationship
-    video = relationship("Video", back_populates="overlays")
-
-class VideoVersion(Base):
-    __tablename__ = "video_versions"
-
-    id = Column(Integer, primary_key=True)
-    video_id = Column(Integer, ForeignKey("videos.id"))
-    quality = Column(Enum(VideoQuality))
-    file_path = Column(String)
-
-    # Relationship
-    video = relationship("Video", back_populates="video_versions")
\ No newline at end of file
+import enum
+from sqlalchemy import (
+    Column, Integer, BigInteger, Boolean, String, DateTime, ForeignKey, Enum, Float, Text, JSON,
+    LargeBinary
+)
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+
+from app.database import Base
+
+# --- Enums for specific fields ---
+class JobType(enum.Enum):
+    upload = "upload"
+    trim = "trim"
+    overlay = "overlay"
+    watermark = "watermark"
+    quality_export = "quality_export"
+    package = "package"
+    pipeline = "pipeline"
+    previews = "previews"
+    mezzanine = "mezzanine"
+
+class JobStatus(enum.Enum):
+    pending = "pending"
+    processing = "processing"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class OverlayType(enum.Enum):
+    text = "text"
+    image = "image"
+    video = "video"
+    watermark = "watermark"
+
+class VideoQuality(enum.Enum):
+    p1080 = "1080p"
+    p720 = "720p"
+    p480 = "480p"
+
+class UploadStatus(enum.Enum):
+    uploading = "uploading"
+    completed = "completed"
+
+# --- Models ---
+class Video(Base):
+    __tablename__ = "videos"
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String, index=True)
+    duration = Column(Float, index=True)
+    size = Column(Integer)
+    upload_time = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    original_video_id = Column(Integer, ForeignKey("videos.id"), nullable=True, index=True)
+    # Stream metadata from a single ffprobe run (see app/utils/probe.py)
+    container = Column(String, nullable=True)
+    video_codec = Column(String, nullable=True)
+    audio_codec = Column(String, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    fps = Column(Float, nullable=True)
+    bitrate = Column(BigInteger, nullable=True)
+    has_audio = Column(Boolean, nullable=True)
+    rotation = Column(Integer, nullable=True)
+    # Keyframe timestamps, packed float64 (see app/utils/keyframes.py)
+    keyframe_index = Column(LargeBinary, nullable=True)
+    # SHA-256 of the file; derived outputs are cached by it (see app/utils/artifacts.py)
+    content_hash = Column(String(64), nullable=True, index=True)
+    # Directory of the current poster/thumbnails/sprite set under processed/previews/<id>/
+    preview_key = Column(String, nullable=True)
+    # Normalized copy that jobs read instead of this upload (see app/utils/ingest.py)
+    mezzanine_video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
+
+    # Relationships
+    jobs = relationship("Job", back_populates="video")
+    overlays = relationship("Overlay", back_populates="video")
+    video_versions = relationship("VideoVersion", back_populates="video")
+    # For trimmed videos linking back to the original
+    original_video = relationship("Video", remote_side=[id], foreign_keys=[original_video_id])
+    mezzanine = relationship("Video", remote_side=[id], foreign_keys=[mezzanine_video_id])
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), nullable=True, index=True)
+    job_type = Column(Enum(JobType), default=JobType.upload)
+    status = Column(Enum(JobStatus), default=JobStatus.pending, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    output_file = Column(String, nullable=True)
+    start_time = Column(Float, nullable=True)
+    end_time = Column(Float, nullable=True)
+    # Arguments the worker needs to run the job (input paths, quality, ...)
+    params = Column(JSON, nullable=True)
+    # Who asked for the job (see app.utils.admission); workers share out capacity per client
+    client_id = Column(String, nullable=True, index=True)
+    # Lease held by the worker currently running the job
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Set by POST /jobs/{id}/cancel; the worker stops the job (see app/utils/watchdog.py)
+    cancel_requested_at = Column(DateTime(timezone=True), nullable=True)
+    # Live progress reported by FFmpeg (see app/utils/progress.py)
+    progress = Column(Float, nullable=True)
+    eta_seconds = Column(Float, nullable=True)
+    speed = Column(Float, nullable=True)
+    # State of each chunk of a chunked encode: start, end, status, progress
+    chunks = Column(JSON, nullable=True)
+    # What the last run cost (see app/utils/metrics.py)
+    queue_seconds = Column(Float, nullable=True)
+    run_seconds = Column(Float, nullable=True, index=True)
+    ffmpeg_seconds = Column(Float, nullable=True)
+    cpu_seconds = Column(Float, nullable=True)
+    max_rss_bytes = Column(BigInteger, nullable=True)
+    stage_seconds = Column(JSON, nullable=True)
+
+    video = relationship("Video", back_populates="jobs")
+    # Overlay layers, in the order they are composited
+    overlays = relationship("Overlay", order_by="Overlay.id")
+
+class Overlay(Base):
+    __tablename__ = "overlays"
+
+    id = Column(Integer, primary_key=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
+    # Overlay job that renders this layer; all layers of a job share one encode
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True, index=True)
+    type = Column(Enum(OverlayType))
+    content = Column(Text)
+    position = Column(String)
+    start_time = Column(Float)
+    end_time = Column(Float)
+    font_name = Column(String, nullable=True)
+    # Probe result of the overlay image/video file
+    media_info = Column(JSON, nullable=True)
+    # Library file the layer shows (content is then its path in overlays_media/)
+    asset_id = Column(Integer, ForeignKey("overlay_assets.id"), nullable=True, index=True)
+
+    # Relationship
+    video = relationship("Video", back_populates="overlays")
+    asset = relationship("OverlayAsset")
+
+class OverlayAsset(Base):
+    """An overlay image or clip, stored once per content and shared by every layer that shows it."""
+    __tablename__ = "overlay_assets"
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    # Name it was first uploaded under
+    filename = Column(String, nullable=False)
+    # Relative to overlays_media/
+    file_path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    media_info = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class VideoVersion(Base):
+    __tablename__ = "video_versions"
+
+    id = Column(Integer, primary_key=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
+    quality = Column(Enum(VideoQuality))
+    file_path = Column(String)
+    # Job that produced this version and the state of this rendition
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True)
+    status = Column(Enum(JobStatus), nullable=True)
+    # Encoding profile it was rendered with; a later export with the same one reuses it
+    profile = Column(String, nullable=True)
+
+    # Relationship
+    video = relationship("Video", back_populates="video_versions")
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)
+    filename = Column(String)
+    size = Column(BigInteger)
+    # Length of the contiguous prefix written so far; clients resume from here
+    received_bytes = Column(BigInteger, nullable=False, default=0)
+    expected_sha256 = Column(String, nullable=True)
+    sha256 = Column(String, nullable=True)
+    status = Column(Enum(UploadStatus), default=UploadStatus.uploading)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True)
+
+    job = relationship("Job")
+
+class Artifact(Base):
+    """A cached derived file, keyed by the fingerprint of how it was made."""
+    __tablename__ = "artifacts"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), unique=True, nullable=False)
+    operation = Column(String, nullable=False)
+    params = Column(JSON, nullable=True)
+    source_video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
+    file_path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class ArtifactCacheStats(Base):
+    """Artifact cache counters per operation, shared by every worker."""
+    __tablename__ = "artifact_cache_stats"
+
+    operation = Column(String, primary_key=True)
+    hits = Column(BigInteger, nullable=False, default=0)
+    misses = Column(BigInteger, nullable=False, default=0)
+    evictions = Column(BigInteger, nullable=False, default=0)
+    evicted_bytes = Column(BigInteger, nullable=False, default=0)
@@ -1,4 +1,9 @@
-from .video import VideoCreate, VideoResponse
-from .job import JobResponse, TrimJobCreate
-from .overlay import OverlayCreate, OverlayResponse, OverlayPosition
-from .quality_export import QualityExportCreate, VideoVersionResponse
+from .video import VideoCreate, VideoResponse, VideoListItem
+from .job import JobResponse, TrimJobCreate, BatchJobCreate
+from .overlay import OverlayCreate, OverlayLayer, OverlayResponse, OverlayPosition, OverlayRenderMode, OverlayAssetResponse
+from .quality_export import QualityExportCreate, VideoVersionResponse
+from .upload import UploadSessionCreate, UploadSessionResponse
+from .cache import CacheStatsResponse, CacheOperationStats
+from .encoding import EncodingProfileName
+from .preview import PreviewResponse
+from .pipeline import PipelineOperation, TrimOperation, OverlayOperation, ExportOperation
\ No newline at end of file
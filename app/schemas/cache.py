@@ -0,0 +1,17 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List
+
+class CacheOperationStats(BaseModel):
+    operation: str
+    hits: int
+    misses: int
+    evictions: int
+    evicted_bytes: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CacheStatsResponse(BaseModel):
+    budget_bytes: int
+    used_bytes: int
+    artifacts: int
+    operations: List[CacheOperationStats]
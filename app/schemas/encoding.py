@@ -0,0 +1,5 @@
+from typing import Literal
+from app.utils.encoding import ENCODING_PROFILES, INTERNAL_PROFILES
+
+# Encoding profile a job may ask for; without one the server default applies
+EncodingProfileName = Literal[tuple(name for name in ENCODING_PROFILES if name not in INTERNAL_PROFILES)]
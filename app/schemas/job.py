@@ -1,23 +1,55 @@
-from pydantic import BaseModel, ConfigDict
-from datetime import datetime
-from typing import Optional
-from app.models.models import JobType, JobStatus
-
-class JobBase(BaseModel):
-    video_id: Optional[int]
-    job_type: JobType
-    status: JobStatus
-
-class TrimJobCreate(BaseModel):
-    start_time: float
-    end_time: float
-
-class JobResponse(JobBase):
-    id: int
-    created_at: datetime
-    completed_at: Optional[datetime] = None
-    output_file: Optional[str] = None
-    start_time: Optional[float] = None
-    end_time: Optional[float] = None
-
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+from typing import Annotated, List, Literal, Optional, Union
+from app.models.models import JobType, JobStatus
+from app.schemas.encoding import EncodingProfileName
+from app.schemas.quality_export import QualityExportCreate
+
+# Most jobs accepted by POST /jobs/batch, and ids by GET /jobs/
+MAX_BATCH_JOBS = 1000
+
+class JobBase(BaseModel):
+    video_id: Optional[int]
+    job_type: JobType
+    status: JobStatus
+
+class TrimJobCreate(BaseModel):
+    start_time: float
+    end_time: float
+    # Used when the cut can't be spliced from the source's own frames
+    profile: Optional[EncodingProfileName] = None
+
+class BatchTrimJob(TrimJobCreate):
+    type: Literal["trim"]
+    video_id: int
+
+class BatchQualityExportJob(QualityExportCreate):
+    type: Literal["quality_export"]
+    video_id: int
+
+class BatchPackageJob(BaseModel):
+    type: Literal["package"]
+    video_id: int
+
+BatchJobSpec = Annotated[
+    Union[BatchTrimJob, BatchQualityExportJob, BatchPackageJob],
+    Field(discriminator="type")
+]
+
+class BatchJobCreate(BaseModel):
+    jobs: List[BatchJobSpec] = Field(min_length=1, max_length=MAX_BATCH_JOBS)
+
+class JobResponse(JobBase):
+    id: int
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    cancel_requested_at: Optional[datetime] = None
+    client_id: Optional[str] = None
+    output_file: Optional[str] = None
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    progress: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    chunks: Optional[List[dict]] = None
+
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
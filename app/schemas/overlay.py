@@ -1,32 +1,76 @@
-from pydantic import BaseModel, ConfigDict
-from datetime import datetime
-from typing import Optional
-from app.models.models import OverlayType
-import enum
-
-class OverlayPosition(str, enum.Enum):
-    top_left = "top-left"
-    top_right = "top-right"
-    bottom_left = "bottom-left"
-    bottom_right = "bottom-right"
-    center = "center"
-
-class OverlayCreate(BaseModel):
-    type: OverlayType
-    content: str
-    position: OverlayPosition
-    start_time: float
-    end_time: float
-    font_name: Optional[str] = None
-
-class OverlayResponse(BaseModel):
-    id: int
-    video_id: int
-    type: OverlayType
-    content: str
-    position: OverlayPosition
-    start_time: float
-    end_time: float
-    font_name: Optional[str] = None
-
-    model_config = ConfigDict(from_attributes=True)
+from pydantic import BaseModel, ConfigDict, model_validator
+from datetime import datetime
+from typing import Optional
+from app.models.models import OverlayType
+import enum
+
+class OverlayPosition(str, enum.Enum):
+    top_left = "top-left"
+    top_right = "top-right"
+    bottom_left = "bottom-left"
+    bottom_right = "bottom-right"
+    center = "center"
+
+class OverlayRenderMode(str, enum.Enum):
+    full = "full"          # re-encode the whole video
+    windowed = "windowed"  # re-encode only the GOPs under the overlays
+    auto = "auto"          # windowed when the overlays cover a small part of the video
+
+class OverlayCreate(BaseModel):
+    type: OverlayType
+    content: str
+    position: OverlayPosition
+    start_time: float
+    end_time: float
+    font_name: Optional[str] = None
+    asset_id: Optional[int] = None
+    media_info: Optional[dict] = None
+
+class OverlayLayer(BaseModel):
+    """
+    One layer of a multi-layer overlay job; `file` indexes the uploaded files,
+    `asset_id` picks a file from the overlay asset library instead.
+    """
+    type: OverlayType
+    position: OverlayPosition
+    start_time: float
+    end_time: float
+    content: Optional[str] = None
+    font_name: Optional[str] = None
+    file: Optional[int] = None
+    asset_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if self.type == OverlayType.text:
+            if not self.content:
+                raise ValueError("content is required for a text layer")
+        elif (self.file is None) == (self.asset_id is None):
+            raise ValueError(f"either file or asset_id is required for a {self.type.value} layer")
+        if self.end_time < self.start_time:
+            raise ValueError("end_time must not be before start_time")
+        return self
+
+class OverlayResponse(BaseModel):
+    id: int
+    video_id: int
+    job_id: Optional[int] = None
+    type: OverlayType
+    content: str
+    position: OverlayPosition
+    start_time: float
+    end_time: float
+    font_name: Optional[str] = None
+    asset_id: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OverlayAssetResponse(BaseModel):
+    id: int
+    sha256: str
+    filename: str
+    size: int
+    media_info: Optional[dict] = None
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
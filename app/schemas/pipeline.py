@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Literal, Union
+from app.models.models import VideoQuality
+from app.schemas.overlay import OverlayLayer
+
+class TrimOperation(BaseModel):
+    op: Literal["trim"]
+    start_time: float = Field(ge=0)
+    end_time: float
+
+    @model_validator(mode="after")
+    def check_times(self):
+        if self.start_time >= self.end_time:
+            raise ValueError("start_time must be less than end_time")
+        return self
+
+class OverlayOperation(BaseModel):
+    """Layers composited bottom first; their times are on the (trimmed) pipeline timeline."""
+    op: Literal["overlay"]
+    layers: List[OverlayLayer] = Field(min_length=1)
+
+class ExportOperation(BaseModel):
+    op: Literal["export"]
+    quality: VideoQuality
+
+PipelineOperation = Annotated[
+    Union[TrimOperation, OverlayOperation, ExportOperation],
+    Field(discriminator="op")
+]
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List
+
+class PreviewResponse(BaseModel):
+    video_id: int
+    poster: str
+    thumbnails: List[str]
+    # Sprite sheets for timeline scrubbing, indexed by the WebVTT file
+    sprites: List[str]
+    sprites_vtt: str
@@ -1,14 +1,31 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
-from app.models.models import VideoQuality
-
-class QualityExportCreate(BaseModel):
-    quality: VideoQuality
-
-class VideoVersionResponse(BaseModel):
-    id: int
-    video_id: int
-    quality: VideoQuality # This should correctly handle the enum to string conversion
-    file_path: str
-
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import List, Optional
+from app.models.models import VideoQuality, JobStatus
+from app.schemas.encoding import EncodingProfileName
+
+class QualityExportCreate(BaseModel):
+    quality: Optional[VideoQuality] = None
+    # Several qualities are rendered together from a single decode of the source
+    qualities: Optional[List[VideoQuality]] = None
+    # Defaults to a per-quality profile (see app.utils.encoding.QUALITY_PROFILES)
+    profile: Optional[EncodingProfileName] = None
+
+    @model_validator(mode="after")
+    def check_qualities(self):
+        if (self.quality is None) == (not self.qualities):
+            raise ValueError("Provide either 'quality' or a non-empty 'qualities' list.")
+        if self.qualities:
+            # Drop duplicates, keep the requested order
+            self.qualities = list(dict.fromkeys(self.qualities))
+        return self
+
+class VideoVersionResponse(BaseModel):
+    id: int
+    video_id: int
+    quality: VideoQuality # This should correctly handle the enum to string conversion
+    file_path: str
+    job_id: Optional[int] = None
+    status: Optional[JobStatus] = None
+    profile: Optional[str] = None
+
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
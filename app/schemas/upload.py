@@ -0,0 +1,22 @@
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+from typing import Optional
+from app.models.models import UploadStatus
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+    # Optional hex SHA-256 of the whole file, checked when the upload is completed
+    sha256: Optional[str] = None
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    size: int
+    received_bytes: int
+    status: UploadStatus
+    sha256: Optional[str] = None
+    job_id: Optional[int] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
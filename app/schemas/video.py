@@ -1,18 +1,47 @@
-from pydantic import BaseModel, ConfigDict
-from datetime import datetime
-from typing import Optional
-
-class VideoBase(BaseModel):
-    filename: str
-    size: int
-    duration: float
-
-class VideoCreate(VideoBase):
-    pass
-
-class VideoResponse(VideoBase):
-    id: int
-    upload_time: datetime
-    original_video_id: Optional[int] = None
-
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import Optional
+
+class VideoBase(BaseModel):
+    filename: str
+    size: int
+    duration: float
+
+class VideoCreate(VideoBase):
+    pass
+
+class VideoResponse(VideoBase):
+    id: int
+    upload_time: datetime
+    original_video_id: Optional[int] = None
+    container: Optional[str] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    bitrate: Optional[int] = None
+    has_audio: Optional[bool] = None
+    rotation: Optional[int] = None
+    # Normalized copy the jobs read, once it is ready
+    mezzanine_video_id: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class VideoListItem(BaseModel):
+    """A row of GET /videos/; only the requested `fields` are present."""
+    id: int
+    filename: Optional[str] = None
+    size: Optional[int] = None
+    duration: Optional[float] = None
+    upload_time: Optional[datetime] = None
+    original_video_id: Optional[int] = None
+    container: Optional[str] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    bitrate: Optional[int] = None
+    has_audio: Optional[bool] = None
+    rotation: Optional[int] = None
@@ -1,16 +1,16 @@
-# app/schemas/video_version.py
-
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
-from app.models.models import VideoQuality
-
-class QualityExportCreate(BaseModel):
-    quality: VideoQuality
-
-class VideoVersionResponse(BaseModel):
-    id: int
-    video_id: int
-    quality: VideoQuality
-    file_path: str
-
+# app/schemas/video_version.py
+
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from app.models.models import VideoQuality
+
+class QualityExportCreate(BaseModel):
+    quality: VideoQuality
+
+class VideoVersionResponse(BaseModel):
+    id: int
+    video_id: int
+    quality: VideoQuality
+    file_path: str
+
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
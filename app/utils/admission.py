@@ -0,0 +1,103 @@
+# app/utils/admission.py
+"""
+Admission control for the job-creating endpoints.
+
+Before a job is queued, the endpoint checks two limits against the jobs
+table: jobs waiting per job type (JOB_QUEUE_LIMIT, or its JOB_QUEUE_LIMITS
+override) and unfinished jobs per client (CLIENT_JOB_LIMIT). Over either
+limit the request is refused with 429 Too Many Requests and a Retry-After
+of the time the queue needs to drain below the limit at its measured
+throughput, i.e. the jobs finished in the last ADMISSION_WINDOW_SECONDS.
+
+A client is the caller's address or, behind one of TRUSTED_PROXIES, the
+X-Client-Id header (CLIENT_ID_HEADER) the proxy sets (see
+`get_client_id()`). Workers share out their capacity per client as well
+(see `claim_next_job()`).
+
+The check and the insert are not one transaction, so concurrent requests
+can overshoot a limit by a few jobs; the limits are backpressure, not quotas.
+"""
+
+import math
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.job import queue_counts_query
+from app.models.models import JobType
+
+def job_type_setting(value: str, cast=int) -> dict:
+    """Parses a per-job-type setting such as "trim=200,overlay=50"."""
+    values = {}
+    for item in value.split(","):
+        name, _, setting = item.strip().partition("=")
+        if name:
+            values[JobType(name)] = cast(setting)
+    return values
+
+QUEUE_LIMITS = job_type_setting(settings.JOB_QUEUE_LIMITS)
+
+def queue_limit(job_type: JobType) -> int:
+    return QUEUE_LIMITS.get(job_type, settings.JOB_QUEUE_LIMIT)
+
+def retry_after(excess: int, finished: int) -> int:
+    """Seconds until `excess` jobs have drained at the rate of `finished` jobs per window."""
+    if finished:
+        seconds = math.ceil(excess * settings.ADMISSION_WINDOW_SECONDS / finished)
+    else:
+        # Nothing finished lately: the queue may be stuck, ask for the longest wait
+        seconds = settings.ADMISSION_MAX_RETRY_AFTER
+    return min(max(seconds, 1), settings.ADMISSION_MAX_RETRY_AFTER)
+
+def check_admission(counts, job_types: list[JobType]):
+    """
+    Raises 429 when queueing `job_types` would break a limit, given the rows
+    of `queue_counts_query()` for the client.
+    """
+    by_type = {row.job_type: row for row in counts}
+    refusals = []
+
+    for job_type, new in Counter(job_types).items():
+        limit = queue_limit(job_type)
+        row = by_type.get(job_type)
+        queued = row.queued if row else 0
+        if limit and queued + new > limit:
+            refusals.append((
+                f"The {job_type.value} queue is full ({queued} jobs waiting, limit {limit}).",
+                retry_after(queued + new - limit, row.finished if row else 0)
+            ))
+
+    if settings.CLIENT_JOB_LIMIT:
+        client_open = sum(row.client_open for row in counts)
+        if client_open + len(job_types) > settings.CLIENT_JOB_LIMIT:
+            refusals.append((
+                f"Too many unfinished jobs for this client ({client_open}, limit {settings.CLIENT_JOB_LIMIT}).",
+                retry_after(
+                    client_open + len(job_types) - settings.CLIENT_JOB_LIMIT,
+                    sum(row.client_finished for row in counts)
+                )
+            ))
+
+    if refusals:
+        detail, seconds = max(refusals, key=lambda refusal: refusal[1])
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(seconds)}
+        )
+
+def _counts_query(client_id: str):
+    since = datetime.now(timezone.utc) - timedelta(seconds=settings.ADMISSION_WINDOW_SECONDS)
+    return queue_counts_query(client_id, since)
+
+def admit_jobs(db: Session, client_id: str, job_types: list[JobType]):
+    """Refuses the request with 429 unless `job_types` can be queued for `client_id`."""
+    check_admission(db.execute(_counts_query(client_id)).all(), job_types)
+
+async def admit_jobs_async(db: AsyncSession, client_id: str, job_types: list[JobType]):
+    """`admit_jobs()` for async sessions."""
+    check_admission((await db.execute(_counts_query(client_id))).all(), job_types)
@@ -0,0 +1,195 @@
+# app/utils/artifacts.py
+"""
+Content-addressed cache of derived files (quality exports, trims, overlays).
+
+Every derived output is fingerprinted by the SHA-256 of its source file, the
+operation, the operation's normalized parameters and the FFmpeg version. A
+job whose fingerprint is already in the `artifacts` table reuses that file
+instead of encoding it again.
+
+The cache keeps files of its own in `processed/artifacts/`, hardlinked (or
+copied, across filesystems) from the job that encoded them and into the
+output path of every job that reuses them. Videos and video versions never
+point into the cache, so its files are kept under ARTIFACT_CACHE_MAX_BYTES
+by deleting the least recently used ones without regard to who still uses
+the output. Hits, misses and evictions are counted per operation in
+`artifact_cache_stats`.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Artifact, ArtifactCacheStats, Video
+from app.utils.metrics import stage
+
+HASH_CHUNK_SIZE = 1024 * 1024
+ARTIFACTS_FOLDER = os.path.join("processed", "artifacts")
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with stage("io"), open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def video_content_hash(video: Video, path) -> str:
+    """The content hash of a Video row, computed and stored on first use (the caller commits)."""
+    if video.content_hash is None:
+        video.content_hash = file_sha256(path)
+    return video.content_hash
+
+@lru_cache(maxsize=1)
+def ffmpeg_version() -> str:
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "unknown"
+    return result.stdout.splitlines()[0] if result.stdout else "unknown"
+
+def fingerprint(source_hash: str, operation: str, params: dict) -> str:
+    key = {
+        "source": source_hash,
+        "operation": operation,
+        "params": params,
+        "ffmpeg": ffmpeg_version(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def _count(db: Session, operation: str, **increments):
+    values = {getattr(ArtifactCacheStats, name): getattr(ArtifactCacheStats, name) + amount
+              for name, amount in increments.items()}
+    updated = db.query(ArtifactCacheStats).filter(ArtifactCacheStats.operation == operation).update(
+        values, synchronize_session=False
+    )
+    if not updated:
+        try:
+            with db.begin_nested():
+                db.add(ArtifactCacheStats(operation=operation, **{
+                    "hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0, **increments
+                }))
+        except IntegrityError:
+            # Another worker created the row first
+            db.query(ArtifactCacheStats).filter(ArtifactCacheStats.operation == operation).update(
+                values, synchronize_session=False
+            )
+
+def _link(source: str, target: str):
+    """Gives `target` the contents of `source`: a hardlink, or a copy across filesystems."""
+    with stage("io"):
+        if os.path.lexists(target):
+            os.remove(target) # A re-run of the job
+        try:
+            os.link(source, target)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(source, target)
+
+def lookup_artifact(db: Session, operation: str, key: str, output_path: str) -> Artifact | None:
+    """
+    Links the file cached under `key` to `output_path` and counts a hit, or
+    counts a miss. Returns the artifact.
+    """
+    artifact = db.query(Artifact).filter(Artifact.fingerprint == key).first()
+    if artifact:
+        try:
+            _link(artifact.file_path, output_path)
+        except FileNotFoundError:
+            # Evicted meanwhile, or deleted behind the cache's back
+            db.query(Artifact).filter(Artifact.id == artifact.id).delete(synchronize_session=False)
+            artifact = None
+
+    if artifact:
+        artifact.hits += 1
+        artifact.last_used_at = datetime.now(timezone.utc)
+        _count(db, operation, hits=1)
+    else:
+        _count(db, operation, misses=1)
+    db.commit()
+    return artifact
+
+def store_artifact(db: Session, operation: str, key: str, params: dict, file_path: str, source_video_id: int | None):
+    """
+    Links a freshly encoded file into the cache and records it, then evicts
+    down to the disk budget.
+    """
+    os.makedirs(ARTIFACTS_FOLDER, exist_ok=True)
+    cache_path = os.path.join(ARTIFACTS_FOLDER, key + os.path.splitext(file_path)[1])
+    artifact = Artifact(
+        fingerprint=key,
+        operation=operation,
+        params=params,
+        source_video_id=source_video_id,
+        file_path=cache_path,
+        size=os.path.getsize(file_path),
+        last_used_at=datetime.now(timezone.utc)
+    )
+    try:
+        with db.begin_nested():
+            db.add(artifact)
+    except IntegrityError:
+        # An identical job finished first; its file stays the cached one
+        db.commit()
+        return None
+    # Other workers see the row once it is committed, by then with its file
+    _link(file_path, cache_path)
+    db.commit()
+    enforce_budget(db, keep=cache_path)
+    return artifact
+
+def enforce_budget(db: Session, keep: str | None = None):
+    """
+    Deletes least recently used artifacts until the cache fits
+    ARTIFACT_CACHE_MAX_BYTES; `keep` is the file just stored.
+    """
+    budget = settings.ARTIFACT_CACHE_MAX_BYTES
+    if budget <= 0:
+        return
+    used = db.query(func.coalesce(func.sum(Artifact.size), 0)).scalar()
+    if used <= budget:
+        return
+
+    candidates = (
+        db.query(Artifact.id, Artifact.operation, Artifact.file_path, Artifact.size)
+        .order_by(Artifact.last_used_at)
+        .all()
+    )
+    for artifact_id, operation, file_path, size in candidates:
+        if used <= budget:
+            break
+        if keep and os.path.normpath(file_path) == os.path.normpath(keep):
+            continue
+        # Whoever deletes the row owns the eviction (workers may race here)
+        if not db.query(Artifact).filter(Artifact.id == artifact_id).delete(synchronize_session=False):
+            continue
+        # Artifacts cached before the cache had a folder of its own are job
+        # outputs that videos still point at: only their row goes
+        if os.path.dirname(os.path.normpath(file_path)) == os.path.normpath(ARTIFACTS_FOLDER):
+            try:
+                with stage("io"):
+                    os.remove(file_path)
+            except FileNotFoundError:
+                pass
+        used -= size
+        _count(db, operation, evictions=1, evicted_bytes=size)
+        db.commit()
+        print(f"Evicted cached {operation} artifact {file_path} ({size} bytes)")
+
+def cache_stats(db: Session) -> dict:
+    used, count = db.query(func.coalesce(func.sum(Artifact.size), 0), func.count(Artifact.id)).one()
+    return {
+        "budget_bytes": settings.ARTIFACT_CACHE_MAX_BYTES,
+        "used_bytes": used,
+        "artifacts": count,
+        "operations": db.query(ArtifactCacheStats).order_by(ArtifactCacheStats.operation).all(),
+    }
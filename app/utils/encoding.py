@@ -0,0 +1,119 @@
+# app/utils/encoding.py
+"""
+Named encoding profiles and the CPU thread budget of the running job.
+
+A profile fixes everything about a video encode that FFmpeg would otherwise
+pick on its own: encoder, preset, rate control (CRF, optionally capped at
+the quality's bitrate), keyframe interval, thread count and faststart. Jobs
+name a profile in their params; quality exports without one use
+QUALITY_PROFILES, everything else DEFAULT_ENCODING_PROFILE.
+
+The worker gives every job a share of the machine's cores
+(`set_job_threads()`); `run_ffmpeg()` and `encoding_args()` keep FFmpeg's
+decoders, filters and encoders within it, so concurrent jobs don't fight
+over the same cores.
+"""
+
+import math
+
+from app.core.config import settings
+from app.models.models import VideoQuality
+
+ENCODING_PROFILES = {
+    # Quick turnaround, larger files
+    "fast": {"encoder": "libx264", "preset": "veryfast", "crf": 23},
+    # FFmpeg's libx264 defaults, made explicit
+    "balanced": {"encoder": "libx264", "preset": "medium", "crf": 23},
+    # Smaller files at the same quality, several times slower
+    "quality": {"encoder": "libx264", "preset": "slow", "crf": 20},
+    # Streaming renditions: CRF capped at the quality's bitrate (VBV)
+    "streaming": {"encoder": "libx264", "preset": "fast", "crf": 21, "capped": True},
+    # HEVC, about half the size of "balanced", tagged for Apple players
+    "hevc": {"encoder": "libx265", "preset": "medium", "crf": 26, "tag": "hvc1"},
+    # Pieces spliced between stream-copied GOPs; must be close to visually lossless
+    "intermediate": {"encoder": "libx264", "preset": "veryfast", "crf": 18},
+    # Normalized copies of unfriendly uploads that later jobs read (see app/utils/ingest.py)
+    "mezzanine": {"encoder": "libx264", "preset": "fast", "crf": 16},
+}
+
+# Profiles the server encodes with on its own; jobs can't ask for them
+INTERNAL_PROFILES = ("intermediate", "mezzanine")
+
+# Profile of each quality export rendition when the job names none
+QUALITY_PROFILES = {
+    VideoQuality.p1080: "balanced",
+    VideoQuality.p720: "streaming",
+    VideoQuality.p480: "streaming",
+}
+
+# (maxrate, bufsize) of capped profiles per quality
+QUALITY_MAX_BITRATES = {
+    VideoQuality.p1080: ("6M", "12M"),
+    VideoQuality.p720: ("3M", "6M"),
+    VideoQuality.p480: ("1200k", "2400k"),
+}
+
+# Threads the worker granted the job running in this process (None: FFmpeg decides)
+_job_threads = None
+
+def set_job_threads(threads: int | None):
+    global _job_threads
+    _job_threads = threads
+
+def job_threads() -> int | None:
+    return _job_threads
+
+def profile_name(name: str | None, quality: VideoQuality | None = None) -> str:
+    if name:
+        return name
+    if quality is not None:
+        return QUALITY_PROFILES[quality]
+    return settings.DEFAULT_ENCODING_PROFILE
+
+def profile_cache_params(name: str) -> dict:
+    """What a profile changes in the output (threads don't)."""
+    return {"profile": name, **ENCODING_PROFILES[name]}
+
+def encoding_args(name: str, quality: VideoQuality | None = None, encoder: str | None = None,
+                  keyframe_seconds: float | None = None, faststart: bool = True,
+                  keyframe_offset: float = 0.0) -> list[str]:
+    """
+    Video output options of profile `name`. `encoder` overrides the profile's
+    (spliced pieces must match the source codec); `keyframe_seconds` forces
+    a keyframe every that many seconds, counted from `keyframe_offset`
+    seconds before the output starts (a chunk keeps the grid of the video).
+    """
+    profile = ENCODING_PROFILES[name]
+    args = [
+        "-c:v", encoder or profile["encoder"],
+        "-preset", profile["preset"],
+        "-crf", str(profile["crf"]),
+        "-pix_fmt", "yuv420p",
+    ]
+    if profile.get("capped") and quality is not None:
+        max_bitrate, buffer_size = QUALITY_MAX_BITRATES[quality]
+        args.extend(["-maxrate", max_bitrate, "-bufsize", buffer_size])
+    if profile.get("tag") and (encoder is None or encoder == profile["encoder"]):
+        args.extend(["-tag:v", profile["tag"]])
+    if keyframe_seconds and keyframe_offset:
+        first = math.ceil(keyframe_offset / keyframe_seconds - 1e-6)
+        args.extend(["-force_key_frames", f"expr:gte(t+{keyframe_offset:.6f},(n_forced+{first})*{keyframe_seconds})"])
+    elif keyframe_seconds:
+        args.extend(["-force_key_frames", f"expr:gte(t,n_forced*{keyframe_seconds})"])
+    if _job_threads:
+        args.extend(["-threads", str(_job_threads)])
+    if faststart:
+        args.extend(["-movflags", "+faststart"])
+    return args
+
+def limit_threads(command: list[str]) -> list[str]:
+    """Keeps an FFmpeg command's decoders and filter graphs within the job's thread budget."""
+    if not _job_threads or not command or command[0] != "ffmpeg":
+        return command
+    threads = str(_job_threads)
+    limited = [command[0], "-filter_threads", threads, "-filter_complex_threads", threads]
+    for arg in command[1:]:
+        if arg == "-i":
+            limited.extend(["-threads", threads])
+        limited.append(arg)
+    return limited
@@ -1,308 +1,1156 @@
-import subprocess
-import os
-from pathlib import Path
-from sqlalchemy.orm import Session
-from app.models.models import Job, JobStatus, Video, Overlay, JobType, OverlayType, VideoVersion, VideoQuality
-from app.database import SessionLocal
-import json
-
-def get_video_metadata(file_path: Path):
-    """Retrieves video duration and size using ffprobe."""
-    command = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration,size",
-        "-of", "json",
-        str(file_path)
-    ]
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        metadata = json.loads(result.stdout)
-        
-        duration = float(metadata['format']['duration'])
-        size = int(metadata['format']['size'])
-        
-        return {"duration": duration, "size": size}
-    except (subprocess.CalledProcessError, FileNotFoundError, KeyError) as e:
-        raise RuntimeError(f"Failed to get video metadata for {file_path}: {e}")
-
-# This is a temporary function to check for audio stream in a video
-def has_audio_stream(file_path: Path) -> bool:
-    command = ["ffprobe", "-v", "error", "-select_streams", "a", "-show_entries", "stream=codec_type", "-of", "json", str(file_path)]
-    result = subprocess.run(command, capture_output=True, text=True, check=True)
-    metadata = json.loads(result.stdout)
-    return "streams" in metadata and len(metadata["streams"]) > 0
-
-def trim_video_in_background(job_id: int, input_path: str):
-    """Executes the FFmpeg trimming command and updates job status."""
-    db = SessionLocal()
-    try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if not job: return
-
-        job.status = JobStatus.processing
-        db.commit()
-
-        original_video = job.video
-        if not original_video:
-            job.status = JobStatus.failed
-            db.commit()
-            return
-            
-        output_dir = "processed"
-        os.makedirs(output_dir, exist_ok=True)
-        output_filename = f"trimmed_{job.id}_{original_video.filename}"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        command = [
-            "ffmpeg",
-            "-ss", str(job.start_time),
-            "-i", input_path,
-            "-to", str(job.end_time),
-            "-c", "copy",
-            output_path
-        ]
-        
-        subprocess.run(command, check=True)
-
-        new_video = Video(
-            filename=output_filename,
-            size=os.path.getsize(output_path),
-            duration=job.end_time - job.start_time,
-            original_video_id=original_video.id
-        )
-        db.add(new_video)
-        db.commit()
-        db.refresh(new_video)
-
-        job.status = JobStatus.done
-        job.output_file = output_path
-        db.commit()
-
-    except subprocess.CalledProcessError as e:
-        db.rollback()
-        job.status = JobStatus.failed
-        db.commit()
-        print(f"FFmpeg command failed: {e}")
-    finally:
-        db.close()
-
-def add_overlay_in_background(job_id: int, input_path: str):
-    """Executes the FFmpeg overlay command and updates job status."""
-    db = SessionLocal()
-    try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if not job or job.job_type != JobType.overlay: return
-
-        job.status = JobStatus.processing
-        db.commit()
-
-        overlay_data = db.query(Overlay).filter(Overlay.video_id == job.video_id).first()
-        original_video = job.video
-        if not original_video or not overlay_data:
-            job.status = JobStatus.failed
-            db.commit()
-            return
-
-        output_dir = "processed"
-        os.makedirs(output_dir, exist_ok=True)
-        output_filename = f"overlay_{job.id}_{original_video.filename}"
-        output_path = os.path.join(output_dir, output_filename)
-
-        command = [
-            "ffmpeg",
-            "-y", # Overwrite output files without asking
-            "-i", input_path
-        ]
-        
-        # Determine the position coordinates
-        x_pos, y_pos = "", ""
-        if overlay_data.position == "top-left":
-            x_pos, y_pos = "10", "10"
-        elif overlay_data.position == "top-right":
-            x_pos, y_pos = "W-w-10", "10"
-        elif overlay_data.position == "bottom-left":
-            x_pos, y_pos = "10", "H-h-10"
-        elif overlay_data.position == "bottom-right":
-            x_pos, y_pos = "W-w-10", "H-h-10"
-        else: # Default to center
-            x_pos, y_pos = "(W-w)/2", "(H-h)/2"
-
-        if overlay_data.type == OverlayType.text:
-            font_filter = ""
-            if overlay_data.font_name:
-                font_path = os.path.join("fonts", overlay_data.font_name)
-                if os.path.exists(font_path):
-                    font_filter = f":fontfile='{font_path}'"
-                else:
-                    print(f"Warning: Font file not found at {font_path}. Using default font.")
-
-            filter_cmd = (
-                f"drawtext=text='{overlay_data.content}':"
-                f"x={x_pos}:y={y_pos}:"
-                f"fontsize=72:fontcolor=white:borderw=4:bordercolor=black:"
-                f"enable='between(t,{overlay_data.start_time},{overlay_data.end_time})'{font_filter}"
-            )
-            command.extend(["-vf", filter_cmd, "-c:a", "copy"])
-
-        elif overlay_data.type in [OverlayType.image, OverlayType.watermark, OverlayType.video]:
-            overlay_file_path = os.path.join("overlays_media", overlay_data.content)
-            if not os.path.exists(overlay_file_path):
-                raise FileNotFoundError(f"Overlay image/video file not found at {overlay_file_path}")
-
-            is_video_overlay = overlay_file_path.endswith(('.mp4', '.mov', '.avi', '.mkv'))
-            
-            command.extend(["-i", overlay_file_path])
-            
-            if is_video_overlay:
-                overlay_has_audio = has_audio_stream(Path(overlay_file_path))
-
-                filter_complex = f"[0:v][1:v]overlay={x_pos}:{y_pos}:enable='between(t,{overlay_data.start_time},{overlay_data.end_time})'[outv]"
-                command.extend(["-filter_complex", filter_complex, "-map", "[outv]", "-map", "0:a"])
-
-                if overlay_has_audio:
-                    command.extend(["-map", "1:a"])
-                else:
-                    print("Overlay video has no audio stream, skipping audio map for it.")
-
-                command.extend(["-shortest", "-c:a", "copy"])
-            else: # Image overlay
-                filter_complex = f"[0:v][1:v]overlay={x_pos}:{y_pos}:enable='between(t,{overlay_data.start_time},{overlay_data.end_time})'[outv]"
-                command.extend(["-filter_complex", filter_complex, "-map", "[outv]", "-map", "0:a", "-c:a", "copy"])
-
-        else:
-            job.status = JobStatus.failed
-            db.commit()
-            raise ValueError(f"Unsupported overlay type: {overlay_data.type}")
-
-        command.extend([output_path])
-        subprocess.run(command, check=True)
-
-        new_video = Video(
-            filename=output_filename,
-            size=os.path.getsize(output_path),
-            duration=original_video.duration,
-            original_video_id=original_video.id
-        )
-        db.add(new_video)
-        db.commit()
-        db.refresh(new_video)
-
-        job.status = JobStatus.done
-        job.output_file = output_path
-        db.commit()
-
-    except subprocess.CalledProcessError as e:
-        db.rollback()
-        job.status = JobStatus.failed
-        db.commit()
-        print(f"FFmpeg command failed: {e}")
-    except Exception as e:
-        db.rollback()
-        job.status = JobStatus.failed
-        db.commit()
-        print(f"An error occurred: {e}")
-    finally:
-        db.close()
-
-def upload_video_task(job_id: int, file_path: str):
-    """Handles metadata extraction and initial database entry after file is saved."""
-    db = SessionLocal()
-    try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if not job:
-            return
-
-        job.status = JobStatus.processing
-        db.commit()
-
-        metadata = get_video_metadata(Path(file_path))
-
-        new_video = Video(
-            filename=os.path.basename(file_path),
-            size=metadata['size'],
-            duration=metadata['duration'],
-            original_video_id=None
-        )
-        db.add(new_video)
-        db.commit()
-        db.refresh(new_video)
-
-        job.video_id = new_video.id
-        job.status = JobStatus.done
-        job.output_file = file_path
-        db.commit()
-
-    except Exception as e:
-        db.rollback()
-        job.status = JobStatus.failed
-        db.commit()
-        print(f"Upload task failed: {e}")
-    finally:
-        db.close()
-
-def quality_export_in_background(job_id: int, input_video_id: int, quality: VideoQuality):
-    """Generates a new video version with specified quality and updates job status."""
-    db = SessionLocal()
-    try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if not job: return
-
-        job.status = JobStatus.processing
-        db.commit()
-
-        input_video = db.query(Video).filter(Video.id == input_video_id).first()
-        if not input_video:
-            job.status = JobStatus.failed
-            db.commit()
-            return
-            
-        input_file_path = ""
-        if input_video.original_video_id is None:
-            input_file_path = os.path.join("uploads", input_video.filename)
-        else:
-            input_file_path = os.path.join("processed", input_video.filename)
-
-        if not os.path.exists(input_file_path):
-            raise FileNotFoundError(f"Input video file not found at {input_file_path}")
-
-        output_dir = "processed"
-        os.makedirs(output_dir, exist_ok=True)
-        quality_res = ""
-        if quality == VideoQuality.p1080: quality_res = "1920:-1"
-        elif quality == VideoQuality.p720: quality_res = "1280:-1"
-        elif quality == VideoQuality.p480: quality_res = "854:-1"
-        
-        output_filename = f"{quality.value}_{input_video.filename}"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        command = [
-            "ffmpeg",
-            "-i", input_file_path,
-            "-vf", f"scale={quality_res}",
-            "-c:a", "copy",
-            output_path
-        ]
-        
-        subprocess.run(command, check=True)
-
-        new_version = VideoVersion(
-            video_id=input_video.id,
-            quality=quality,
-            file_path=output_path
-        )
-        db.add(new_version)
-        db.commit()
-        db.refresh(new_version)
-
-        job.status = JobStatus.done
-        job.output_file = output_path
-        db.commit()
-
-    except subprocess.CalledProcessError as e:
-        db.rollback()
-        job.status = JobStatus.failed
-        db.commit()
-        print(f"FFmpeg command failed: {e}")
-    finally:
-        db.close()
\ No newline at end of file
+import subprocess
+import math
+import os
+import shutil
+from pathlib import Path
+from sqlalchemy.orm import Session
+from app.models.models import Job, JobStatus, Video, Overlay, JobType, OverlayType, VideoVersion, VideoQuality
+from app.database import SessionLocal
+from app.core.config import settings
+from app.crud.job import mezzanine_job_fields, preview_job_fields
+from app.utils.artifacts import (
+    file_sha256, fingerprint, lookup_artifact, store_artifact, video_content_hash
+)
+from app.utils.probe import probe_media, apply_probe, video_media_info, display_size
+from app.utils.keyframes import video_keyframes
+from app.utils.progress import JobProgress, run_ffmpeg
+from app.utils.watchdog import JobInterrupted
+from app.utils.smartcut import (
+    SMART_CUT_ENCODERS, encode_chunked, plan_chunks, plan_window, smart_cut, splice_window, use_chunks
+)
+from app.utils.encoding import encoding_args, profile_cache_params, profile_name
+from app.utils.ingest import faststart_remux, mezzanine_args, mezzanine_reasons
+
+# Scale filter width per output quality; -2 keeps the aspect ratio with an even height
+QUALITY_SCALES = {
+    VideoQuality.p1080: "1920:-2",
+    VideoQuality.p720: "1280:-2",
+    VideoQuality.p480: "854:-2",
+}
+
+HLS_FOLDER = os.path.join("processed", "hls")
+
+# Preview images: the poster is at most POSTER_HEIGHT tall, thumbnails
+# THUMBNAIL_HEIGHT, and sprite sheets are SPRITE_COLUMNS x SPRITE_ROWS tiles
+# SPRITE_TILE_WIDTH wide
+PREVIEWS_FOLDER = os.path.join("processed", "previews")
+POSTER_HEIGHT = 720
+POSTER_POSITION = 0.1 # fraction of the duration
+THUMBNAIL_HEIGHT = 180
+SPRITE_TILE_WIDTH = 160
+SPRITE_COLUMNS, SPRITE_ROWS = 10, 10
+
+def hls_package_dir(video_id: int) -> str:
+    return os.path.join(HLS_FOLDER, str(video_id))
+
+def previews_dir(video_id: int, key: str) -> str:
+    return os.path.join(PREVIEWS_FOLDER, str(video_id), key)
+
+def video_file_path(video: Video) -> str:
+    """Returns the on-disk path of an uploaded (original) or processed video."""
+    if video.original_video_id is None:
+        return os.path.join("uploads", video.filename)
+    return os.path.join("processed", video.filename)
+
+def job_source(video: Video, path: str) -> tuple[Video, str]:
+    """
+    The Video row and file a job on `video` (stored at `path`) reads: its
+    mezzanine once one is ready (see app/utils/ingest.py), else the video.
+    """
+    mezzanine = video.mezzanine
+    if mezzanine is not None:
+        mezzanine_path = video_file_path(mezzanine)
+        if os.path.exists(mezzanine_path):
+            return mezzanine, mezzanine_path
+    return video, path
+
+def get_video_metadata(file_path: Path):
+    """Retrieves video duration and size using ffprobe."""
+    info = probe_media(file_path)
+    if info["duration"] is None or info["size"] is None:
+        raise RuntimeError(f"Failed to get video metadata for {file_path}: no duration/size")
+    return {"duration": info["duration"], "size": info["size"]}
+
+def has_audio_stream(file_path: Path) -> bool:
+    return probe_media(file_path)["has_audio"]
+
+def quality_width(quality: VideoQuality) -> int:
+    return int(QUALITY_SCALES[quality].split(":")[0])
+
+def quality_cache_params(quality: VideoQuality, profile: str | None = None) -> dict:
+    """What a quality export's output depends on besides the source."""
+    return {
+        "quality": quality.value,
+        "scale": QUALITY_SCALES[quality],
+        "keyframe_interval": settings.HLS_SEGMENT_SECONDS,
+        "encoding": profile_cache_params(profile_name(profile, quality)),
+    }
+
+def preview_params() -> dict:
+    """What a video's preview images depend on besides the source."""
+    return {
+        "poster_height": POSTER_HEIGHT,
+        "poster_position": POSTER_POSITION,
+        "thumbnails": settings.THUMBNAIL_COUNT,
+        "thumbnail_height": THUMBNAIL_HEIGHT,
+        "sprite_interval": settings.SPRITE_INTERVAL_SECONDS,
+        "sprite_tiles": [SPRITE_TILE_WIDTH, SPRITE_COLUMNS, SPRITE_ROWS],
+    }
+
+def rendition_args(quality: VideoQuality, profile: str | None = None, keyframe_offset: float = 0.0,
+                   faststart: bool = True) -> list[str]:
+    """
+    Encoder options of a quality rendition: its profile, plus a keyframe on
+    every HLS segment boundary so renditions switch cleanly.
+    """
+    return encoding_args(
+        profile_name(profile, quality), quality, keyframe_seconds=settings.HLS_SEGMENT_SECONDS,
+        faststart=faststart, keyframe_offset=keyframe_offset
+    )
+
+def derived_video(db: Session, original_video: Video, output_path: str) -> Video:
+    """
+    The Video row of a processed file, created (and probed) unless an earlier
+    run of the job made it. The caller commits it with the job's final state.
+    """
+    output_filename = os.path.basename(output_path)
+    video = (
+        db.query(Video)
+        .filter(Video.original_video_id == original_video.id, Video.filename == output_filename)
+        .first()
+    )
+    if video:
+        return video
+
+    video = Video(
+        filename=output_filename,
+        original_video_id=original_video.id
+    )
+    apply_probe(video, probe_media(output_path))
+    db.add(video)
+    db.flush()
+    return video
+
+def trim_video_in_background(job_id: int, input_path: str):
+    """Executes the FFmpeg trimming command and updates job status."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job: return
+
+        original_video = job.video
+        if not original_video:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+            
+        output_dir = "processed"
+        os.makedirs(output_dir, exist_ok=True)
+        output_filename = f"trimmed_{job.id}_{original_video.filename}"
+        output_path = os.path.join(output_dir, output_filename)
+
+        source, input_path = job_source(original_video, input_path)
+        info = video_media_info(source, input_path)
+        end_time = min(job.end_time, info["duration"]) if info["duration"] else job.end_time
+        profile = profile_name((job.params or {}).get("profile"))
+        cache_params = {
+            "start": round(job.start_time, 3),
+            "end": round(end_time, 3),
+            "encoding": profile_cache_params(profile),
+        }
+        cache_key = fingerprint(video_content_hash(source, input_path), "trim", cache_params)
+
+        artifact = lookup_artifact(db, "trim", cache_key, output_path)
+        if artifact:
+            print(f"Trim job {job.id}: cached {output_path}")
+        else:
+            keyframes = video_keyframes(source, input_path)
+            db.commit() # Keep the index even if the cut fails
+
+            pieces = smart_cut(
+                input_path, output_path,
+                job.start_time, end_time,
+                keyframes, info["video_codec"],
+                work_dir=os.path.join(output_dir, f".trim_{job.id}"),
+                progress=JobProgress(job.id, end_time - job.start_time),
+                profile=profile
+            )
+            print(f"Trim job {job.id}: " + ", ".join(f"{kind} {start:.3f}-{end:.3f}" for kind, start, end in pieces))
+            store_artifact(db, "trim", cache_key, cache_params, output_path, original_video.id)
+
+        derived_video(db, original_video, output_path)
+
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = output_path
+        db.commit()
+
+    except (subprocess.CalledProcessError, RuntimeError) as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"FFmpeg command failed: {e}")
+    finally:
+        db.close()
+
+# (x, y) of each position for the overlay filter (W/H: video, w/h: overlay)
+OVERLAY_POSITIONS = {
+    "top-left": ("10", "10"),
+    "top-right": ("W-w-10", "10"),
+    "bottom-left": ("10", "H-h-10"),
+    "bottom-right": ("W-w-10", "H-h-10"),
+    "center": ("(W-w)/2", "(H-h)/2"),
+}
+# The same for drawtext (w/h: video, tw/th: text)
+TEXT_POSITIONS = {
+    "top-left": ("10", "10"),
+    "top-right": ("w-tw-10", "10"),
+    "bottom-left": ("10", "h-th-10"),
+    "bottom-right": ("w-tw-10", "h-th-10"),
+    "center": ("(w-tw)/2", "(h-th)/2"),
+}
+VIDEO_OVERLAY_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+def build_overlay_graph(overlays, offset: float = 0.0, input_label: str = "0:v", first_input: int = 1,
+                        prefix: str = "v"):
+    """
+    Chains every overlay onto `input_label` in one filter graph, bottom layer
+    first. `offset` is the source time at which input 0 starts (windowed
+    renders), overlay files become inputs `first_input`, ... and the stages
+    are labelled `prefix`1, `prefix`2, ...
+    Returns (extra input args, filter_complex, output label, extra -map args).
+    """
+    input_args = []
+    stages = []
+    audio_maps = []
+    label = input_label
+    next_input = first_input
+
+    for i, overlay_data in enumerate(overlays):
+        start_time = overlay_data.start_time - offset
+        end_time = overlay_data.end_time - offset
+        enable = f"enable='between(t,{start_time},{end_time})'"
+        output = f"{prefix}{i + 1}"
+
+        if overlay_data.type == OverlayType.text:
+            x_pos, y_pos = TEXT_POSITIONS.get(overlay_data.position, TEXT_POSITIONS["center"])
+            font_filter = ""
+            if overlay_data.font_name:
+                font_path = os.path.join("fonts", overlay_data.font_name)
+                if os.path.exists(font_path):
+                    font_filter = f":fontfile='{font_path}'"
+                else:
+                    print(f"Warning: Font file not found at {font_path}. Using default font.")
+
+            stages.append(
+                f"[{label}]drawtext=text='{overlay_data.content}':"
+                f"x={x_pos}:y={y_pos}:"
+                f"fontsize=72:fontcolor=white:borderw=4:bordercolor=black:"
+                f"{enable}{font_filter}[{output}]"
+            )
+
+        elif overlay_data.type in [OverlayType.image, OverlayType.watermark, OverlayType.video]:
+            overlay_file_path = os.path.join("overlays_media", overlay_data.content)
+            if not os.path.exists(overlay_file_path):
+                raise FileNotFoundError(f"Overlay image/video file not found at {overlay_file_path}")
+
+            x_pos, y_pos = OVERLAY_POSITIONS.get(overlay_data.position, OVERLAY_POSITIONS["center"])
+            if overlay_file_path.lower().endswith(VIDEO_OVERLAY_EXTENSIONS):
+                if overlay_data.media_info is None:
+                    overlay_data.media_info = probe_media(overlay_file_path)
+
+                # The clip starts playing when its window opens and disappears when it ends
+                input_args.extend(["-itsoffset", str(max(start_time, 0.0)), "-i", overlay_file_path])
+                stages.append(
+                    f"[{label}][{next_input}:v]overlay={x_pos}:{y_pos}:eof_action=pass:{enable}[{output}]"
+                )
+                if overlay_data.media_info["has_audio"]:
+                    audio_maps.extend(["-map", f"{next_input}:a"])
+                else:
+                    print("Overlay video has no audio stream, skipping audio map for it.")
+            else: # Image overlay, repeated for the whole window
+                input_args.extend(["-i", overlay_file_path])
+                stages.append(f"[{label}][{next_input}:v]overlay={x_pos}:{y_pos}:{enable}[{output}]")
+            next_input += 1
+
+        else:
+            raise ValueError(f"Unsupported overlay type: {overlay_data.type}")
+
+        label = output
+
+    return input_args, ";".join(stages), f"[{label}]", audio_maps
+
+def plan_overlay_window(video, input_path: str, overlays, info: dict, force: bool = False):
+    """
+    Windowed render plan for an overlay job (see smartcut.plan_window), or
+    None when the whole video has to be encoded: the codec can't be spliced,
+    an overlay clip adds an audio track, or (unless `force`) the re-encoded
+    GOPs would cover more than OVERLAY_WINDOW_MAX_FRACTION of the video.
+    """
+    duration = info["duration"]
+    if not duration or info["video_codec"] not in SMART_CUT_ENCODERS:
+        return None
+    for overlay_data in overlays:
+        if overlay_data.type == OverlayType.video and overlay_data.content.lower().endswith(VIDEO_OVERLAY_EXTENSIONS):
+            if overlay_data.media_info is None:
+                overlay_data.media_info = probe_media(os.path.join("overlays_media", overlay_data.content))
+            if overlay_data.media_info["has_audio"]:
+                return None
+
+    window_start = max(min(o.start_time for o in overlays), 0.0)
+    window_end = min(max(o.end_time for o in overlays), duration)
+    if window_end <= window_start:
+        return None
+
+    pieces = plan_window(video_keyframes(video, input_path), window_start, window_end, duration)
+    if pieces is None:
+        return None
+    encoded = sum(end - start for kind, start, end in pieces if kind == "encode")
+    if not force and encoded > duration * settings.OVERLAY_WINDOW_MAX_FRACTION:
+        return None
+    return pieces
+
+def overlay_cache_params(overlay_data: Overlay) -> dict:
+    """An overlay layer as it affects the output: overlay files by content, not by name."""
+    params = {
+        "type": overlay_data.type.value,
+        "position": overlay_data.position,
+        "start_time": overlay_data.start_time,
+        "end_time": overlay_data.end_time,
+        "font_name": overlay_data.font_name,
+    }
+    if overlay_data.type == OverlayType.text:
+        params["content"] = overlay_data.content
+    elif overlay_data.asset_id is not None:
+        params["sha256"] = overlay_data.asset.sha256
+    else:
+        params["sha256"] = file_sha256(os.path.join("overlays_media", overlay_data.content))
+    return params
+
+def compile_pipeline(input_path: str, operations: list[dict], overlays, start: float, end: float,
+                     outputs: list[str | None], profile: str | None = None) -> list[str]:
+    """
+    The single FFmpeg command of a pipeline job. The input is read from
+    `start` to `end` (its trim) and every overlay and export stage is chained,
+    in order, into one filter graph, so the source is decoded once. `outputs`
+    holds, per operation, the file its result is written to (None to skip);
+    the last operation always has one. Overlay operations take their layers
+    from `overlays` in order. Every output is encoded with `profile`.
+    """
+    input_args = []
+    stages = []
+    audio_maps = []
+    output_args = []
+    label = "0:v"
+    next_input = 1
+    quality = None
+    layers = iter(overlays)
+    last = len(operations) - 1
+
+    for i, operation in enumerate(operations):
+        if operation["op"] == "overlay":
+            op_layers = [next(layers) for _ in range(operation["layers"])]
+            layer_inputs, graph, output_label, layer_audio = build_overlay_graph(
+                op_layers, offset=start, input_label=label, first_input=next_input, prefix=f"o{i}_"
+            )
+            input_args.extend(layer_inputs)
+            stages.append(graph)
+            audio_maps.extend(layer_audio)
+            next_input += layer_inputs.count("-i")
+            label = output_label.strip("[]")
+        elif operation["op"] == "export":
+            quality = VideoQuality(operation["quality"])
+            stages.append(f"[{label}]scale={QUALITY_SCALES[quality]}[e{i}]")
+            label = f"e{i}"
+
+        if not outputs[i]:
+            continue
+        if label == "0:v":
+            video_map = "0:v:0"
+        elif i < last:
+            # The stage feeds both this output and the next stage
+            stages.append(f"[{label}]split=2[{label}_out][{label}_next]")
+            video_map = f"[{label}_out]"
+            label = f"{label}_next"
+        else:
+            video_map = f"[{label}]"
+        output_args.extend([
+            "-map", video_map,
+            "-map", "0:a?",
+            *audio_maps,
+            *(rendition_args(quality, profile) if quality else encoding_args(profile_name(profile))),
+            "-c:a", "aac",
+            # An overlay clip's audio must not run past the end of the cut
+            "-t", f"{end - start:.6f}",
+            outputs[i]
+        ])
+
+    command = [
+        "ffmpeg", "-y",
+        "-ss", f"{start:.6f}",
+        "-t", f"{end - start:.6f}",
+        "-i", input_path,
+        *input_args
+    ]
+    if stages:
+        command.extend(["-filter_complex", ";".join(stages)])
+    return command + output_args
+
+def pipeline_cache_params(operations: list[dict], overlays, start: float, end: float,
+                          profile: str | None = None) -> dict:
+    layers = iter(overlays)
+    stages = []
+    encoding = profile_cache_params(profile_name(profile))
+    for operation in operations:
+        if operation["op"] == "overlay":
+            stages.append([overlay_cache_params(next(layers)) for _ in range(operation["layers"])])
+        elif operation["op"] == "export":
+            export_params = quality_cache_params(VideoQuality(operation["quality"]), profile)
+            stages.append(export_params)
+            encoding = export_params["encoding"]
+    return {"start": round(start, 3), "end": round(end, 3), "stages": stages, "encoding": encoding}
+
+def run_pipeline_in_background(job_id: int, input_path: str):
+    """Runs all the operations of a pipeline job (trim, overlays, exports) in one FFmpeg invocation."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job or job.job_type != JobType.pipeline: return
+
+        params = job.params or {}
+        operations = params.get("operations") or []
+        source_video = job.video
+        if not source_video or not operations:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+
+        source, input_path = job_source(source_video, input_path)
+        info = video_media_info(source, input_path)
+        start, end = 0.0, info["duration"]
+        if operations[0]["op"] == "trim":
+            start = operations[0]["start_time"]
+            end = min(operations[0]["end_time"], end) if end else operations[0]["end_time"]
+        if not end or end <= start:
+            raise RuntimeError(f"Nothing to render between {start} and {end}")
+
+        output_dir = "processed"
+        os.makedirs(output_dir, exist_ok=True)
+        keep_intermediates = params.get("keep_intermediates", False)
+        outputs = [
+            os.path.join(output_dir, f"pipeline_{job.id}_{i}_{operation['op']}_{source_video.filename}")
+            if keep_intermediates else None
+            for i, operation in enumerate(operations[:-1])
+        ]
+        output_path = os.path.join(output_dir, f"pipeline_{job.id}_{source_video.filename}")
+        outputs.append(output_path)
+
+        overlays = job.overlays
+        artifact = cache_key = None
+        if not keep_intermediates:
+            # Intermediate files only exist when the pipeline actually runs
+            cache_params = pipeline_cache_params(operations, overlays, start, end, params.get("profile"))
+            cache_key = fingerprint(video_content_hash(source, input_path), "pipeline", cache_params)
+            artifact = lookup_artifact(db, "pipeline", cache_key, output_path)
+
+        if artifact:
+            print(f"Pipeline job {job.id}: cached {output_path}")
+        else:
+            command = compile_pipeline(input_path, operations, overlays, start, end, outputs, params.get("profile"))
+            run_ffmpeg(command, JobProgress(job.id, end - start))
+            if cache_key:
+                store_artifact(db, "pipeline", cache_key, cache_params, output_path, source_video.id)
+            for intermediate_path in outputs[:-1]:
+                if intermediate_path:
+                    derived_video(db, source_video, intermediate_path)
+
+        derived_video(db, source_video, output_path)
+
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = output_path
+        db.commit()
+
+    except (subprocess.CalledProcessError, RuntimeError, FileNotFoundError) as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"Pipeline job {job_id} failed: {e}")
+    finally:
+        db.close()
+
+def add_overlay_in_background(job_id: int, input_path: str):
+    """Composites every overlay layer of the job in a single FFmpeg run."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job or job.job_type != JobType.overlay: return
+
+        overlays = job.overlays
+        if not overlays:
+            # Jobs queued before overlays were linked to their job
+            legacy_overlay = (
+                db.query(Overlay)
+                .filter(Overlay.video_id == job.video_id, Overlay.job_id.is_(None))
+                .order_by(Overlay.id.desc())
+                .first()
+            )
+            overlays = [legacy_overlay] if legacy_overlay else []
+        original_video = job.video
+        if not original_video or not overlays:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+
+        output_dir = "processed"
+        os.makedirs(output_dir, exist_ok=True)
+        output_filename = f"overlay_{job.id}_{original_video.filename}"
+        output_path = os.path.join(output_dir, output_filename)
+
+        source, input_path = job_source(original_video, input_path)
+        info = video_media_info(source, input_path)
+        profile = profile_name((job.params or {}).get("profile"))
+        cache_params = {
+            "layers": [overlay_cache_params(overlay_data) for overlay_data in overlays],
+            "encoding": profile_cache_params(profile),
+        }
+        cache_key = fingerprint(video_content_hash(source, input_path), "overlay", cache_params)
+
+        artifact = lookup_artifact(db, "overlay", cache_key, output_path)
+        if artifact:
+            print(f"Overlay job {job.id}: cached {output_path}")
+        else:
+            pieces = None
+            mode = (job.params or {}).get("mode", "auto")
+            if mode != "full":
+                pieces = plan_overlay_window(source, input_path, overlays, info, force=mode == "windowed")
+                db.commit() # Keep the keyframe index even if the render fails
+
+            progress = JobProgress(job.id, info["duration"])
+            if pieces:
+                print(f"Overlay job {job.id}: " + ", ".join(f"{kind} {start:.3f}-{end:.3f}" for kind, start, end in pieces))
+
+                def encode_window(start, end, piece_path, video_args):
+                    input_args, filter_complex, output_label, _ = build_overlay_graph(overlays, offset=start)
+                    command = [
+                        "ffmpeg", "-y",
+                        "-ss", f"{start:.6f}",
+                        "-i", input_path,
+                        *input_args,
+                        "-filter_complex", filter_complex,
+                        "-map", output_label,
+                        "-t", f"{end - start:.6f}",
+                        *video_args,
+                        piece_path
+                    ]
+                    run_ffmpeg(command, progress, offset=start)
+
+                splice_window(
+                    input_path, output_path, pieces, info["video_codec"],
+                    work_dir=os.path.join(output_dir, f".overlay_{job.id}"),
+                    encode_piece=encode_window,
+                    progress=progress
+                )
+            else:
+                input_args, filter_complex, output_label, audio_maps = build_overlay_graph(overlays)
+                command = [
+                    "ffmpeg",
+                    "-y", # Overwrite output files without asking
+                    "-i", input_path,
+                    *input_args,
+                    "-filter_complex", filter_complex,
+                    "-map", output_label,
+                    "-map", "0:a?",
+                    *audio_maps,
+                    *encoding_args(profile),
+                    "-c:a", "copy"
+                ]
+                if info["duration"]:
+                    # An overlay clip's audio must not run past the end of the video
+                    command.extend(["-t", str(info["duration"])])
+                command.append(output_path)
+                run_ffmpeg(command, progress)
+
+            store_artifact(db, "overlay", cache_key, cache_params, output_path, original_video.id)
+
+        derived_video(db, original_video, output_path)
+
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = output_path
+        db.commit()
+
+    except subprocess.CalledProcessError as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"FFmpeg command failed: {e}")
+    except Exception as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"An error occurred: {e}")
+    finally:
+        db.close()
+
+def upload_video_task(job_id: int, file_path: str):
+    """Handles metadata extraction and initial database entry after file is saved."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            return
+
+        # Before hashing: the remuxed file is the one that is kept
+        if settings.INGEST_FASTSTART and faststart_remux(file_path):
+            print(f"Upload job {job.id}: moved the index of {file_path} to the front")
+
+        new_video = Video(
+            filename=os.path.basename(file_path),
+            original_video_id=None
+        )
+        info = probe_media(file_path)
+        apply_probe(new_video, info)
+        new_video.content_hash = file_sha256(file_path)
+        db.add(new_video)
+        db.flush() # Assigns the id; committed together with the job
+
+        # Poster and thumbnails are rendered right away, by the next free worker
+        db.add(Job(**preview_job_fields(new_video.id), status=JobStatus.pending, client_id=job.client_id))
+
+        if settings.INGEST_MEZZANINE and info["video_codec"]:
+            try:
+                # Stored on the row; later cuts reuse it
+                keyframes = video_keyframes(new_video, file_path)
+            except RuntimeError:
+                keyframes = None
+            reasons = mezzanine_reasons(info, keyframes)
+            if reasons:
+                print(f"Upload job {job.id}: mezzanine needed ({', '.join(reasons)})")
+                db.add(Job(**mezzanine_job_fields(new_video.id, reasons), status=JobStatus.pending, client_id=job.client_id))
+        job.video_id = new_video.id
+        job.status = JobStatus.done
+        job.output_file = file_path
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"Upload task failed: {e}")
+    finally:
+        db.close()
+
+def create_mezzanine_in_background(job_id: int, video_id: int):
+    """
+    Encodes the normalized copy of an upload (see app/utils/ingest.py) and
+    links it to the video, so the jobs that follow read it instead.
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job: return
+
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+
+        input_path = video_file_path(video)
+        info = video_media_info(video, input_path)
+        output_dir = "processed"
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"mezzanine_{video.id}_{os.path.splitext(video.filename)[0]}.mp4")
+
+        progress = JobProgress(job.id, info["duration"])
+        if use_chunks(info["duration"]):
+            keyframes = video_keyframes(video, input_path)
+            db.commit() # Keep the keyframe index even if the encode fails
+            encode_chunked(
+                input_path, output_path, plan_chunks(keyframes, 0.0, info["duration"]),
+                chunk_args=lambda start, end: mezzanine_args(info, keyframe_offset=start, faststart=False),
+                audio_args=["-i", input_path, "-c:a", "aac"],
+                work_dir=os.path.join(output_dir, f".chunks_{job.id}"),
+                progress=progress
+            )
+        else:
+            command = [
+                "ffmpeg", "-y",
+                "-i", input_path,
+                "-map", "0:v:0", "-map", "0:a?",
+                *mezzanine_args(info),
+                "-c:a", "aac",
+                output_path
+            ]
+            run_ffmpeg(command, progress)
+
+        mezzanine = derived_video(db, video, output_path)
+        mezzanine.content_hash = file_sha256(output_path)
+        video.mezzanine_video_id = mezzanine.id
+
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = output_path
+        db.commit()
+
+    except (subprocess.CalledProcessError, RuntimeError, FileNotFoundError) as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"Mezzanine job {job_id} failed: {e}")
+    finally:
+        db.close()
+
+def quality_export_in_background(job_id: int, input_video_id: int, quality: VideoQuality):
+    """Generates a new video version with specified quality and updates job status."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job: return
+
+        input_video = db.query(Video).filter(Video.id == input_video_id).first()
+        if not input_video:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+            
+        profile = (job.params or {}).get("profile")
+        version_profile = profile_name(profile, quality)
+        # Exported before: the job gets that version instead of another copy
+        existing = (
+            db.query(VideoVersion)
+            .filter(
+                VideoVersion.video_id == input_video.id,
+                VideoVersion.quality == quality,
+                VideoVersion.profile == version_profile,
+                VideoVersion.status == JobStatus.done
+            )
+            .order_by(VideoVersion.id)
+            .first()
+        )
+        if existing and os.path.exists(existing.file_path):
+            print(f"Quality export job {job.id}: reusing version {existing.id}")
+            job.status = JobStatus.done
+            job.progress = 100.0
+            job.eta_seconds = None
+            job.output_file = existing.file_path
+            db.commit()
+            return
+
+        source, input_file_path = job_source(input_video, video_file_path(input_video))
+
+        if not os.path.exists(input_file_path):
+            raise FileNotFoundError(f"Input video file not found at {input_file_path}")
+        info = video_media_info(source, input_file_path)
+
+        output_dir = "processed"
+        os.makedirs(output_dir, exist_ok=True)
+        quality_res = QUALITY_SCALES[quality]
+        
+        output_filename = f"{quality.value}_{job.id}_{input_video.filename}"
+        output_path = os.path.join(output_dir, output_filename)
+
+        cache_params = quality_cache_params(quality, profile)
+        cache_key = fingerprint(video_content_hash(source, input_file_path), "quality_export", cache_params)
+        artifact = lookup_artifact(db, "quality_export", cache_key, output_path)
+        if artifact:
+            print(f"Quality export job {job.id}: cached {output_path}")
+        else:
+            progress = JobProgress(job.id, info["duration"])
+            if use_chunks(info["duration"]):
+                keyframes = video_keyframes(source, input_file_path)
+                db.commit() # Keep the keyframe index even if the encode fails
+                chunks = plan_chunks(keyframes, 0.0, info["duration"])
+                print(f"Quality export job {job.id}: {len(chunks)} chunks")
+                encode_chunked(
+                    input_file_path, output_path, chunks,
+                    chunk_args=lambda start, end: [
+                        "-vf", f"scale={quality_res}",
+                        *rendition_args(quality, profile, keyframe_offset=start, faststart=False)
+                    ],
+                    audio_args=["-i", input_file_path, "-c:a", "copy"],
+                    work_dir=os.path.join(output_dir, f".chunks_{job.id}"),
+                    progress=progress
+                )
+            else:
+                command = [
+                    "ffmpeg",
+                    "-y",
+                    "-i", input_file_path,
+                    "-vf", f"scale={quality_res}",
+                    *rendition_args(quality, profile),
+                    "-c:a", "copy",
+                    output_path
+                ]
+                run_ffmpeg(command, progress)
+            store_artifact(db, "quality_export", cache_key, cache_params, output_path, input_video.id)
+
+        new_version = VideoVersion(
+            video_id=input_video.id,
+            quality=quality,
+            file_path=output_path,
+            job_id=job.id,
+            status=JobStatus.done,
+            profile=version_profile
+        )
+        db.add(new_version)
+
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = output_path
+        db.commit()
+
+    except (subprocess.CalledProcessError, FileNotFoundError, RuntimeError) as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"Quality export failed: {e}")
+    finally:
+        db.close()
+
+def multi_quality_export_in_background(job_id: int, input_video_id: int, qualities: list[VideoQuality]):
+    """
+    Renders several qualities of a video in one ffmpeg run: the source is
+    decoded once and split into one scaler/encoder branch per quality.
+    Each output gets its own VideoVersion row carrying its own status.
+    """
+    db = SessionLocal()
+    job = None
+    versions = []
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job: return
+
+        input_video = db.query(Video).filter(Video.id == input_video_id).first()
+        if not input_video:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+
+        source, input_file_path = job_source(input_video, video_file_path(input_video))
+        if not os.path.exists(input_file_path):
+            raise FileNotFoundError(f"Input video file not found at {input_file_path}")
+
+        output_dir = "processed"
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Renditions wider than the source would only be upscaled copies; skip
+        # them (but always render at least the smallest one requested).
+        info = video_media_info(source, input_file_path)
+        source_width, _ = display_size(info)
+        if source_width:
+            fitting = [q for q in qualities if quality_width(q) <= source_width]
+            qualities = fitting or [min(qualities, key=quality_width)]
+
+        profile = (job.params or {}).get("profile")
+        # A re-run of the job (expired lease) reuses the rows of the previous attempt
+        existing = {v.quality: v for v in db.query(VideoVersion).filter(VideoVersion.job_id == job.id)}
+        for quality in qualities:
+            version = existing.get(quality) or VideoVersion(
+                video_id=input_video.id,
+                quality=quality,
+                job_id=job.id,
+                file_path=os.path.join(output_dir, f"{quality.value}_{job.id}_{input_video.filename}"),
+                profile=profile_name(profile, quality)
+            )
+            version.status = JobStatus.processing
+            db.add(version)
+            versions.append(version)
+
+        # Qualities already in the artifact cache are not encoded again
+        source_hash = video_content_hash(source, input_file_path)
+        to_encode = []
+        for version in versions:
+            cache_key = fingerprint(source_hash, "quality_export", quality_cache_params(version.quality, profile))
+            artifact = lookup_artifact(db, "quality_export", cache_key, version.file_path)
+            if artifact:
+                version.status = JobStatus.done
+            else:
+                to_encode.append((version, cache_key))
+        db.commit()
+
+        if to_encode:
+            split_labels = "".join(f"[s{i}]" for i in range(len(to_encode)))
+            filter_complex = f"[0:v]split={len(to_encode)}{split_labels}"
+            for i, (version, _) in enumerate(to_encode):
+                filter_complex += f";[s{i}]scale={QUALITY_SCALES[version.quality]}[v{i}]"
+
+            command = ["ffmpeg", "-y", "-i", input_file_path, "-filter_complex", filter_complex]
+            for i, (version, _) in enumerate(to_encode):
+                command.extend([
+                    "-map", f"[v{i}]", "-map", "0:a?",
+                    *rendition_args(version.quality, profile),
+                    "-c:a", "copy",
+                    version.file_path
+                ])
+
+            try:
+                run_ffmpeg(command, JobProgress(job.id, info["duration"]))
+            except JobInterrupted:
+                raise
+            except subprocess.CalledProcessError as e:
+                # One failing branch stops the run; the renditions written in full are kept
+                print(f"Multi-quality export job {job.id}: FFmpeg exited with {e.returncode}")
+
+            for version, cache_key in to_encode:
+                produced = _rendition_complete(version.file_path, info["duration"])
+                version.status = JobStatus.done if produced else JobStatus.failed
+                if not produced and os.path.exists(version.file_path):
+                    os.remove(version.file_path)
+                if produced:
+                    store_artifact(
+                        db, "quality_export", cache_key, quality_cache_params(version.quality, profile),
+                        version.file_path, input_video.id
+                    )
+
+        all_done = all(v.status == JobStatus.done for v in versions)
+        job.status = JobStatus.done if all_done else JobStatus.failed
+        if all_done:
+            job.progress = 100.0
+            job.eta_seconds = None
+        job.output_file = versions[0].file_path
+        db.commit()
+
+    except (subprocess.CalledProcessError, FileNotFoundError, RuntimeError) as e:
+        _fail_multi_quality_export(db, job, versions)
+        print(f"Multi-quality export failed: {e}")
+    except Exception:
+        # Unexpected: the worker reports it, but no version may stay at processing
+        try:
+            _fail_multi_quality_export(db, job, versions)
+        except Exception as e:
+            print(f"Multi-quality export: could not mark versions failed: {e}")
+        raise
+    finally:
+        db.close()
+
+def _rendition_complete(path: str, duration: float | None) -> bool:
+    """Whether FFmpeg wrote `path` in full: it probes, and as long as the source (within a second)."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    try:
+        probed = probe_media(path)["duration"]
+    except RuntimeError:
+        return False
+    return not duration or (probed is not None and probed >= duration - 1.0)
+
+def _fail_multi_quality_export(db: Session, job: Job | None, versions: list[VideoVersion]):
+    db.rollback()
+    for version in versions:
+        # Renditions committed as done (cached ones) stay done
+        if version.status != JobStatus.done:
+            version.status = JobStatus.failed
+    if job:
+        job.status = JobStatus.failed
+    db.commit()
+
+def package_hls_in_background(job_id: int, video_id: int):
+    """
+    Packages every finished quality version of a video as fMP4 HLS: one media
+    playlist with its init segment and .m4s segments per quality, plus a
+    master playlist listing them all. Segments are stream-copied, not re-encoded.
+    """
+    db = SessionLocal()
+    staging_dir = None
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job: return
+
+        # Latest finished version of each quality (legacy rows have no status)
+        versions = {}
+        for version in (
+            db.query(VideoVersion)
+            .filter(VideoVersion.video_id == video_id)
+            .order_by(VideoVersion.id)
+        ):
+            if version.status in (None, JobStatus.done) and os.path.exists(version.file_path):
+                versions[version.quality] = version
+        if not versions:
+            job.status = JobStatus.failed
+            db.commit()
+            print(f"No finished video versions to package for video {video_id}")
+            return
+
+        # Built next to the live package and swapped in at the end, so players
+        # never see a half-written playlist.
+        package_dir = hls_package_dir(video_id)
+        staging_dir = f"{package_dir}.tmp-{job.id}"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+        master_lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        video = db.query(Video).filter(Video.id == video_id).first()
+        duration = video.duration if video else None
+        progress = JobProgress(job.id, duration * len(versions) if duration else None)
+        # Highest quality first: players start with the first variant listed
+        for i, quality in enumerate([q for q in VideoQuality if q in versions]):
+            rendition_dir = os.path.join(staging_dir, quality.value)
+            os.makedirs(rendition_dir)
+            command = [
+                "ffmpeg", "-y",
+                "-i", versions[quality].file_path,
+                "-map", "0:v", "-map", "0:a?",
+                "-c", "copy",
+                "-f", "hls",
+                "-hls_time", str(settings.HLS_SEGMENT_SECONDS),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_type", "fmp4",
+                "-hls_fmp4_init_filename", "init.mp4",
+                "-hls_segment_filename", os.path.join(rendition_dir, "seg_%05d.m4s"),
+                # A single-variant master, only used for its BANDWIDTH/RESOLUTION/CODECS line
+                "-master_pl_name", "variant.m3u8",
+                os.path.join(rendition_dir, "index.m3u8")
+            ]
+            run_ffmpeg(command, progress, offset=i * (duration or 0))
+
+            with open(os.path.join(rendition_dir, "variant.m3u8")) as f:
+                stream_inf = next(line.strip() for line in f if line.startswith("#EXT-X-STREAM-INF"))
+            os.remove(os.path.join(rendition_dir, "variant.m3u8"))
+            master_lines.extend([stream_inf, f"{quality.value}/index.m3u8"])
+
+        with open(os.path.join(staging_dir, "master.m3u8"), "w") as f:
+            f.write("\n".join(master_lines) + "\n")
+
+        shutil.rmtree(package_dir, ignore_errors=True)
+        os.replace(staging_dir, package_dir)
+        staging_dir = None
+
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = os.path.join(package_dir, "master.m3u8")
+        db.commit()
+
+    except (subprocess.CalledProcessError, OSError, StopIteration) as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"HLS packaging failed: {e}")
+    finally:
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        db.close()
+
+def sprite_tile_size(info: dict) -> tuple[int, int]:
+    """Tile size of the sprite sheets: SPRITE_TILE_WIDTH wide, the video's aspect ratio (16:9 if unknown)."""
+    width, height = display_size(info)
+    if not width or not height:
+        width, height = 16, 9
+    return SPRITE_TILE_WIDTH, max(2, round(SPRITE_TILE_WIDTH * height / width / 2) * 2)
+
+def compile_previews(input_path: str, output_dir: str, duration: float, tile_size: tuple[int, int]) -> list[str]:
+    """
+    The FFmpeg command that writes poster.jpg, thumb_NN.jpg and sprite_NNN.jpg
+    into `output_dir`. The source is decoded once and scaled down before the
+    graph splits, so the three branches only handle small frames.
+    """
+    count = settings.THUMBNAIL_COUNT
+    tile_width, tile_height = tile_size
+    # Short videos get a sheet with only as many rows as they fill
+    tiles = math.ceil(duration / settings.SPRITE_INTERVAL_SECONDS)
+    rows = min(SPRITE_ROWS, math.ceil(tiles / SPRITE_COLUMNS))
+    filter_complex = ";".join([
+        f"[0:v]scale=-2:'min({POSTER_HEIGHT},ih)',split=3[poster][thumbs][sprite]",
+        f"[poster]select='gte(t,{duration * POSTER_POSITION:.3f})'[p]",
+        # One thumbnail in the middle of each of `count` equal parts
+        f"[thumbs]select='gte(t,{duration / count / 2:.6f}+{duration / count:.6f}*selected_n)',"
+        f"scale=-2:{THUMBNAIL_HEIGHT}[t]",
+        f"[sprite]fps=fps=1/{settings.SPRITE_INTERVAL_SECONDS},scale={tile_width}:{tile_height},"
+        f"tile={SPRITE_COLUMNS}x{rows}[s]",
+    ])
+    return [
+        "ffmpeg", "-y",
+        "-i", input_path,
+        "-filter_complex", filter_complex,
+        "-map", "[p]", "-fps_mode", "passthrough", "-frames:v", "1", "-update", "1", "-q:v", "2",
+        os.path.join(output_dir, "poster.jpg"),
+        "-map", "[t]", "-fps_mode", "passthrough", "-frames:v", str(count), "-q:v", "3",
+        os.path.join(output_dir, "thumb_%02d.jpg"),
+        "-map", "[s]", "-q:v", "4", os.path.join(output_dir, "sprite_%03d.jpg"),
+    ]
+
+def _vtt_timestamp(seconds: float) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+def write_sprite_vtt(path: str, duration: float, tile_size: tuple[int, int]):
+    """WebVTT index of the sprite sheets: one cue per tile, pointing at it with a #xywh fragment."""
+    interval = settings.SPRITE_INTERVAL_SECONDS
+    tile_width, tile_height = tile_size
+    tiles_per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    lines = ["WEBVTT", ""]
+    for i in range(math.ceil(duration / interval)):
+        sheet, tile = divmod(i, tiles_per_sheet)
+        row, column = divmod(tile, SPRITE_COLUMNS)
+        start = i * interval
+        lines.extend([
+            f"{_vtt_timestamp(start)} --> {_vtt_timestamp(min(start + interval, duration))}",
+            f"sprite_{sheet + 1:03d}.jpg#xywh={column * tile_width},{row * tile_height},{tile_width},{tile_height}",
+            ""
+        ])
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+def generate_previews_in_background(job_id: int, video_id: int):
+    """
+    Renders a video's poster frame, THUMBNAIL_COUNT evenly spaced thumbnails
+    and scrubbing sprite sheets with their WebVTT index in one FFmpeg run.
+    The set is keyed by the source's content, so it is rendered once per video
+    and a file, once written, never changes.
+    """
+    db = SessionLocal()
+    staging_dir = None
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job: return
+
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            job.status = JobStatus.failed
+            db.commit()
+            return
+
+        source, input_path = job_source(video, video_file_path(video))
+        info = video_media_info(source, input_path)
+        duration = info["duration"]
+        if not duration:
+            raise RuntimeError(f"Unknown duration of {input_path}")
+
+        key = fingerprint(video_content_hash(source, input_path), "previews", preview_params())[:16]
+        output_dir = previews_dir(video.id, key)
+        if os.path.exists(os.path.join(output_dir, "sprite.vtt")):
+            print(f"Previews job {job.id}: cached {output_dir}")
+        else:
+            # Written next to the final directory and swapped in complete
+            staging_dir = f"{output_dir}.tmp-{job.id}"
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir)
+            tile_size = sprite_tile_size(info)
+            run_ffmpeg(compile_previews(input_path, staging_dir, duration, tile_size), JobProgress(job.id, duration))
+            write_sprite_vtt(os.path.join(staging_dir, "sprite.vtt"), duration, tile_size)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            os.replace(staging_dir, output_dir)
+            staging_dir = None
+
+        video.preview_key = key
+        job.status = JobStatus.done
+        job.progress = 100.0
+        job.eta_seconds = None
+        job.output_file = os.path.join(output_dir, "poster.jpg")
+        db.commit()
+
+    except (subprocess.CalledProcessError, OSError, RuntimeError) as e:
+        db.rollback()
+        job.status = JobStatus.failed
+        db.commit()
+        print(f"Preview generation failed: {e}")
+    finally:
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        db.close()
@@ -0,0 +1,214 @@
+# app/utils/file_response.py
+"""
+File responses with HTTP range and conditional request support.
+
+`file_response()` is a drop-in replacement for `FileResponse` that answers:
+
+- `If-None-Match` / `If-Modified-Since` with `304 Not Modified`,
+- `Range` with `206 Partial Content` (several ranges as `multipart/byteranges`),
+  honouring `If-Range`, or `416` when no range can be satisfied.
+
+The body is sent with the ASGI `http.response.zerocopysend` extension
+(`sendfile` in the server) when the server offers it, and read in large
+chunks from a worker thread otherwise.
+"""
+
+import mimetypes
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request
+from starlette.responses import Response
+
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/iso.segment", ".m4s")
+mimetypes.add_type("video/mp4", ".mp4")
+
+CHUNK_SIZE = 256 * 1024
+# More ranges than this in one request is served as a plain 200
+MAX_RANGES = 16
+
+def make_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag, weak=True)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _if_range_allows(request: Request, etag: str, last_modified: str) -> bool:
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Strong comparison only: a weak validator never matches
+        return if_range == etag
+    return if_range == last_modified
+
+def parse_range_header(header: str, size: int):
+    """
+    Parses `bytes=...` into a sorted list of (start, end) inclusive ranges,
+    merging overlaps. Returns None when the header should be ignored
+    (malformed, not bytes, too many ranges) and [] when nothing is satisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    parts = spec.split(",")
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first == "":
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(0, size - suffix), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class RangeFileResponse(Response):
+    """Streams byte ranges of a file; `parts` is a list of (prefix, start, end, suffix)."""
+
+    def __init__(self, path, parts, status_code: int, headers: dict, media_type: str, send_body: bool):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.parts = parts
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        async with await anyio.open_file(self.path, "rb") as f:
+            for prefix, start, end, suffix in self.parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                if zerocopy:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": f.wrapped,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": True,
+                    })
+                else:
+                    await f.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        chunk = await f.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                if suffix:
+                    await send({"type": "http.response.body", "body": suffix, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def file_response(
+    request: Request,
+    path,
+    media_type: str | None = None,
+    filename: str | None = None,
+    headers: dict | None = None,
+) -> Response:
+    path = str(path)
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = make_etag(stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    response_headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": last_modified,
+        **(headers or {}),
+    }
+    if filename:
+        response_headers["content-disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=response_headers)
+
+    send_body = request.method != "HEAD"
+    range_header = request.headers.get("range")
+    ranges = None
+    if range_header and _if_range_allows(request, etag, last_modified):
+        ranges = parse_range_header(range_header, size)
+
+    if ranges is None:
+        response_headers["content-length"] = str(size)
+        return RangeFileResponse(path, [(b"", 0, size - 1, b"")] if size else [], 200, response_headers, media_type, send_body)
+
+    if not ranges:
+        return Response(status_code=416, headers={**response_headers, "content-range": f"bytes */{size}"})
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response_headers["content-range"] = f"bytes {start}-{end}/{size}"
+        response_headers["content-length"] = str(end - start + 1)
+        return RangeFileResponse(path, [(b"", start, end, b"")], 206, response_headers, media_type, send_body)
+
+    boundary = secrets.token_hex(16)
+    parts = []
+    length = 0
+    for i, (start, end) in enumerate(ranges):
+        prefix = (b"\r\n" if i else b"") + (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("latin-1")
+        suffix = f"\r\n--{boundary}--\r\n".encode("latin-1") if i == len(ranges) - 1 else b""
+        parts.append((prefix, start, end, suffix))
+        length += len(prefix) + (end - start + 1) + len(suffix)
+    response_headers["content-length"] = str(length)
+    return RangeFileResponse(
+        path, parts, 206, response_headers, f"multipart/byteranges; boundary={boundary}", send_body
+    )
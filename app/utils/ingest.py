@@ -0,0 +1,102 @@
+# app/utils/ingest.py
+"""
+Ingest normalization of uploads.
+
+Faststart: an MP4/MOV whose index (the `moov` box) follows the media data
+makes players, and our own range readers, fetch the end of the file before
+the first frame. `faststart_remux()` moves the index to the front with a
+stream-copy remux (no re-encode), in place, before the upload is hashed
+and registered.
+
+Mezzanine: a source with a codec the jobs can't splice, a variable frame
+rate or (nearly) only keyframes makes every later trim, overlay and export
+slower. `mezzanine_reasons()` tells which of these apply; the mezzanine job
+then encodes one normalized H.264 copy (constant frame rate, a keyframe
+every MEZZANINE_KEYFRAME_SECONDS) that later jobs read instead of the upload
+(see `job_source()` in app.utils.ffmpeg).
+"""
+
+import os
+import struct
+import subprocess
+
+from app.core.config import settings
+from app.utils.encoding import encoding_args
+from app.utils.progress import run_ffmpeg
+
+# Codecs the jobs handle well: smart cuts splice them, decoders are fast
+FRIENDLY_CODECS = ("h264", "hevc")
+
+def moov_after_mdat(path) -> bool:
+    """Whether an MP4/MOV file stores its index after the media data (False for other files)."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size, kind = struct.unpack(">I4s", header)
+            header_size = 8
+            if size == 1:
+                extended = f.read(8)
+                if len(extended) < 8:
+                    return False
+                size = struct.unpack(">Q", extended)[0]
+                header_size = 16
+            if kind == b"moov":
+                return False
+            if kind == b"mdat":
+                return True
+            if size < header_size:
+                # 0 (box runs to the end of the file) or not an ISO media file at all
+                return False
+            f.seek(size - header_size, os.SEEK_CUR)
+
+def faststart_remux(path: str) -> bool:
+    """
+    Moves the index of `path` to the front when it is at the end; returns
+    whether the file was rewritten. A failed remux leaves the file as it was.
+    """
+    if not moov_after_mdat(path):
+        return False
+    stem, ext = os.path.splitext(path)
+    remuxed_path = f"{stem}.faststart{ext}"
+    command = [
+        "ffmpeg", "-y",
+        "-i", path,
+        "-map", "0", "-c", "copy",
+        "-movflags", "+faststart",
+        remuxed_path
+    ]
+    try:
+        run_ffmpeg(command)
+    except subprocess.CalledProcessError as e:
+        print(f"Faststart remux of {path} failed, keeping the original: {e}")
+        if os.path.exists(remuxed_path):
+            os.remove(remuxed_path)
+        return False
+    os.replace(remuxed_path, path)
+    return True
+
+def mezzanine_reasons(info: dict, keyframes) -> list[str]:
+    """Why a source (probe result and keyframe index) needs a mezzanine; empty when it doesn't."""
+    if not info.get("video_codec") or not info.get("duration"):
+        return []
+    reasons = []
+    if info["video_codec"] not in FRIENDLY_CODECS:
+        reasons.append("codec")
+    if info.get("variable_frame_rate"):
+        reasons.append("vfr")
+    # Average keyframe interval
+    if keyframes and info["duration"] / len(keyframes) < settings.MEZZANINE_MIN_GOP_SECONDS:
+        reasons.append("intra")
+    return reasons
+
+def mezzanine_args(info: dict, keyframe_offset: float = 0.0, faststart: bool = True) -> list[str]:
+    """Video output options of a mezzanine: constant frame rate and a regular keyframe interval."""
+    args = []
+    if info.get("fps"):
+        args.extend(["-fps_mode", "cfr", "-r", f"{info['fps']:.3f}"])
+    return args + encoding_args(
+        "mezzanine", keyframe_seconds=settings.MEZZANINE_KEYFRAME_SECONDS,
+        keyframe_offset=keyframe_offset, faststart=faststart
+    )
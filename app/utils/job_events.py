@@ -0,0 +1,179 @@
+# app/utils/job_events.py
+"""
+Push notifications for job status and progress.
+
+Every commit that changes a job's status or progress sends a Postgres
+`NOTIFY job_events` with the job's new state: `_notify_job_changes` covers
+ORM flushes of every session, sync or async, and the write paths that use
+bulk INSERT / UPDATE statements, which skip the flush, call `notify_jobs()`
+with the rows they wrote. In the API process, `job_events` (a
+`JobEventHub`) holds one `LISTEN` connection and fans the notifications out
+to the clients subscribed to those jobs, so streaming clients cost no
+queries at all. On other databases, or if listening fails, the hub falls
+back to one query per JOB_EVENTS_POLL_INTERVAL for all subscribed jobs
+together.
+"""
+
+import asyncio
+import json
+import select
+import threading
+import time
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.database import SessionLocal, engine
+from app.models.models import Job, JobStatus
+
+CHANNEL = "job_events"
+FINAL_STATUSES = (JobStatus.done.value, JobStatus.failed.value, JobStatus.cancelled.value)
+
+# Seconds between LISTEN reconnects, doubling up to the maximum
+LISTEN_RETRY_DELAY = 1
+LISTEN_RETRY_MAX_DELAY = 60
+
+# What a bulk write returns for `notify_jobs()`
+EVENT_COLUMNS = (Job.id, Job.status, Job.progress, Job.eta_seconds)
+
+def job_event(job) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status.value if job.status else None,
+        "progress": job.progress,
+        "eta_seconds": job.eta_seconds,
+    }
+
+def notifies(session) -> bool:
+    return session.bind is not None and session.bind.dialect.name == "postgresql"
+
+def _publish(connection, payload: dict):
+    # Delivered when the transaction commits, never for a rollback
+    connection.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": json.dumps(payload)}
+    )
+
+def notify_jobs(session: Session, jobs):
+    """
+    Publishes the state of `jobs` (rows or objects with the `job_event()`
+    columns) written by a bulk statement. Async sessions call it through
+    `run_sync`.
+    """
+    if not notifies(session):
+        return
+    connection = session.connection()
+    for job in jobs:
+        _publish(connection, job_event(job))
+
+@event.listens_for(Session, "after_flush")
+def _notify_job_changes(session, flush_context):
+    if not notifies(session):
+        return
+    connection = session.connection()
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Job):
+            continue
+        state = inspect(obj)
+        if obj in session.new or any(state.attrs[name].history.has_changes() for name in ("status", "progress")):
+            _publish(connection, job_event(obj))
+
+class JobEventHub:
+    """Fans job events out to asyncio queues, one per subscribed client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[asyncio.Queue, tuple[asyncio.AbstractEventLoop, set[int]]] = {}
+        self._thread = None
+        self._listen_engine = None
+
+    def subscribe(self, job_ids) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[queue] = (asyncio.get_running_loop(), set(job_ids))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="job-events", daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def _subscribed_ids(self) -> set[int]:
+        with self._lock:
+            return set().union(*(ids for _, ids in self._subscribers.values()))
+
+    def publish(self, payload: dict):
+        with self._lock:
+            targets = [(queue, loop) for queue, (loop, ids) in self._subscribers.items() if payload["id"] in ids]
+        for queue, loop in targets:
+            loop.call_soon_threadsafe(queue.put_nowait, payload)
+
+    def _run(self):
+        if engine.dialect.name != "postgresql":
+            self._poll()
+            return
+        delay = LISTEN_RETRY_DELAY
+        while True:
+            started = time.monotonic()
+            try:
+                self._listen()
+            except Exception as e:
+                if time.monotonic() - started > LISTEN_RETRY_MAX_DELAY:
+                    delay = LISTEN_RETRY_DELAY
+                print(f"Job event LISTEN failed, retrying in {delay}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, LISTEN_RETRY_MAX_DELAY)
+
+    def _listen(self):
+        # A connection of its own: it stays in autocommit and is closed, not
+        # returned to the pool, when listening stops
+        if self._listen_engine is None:
+            self._listen_engine = create_engine(engine.url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        raw = self._listen_engine.raw_connection()
+        try:
+            connection = raw.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            # Events committed while not listening
+            self._poll_once({})
+            while True:
+                if select.select([connection], [], [], 30) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    self.publish(json.loads(notify.payload))
+        finally:
+            raw.close()
+
+    def _poll(self):
+        last_seen = {}
+        while True:
+            time.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
+            self._poll_once(last_seen)
+
+    def _poll_once(self, last_seen: dict):
+        job_ids = self._subscribed_ids()
+        if not job_ids:
+            last_seen.clear()
+            return
+        db = SessionLocal()
+        try:
+            jobs = db.query(Job).filter(Job.id.in_(job_ids)).all()
+            for job in jobs:
+                payload = job_event(job)
+                if last_seen.get(job.id) != payload:
+                    last_seen[job.id] = payload
+                    self.publish(payload)
+        finally:
+            db.close()
+
+job_events = JobEventHub()
+
+def format_sse(payload: dict) -> str:
+    return f"event: job\ndata: {json.dumps(payload)}\n\n"
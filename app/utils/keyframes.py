@@ -0,0 +1,70 @@
+# app/utils/keyframes.py
+"""
+Keyframe (GOP) index of a video.
+
+The index is the sorted presentation timestamps, in seconds, of every
+keyframe of the first video stream. It is built from packet flags, so
+nothing is decoded, and stored on the Video row as packed little-endian
+float64 values (8 bytes per keyframe).
+"""
+
+import subprocess
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from app.utils.metrics import stage
+
+# Timestamps closer than this are treated as equal (1 ms)
+EPSILON = 0.001
+
+def build_keyframe_index(path) -> array:
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        str(path)
+    ]
+    try:
+        with stage("probe"):
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        raise RuntimeError(f"Failed to index keyframes of {path}: {e}")
+
+    keyframes = array("d")
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return array("d", sorted(keyframes))
+
+def pack_keyframes(keyframes: array) -> bytes:
+    packed = array("d", keyframes)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+def unpack_keyframes(data: bytes) -> array:
+    keyframes = array("d")
+    keyframes.frombytes(data)
+    if sys.byteorder != "little":
+        keyframes.byteswap()
+    return keyframes
+
+def video_keyframes(video, path) -> array:
+    """The keyframe index of a Video row, built and stored on first use (the caller commits)."""
+    if video.keyframe_index is not None:
+        return unpack_keyframes(video.keyframe_index)
+    keyframes = build_keyframe_index(path)
+    video.keyframe_index = pack_keyframes(keyframes)
+    return keyframes
+
+def keyframe_at_or_after(keyframes: array, t: float) -> float | None:
+    i = bisect_left(keyframes, t - EPSILON)
+    return keyframes[i] if i < len(keyframes) else None
+
+def keyframe_at_or_before(keyframes: array, t: float) -> float | None:
+    i = bisect_right(keyframes, t + EPSILON)
+    return keyframes[i - 1] if i > 0 else None
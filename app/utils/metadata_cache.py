@@ -0,0 +1,158 @@
+# app/utils/metadata_cache.py
+"""
+In-process cache and conditional GETs for the metadata read endpoints
+(jobs, videos, video versions).
+
+`cached_response()` serves a response body from `metadata_cache` when it
+has one, and builds and stores it otherwise. Every body gets an ETag, so a
+client that sends it back in `If-None-Match` gets `304 Not Modified`; the
+`X-Cache` header (HIT / MISS) and the `metadata_cache_requests_total`
+counter report the hit rate.
+
+An entry depends on tables. A commit that writes one of them, from any
+session of this process, drops the entries that depend on it (`_track_writes`
+on Session). Writes of other processes (the workers) are only picked up once
+an entry is METADATA_CACHE_TTL seconds old, which bounds how stale a polled
+job can get. Settled entries (a finished job) never change: they are kept
+without a TTL and told to HTTP caches as immutable.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from fastapi import Request
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.utils.file_response import etag_matches
+from app.utils.metrics import METADATA_CACHE_REQUESTS
+
+IMMUTABLE = "max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    headers: dict = field(default_factory=dict)
+    settled: bool = False
+    etag: str = field(init=False)
+
+    def __post_init__(self):
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+class MetadataCache:
+    """LRU of response bodies with a TTL, invalidated per table."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple[CacheEntry, float | None, dict]]" = OrderedDict()
+        # Bumped by every committed write to the table
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> CacheEntry | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            entry, expires, generations = item
+            fresh = entry.settled or (
+                expires > time.monotonic()
+                and all(self._generations.get(table, 0) == seen for table, seen in generations.items())
+            )
+            if not fresh:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def generations(self, tables: tuple[str, ...]) -> dict[str, int]:
+        """Taken before reading the database, so a write during the read invalidates the entry."""
+        with self._lock:
+            return {table: self._generations.get(table, 0) for table in tables}
+
+    def put(self, key: tuple, entry: CacheEntry, generations: dict[str, int]):
+        with self._lock:
+            expires = None if entry.settled else time.monotonic() + self.ttl
+            self._entries[key] = (entry, expires, generations)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+metadata_cache = MetadataCache(settings.METADATA_CACHE_TTL, settings.METADATA_CACHE_SIZE)
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    tables = session.info.setdefault("written_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tables.add(obj.__table__.name)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_writes(orm_execute_state):
+    # INSERT / UPDATE / DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info.setdefault("written_tables", set()).add(
+            orm_execute_state.statement.table.name
+        )
+
+@event.listens_for(Session, "after_commit")
+def _track_writes(session):
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        metadata_cache.invalidate(tables)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("written_tables", None)
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def json_entry(model, value, headers: dict | None = None, settled: bool = False,
+               exclude_unset: bool = False) -> CacheEntry:
+    """A cache entry of `value` (ORM objects or dicts) serialized as `model`, like a response_model would."""
+    adapter = _adapter(model)
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True), exclude_unset=exclude_unset)
+    return CacheEntry(body, headers or {}, settled)
+
+async def cached_response(request: Request, key: tuple, tables: tuple[str, ...], build) -> Response:
+    """
+    The response for `key`: from the cache, or from `build()` (an async
+    function returning a CacheEntry; what it raises is not cached), stored
+    for later requests until one of `tables` is written.
+    """
+    endpoint = key[0]
+    entry = metadata_cache.get(key)
+    if entry is None:
+        generations = metadata_cache.generations(tables)
+        entry = await build()
+        metadata_cache.put(key, entry, generations)
+        result = "miss"
+    else:
+        result = "hit"
+    METADATA_CACHE_REQUESTS.labels(endpoint, result).inc()
+
+    headers = {
+        **entry.headers,
+        "ETag": entry.etag,
+        "Cache-Control": IMMUTABLE if entry.settled else REVALIDATE,
+        "X-Cache": result.upper(),
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, entry.etag, weak=True):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
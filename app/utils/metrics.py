@@ -0,0 +1,212 @@
+# app/utils/metrics.py
+"""
+Per-stage job timing and the Prometheus metrics built on it.
+
+The process running a job collects a `JobStats`: wall time per stage
+(`with stage("probe"): ...`), CPU time of the process and all its children,
+and the peak RSS of the FFmpeg processes it ran (from `wait4`, see
+`app.utils.progress.run_ffmpeg`). `run_job()` returns it to the worker,
+which stores the figures on the job row (`release_job()`) and feeds the
+worker's histograms, served on WORKER_METRICS_PORT.
+
+The API serves its own /metrics: request latency per route
+(`RequestMetricsMiddleware`), queue depth / in-flight jobs per job type
+(`JobQueueCollector`, read from the jobs table) and hits and misses of the
+metadata cache (see app.utils.metadata_cache).
+
+Stages:
+    queue      created -> claimed by a worker (measured by the worker)
+    probe      ffprobe runs (media info, keyframe index)
+    ffmpeg     FFmpeg runs
+    db_commit  session commits
+    io         hashing and deleting files
+    total      the whole job
+"""
+
+import resource
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event, func
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import SessionLocal
+from app.models.models import Job, JobStatus, JobType
+
+# Seconds; FFmpeg stages run from well under a second to hours
+STAGE_BUCKETS = (0.005, 0.025, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+JOB_STAGE_SECONDS = Histogram(
+    "job_stage_seconds", "Wall time of each job stage", ["job_type", "stage"], buckets=STAGE_BUCKETS
+)
+JOB_CPU_SECONDS = Histogram(
+    "job_cpu_seconds", "CPU time of a job, FFmpeg included", ["job_type"], buckets=STAGE_BUCKETS
+)
+JOB_MAX_RSS_BYTES = Histogram(
+    "job_max_rss_bytes", "Peak RSS of the largest FFmpeg process of a job", ["job_type"],
+    buckets=tuple(mb * 1024 * 1024 for mb in (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192))
+)
+JOBS_FINISHED = Counter("jobs_finished_total", "Jobs finished by this worker", ["job_type", "status"])
+JOBS_IN_FLIGHT = Gauge("worker_jobs_in_flight", "Jobs this worker is running", ["job_type"])
+
+class JobStats:
+    """What one job cost, accumulated by the process running it."""
+
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self.max_rss_bytes = 0
+        self._started = time.perf_counter()
+        self._usage = _cpu_seconds()
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_child(self, usage: resource.struct_rusage):
+        # ru_maxrss is in KiB on Linux
+        self.max_rss_bytes = max(self.max_rss_bytes, usage.ru_maxrss * 1024)
+
+    def finish(self) -> dict:
+        self.stages["total"] = time.perf_counter() - self._started
+        return {
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "cpu_seconds": round(_cpu_seconds() - self._usage, 4),
+            "max_rss_bytes": self.max_rss_bytes or None,
+        }
+
+def _cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+# Stats of the job running in this process (None outside jobs)
+_job_stats: JobStats | None = None
+
+def start_job_stats() -> JobStats:
+    global _job_stats
+    _job_stats = JobStats()
+    return _job_stats
+
+def finish_job_stats() -> dict | None:
+    global _job_stats
+    stats, _job_stats = _job_stats, None
+    return stats.finish() if stats else None
+
+@contextmanager
+def stage(name: str):
+    """Adds the time spent in the block to stage `name` of the current job."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _job_stats:
+            _job_stats.add(name, time.perf_counter() - started)
+
+def record_child_usage(usage: resource.struct_rusage):
+    if _job_stats:
+        _job_stats.add_child(usage)
+
+@event.listens_for(SessionLocal, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+@event.listens_for(SessionLocal, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None and _job_stats:
+        _job_stats.add("db_commit", time.perf_counter() - started)
+
+def observe_job(job_type: JobType, status: str, stats: dict | None, queue_seconds: float | None):
+    """Feeds a finished job into the worker's metrics."""
+    labels = job_type.value if job_type else "unknown"
+    JOBS_FINISHED.labels(labels, status).inc()
+    if queue_seconds is not None:
+        JOB_STAGE_SECONDS.labels(labels, "queue").observe(queue_seconds)
+    if not stats:
+        return
+    for name, seconds in stats["stages"].items():
+        JOB_STAGE_SECONDS.labels(labels, name).observe(seconds)
+    JOB_CPU_SECONDS.labels(labels).observe(stats["cpu_seconds"])
+    if stats["max_rss_bytes"]:
+        JOB_MAX_RSS_BYTES.labels(labels).observe(stats["max_rss_bytes"])
+
+# --- API ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, until its body is sent",
+    ["method", "route", "status"]
+)
+
+METADATA_CACHE_REQUESTS = Counter(
+    "metadata_cache_requests", "Metadata responses served from the in-process cache (hit) or the database (miss)",
+    ["endpoint", "result"]
+)
+
+class RequestMetricsMiddleware:
+    """
+    Times every request per route, labelled with the route's path template
+    (`.../jobs/{job_id}`, not the raw path). Plain ASGI, so streamed and
+    zero-copy responses pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+
+class JobQueueCollector:
+    """Queue depth and in-flight jobs per job type, counted in the database at scrape time."""
+
+    def _families(self):
+        return (
+            GaugeMetricFamily("jobs_queued", "Jobs waiting for a worker", labels=["job_type"]),
+            GaugeMetricFamily("jobs_in_flight", "Jobs a worker is running", labels=["job_type"]),
+        )
+
+    def describe(self):
+        # Registering calls collect() unless describe() is defined; the database may not be up yet
+        yield from self._families()
+
+    def collect(self):
+        db = SessionLocal()
+        try:
+            counts = (
+                db.query(Job.job_type, Job.status, func.count(Job.id))
+                .filter(Job.status.in_((JobStatus.pending, JobStatus.processing)))
+                .group_by(Job.job_type, Job.status)
+                .all()
+            )
+        except SQLAlchemyError as e:
+            # The rest of /metrics is still served
+            print(f"Job queue metrics unavailable: {e}")
+            return
+        finally:
+            db.close()
+
+        queued, running = self._families()
+        by_type = {(job_type, status): count for job_type, status, count in counts}
+        for job_type in JobType:
+            queued.add_metric([job_type.value], by_type.get((job_type, JobStatus.pending), 0))
+            running.add_metric([job_type.value], by_type.get((job_type, JobStatus.processing), 0))
+        yield queued
+        yield running
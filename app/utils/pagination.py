@@ -0,0 +1,43 @@
+# app/utils/pagination.py
+"""
+Keyset (cursor) pagination for listing endpoints.
+
+Pages are ordered by primary key and continue after the last id of the
+previous page (`WHERE id > :last_id ORDER BY id LIMIT :n`), so every page
+costs the same index range scan however deep it is, unlike OFFSET. The
+cursor is opaque to clients; the next one is sent in the `X-Next-Cursor`
+header (and a `Link: rel="next"` header) and is absent on the last page.
+"""
+
+import base64
+import json
+
+from fastapi import HTTPException, Request, Response, status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str | None) -> int | None:
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+def paginate(rows: list, limit: int, request: Request, response: Response) -> list:
+    """
+    Trims a `limit + 1` row fetch to one page and advertises the next page
+    when there is one.
+    """
+    if len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    cursor = encode_cursor(rows[-1]["id"])
+    response.headers["X-Next-Cursor"] = cursor
+    response.headers["Link"] = f'<{request.url.include_query_params(cursor=cursor)}>; rel="next"'
+    return rows
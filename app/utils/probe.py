@@ -0,0 +1,139 @@
+# app/utils/probe.py
+"""
+Media probing: one ffprobe run per file, cached by (path, size, mtime).
+
+`probe_media()` returns everything the jobs need to know about a file in a
+single dict, so callers never spawn ffprobe twice for the same file. Results
+are cached per process; a file that is rewritten in place gets a new size or
+mtime and is probed again. Video rows persist the same fields
+(`apply_probe()` / `video_media_info()`), so a video is normally probed only
+once, at upload time.
+"""
+
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+
+from app.core.config import settings
+from app.utils.metrics import stage
+
+# Video columns filled from a probe result
+VIDEO_PROBE_FIELDS = (
+    "duration", "size", "container", "video_codec", "audio_codec",
+    "width", "height", "fps", "bitrate", "has_audio", "rotation",
+)
+
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _parse_rate(rate: str | None) -> float | None:
+    try:
+        value = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return float(value) if value > 0 else None
+
+def _parse_number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+def _rotation(stream: dict) -> int:
+    rotate = stream.get("tags", {}).get("rotate")
+    if rotate is None:
+        for side_data in stream.get("side_data_list", []):
+            if "rotation" in side_data:
+                rotate = side_data["rotation"]
+                break
+    return int(float(rotate or 0)) % 360
+
+def _variable_frame_rate(stream: dict) -> bool:
+    """Whether the stream's average frame rate is off its base rate (phone recordings, screen captures)."""
+    base = _parse_rate(stream.get("r_frame_rate"))
+    average = _parse_rate(stream.get("avg_frame_rate"))
+    return bool(base and average) and abs(base - average) / base > 0.01
+
+def _run_ffprobe(path: str) -> dict:
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-show_format",
+        "-show_streams",
+        "-of", "json",
+        path
+    ]
+    try:
+        with stage("probe"):
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        metadata = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError) as e:
+        raise RuntimeError(f"Failed to probe {path}: {e}")
+
+    fmt = metadata.get("format", {})
+    streams = metadata.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    return {
+        "duration": _parse_number(fmt.get("duration")),
+        "size": _parse_number(fmt.get("size"), int),
+        "container": fmt.get("format_name"),
+        "bitrate": _parse_number(fmt.get("bit_rate"), int),
+        "video_codec": video.get("codec_name") if video else None,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+        "fps": _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate")) if video else None,
+        "variable_frame_rate": _variable_frame_rate(video) if video else False,
+        "rotation": _rotation(video) if video else 0,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "has_audio": audio is not None,
+    }
+
+def probe_media(path) -> dict:
+    """Probes `path` once per (path, size, mtime); returns a copy of the cached result."""
+    path = os.path.realpath(str(path))
+    stat_result = os.stat(path)
+    key = (path, stat_result.st_size, stat_result.st_mtime_ns)
+
+    with _cache_lock:
+        info = _cache.get(key)
+        if info is not None:
+            _cache.move_to_end(key)
+            return dict(info)
+
+    info = _run_ffprobe(path)
+    if info["size"] is None:
+        info["size"] = stat_result.st_size
+
+    with _cache_lock:
+        _cache[key] = info
+        while len(_cache) > settings.PROBE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(info)
+
+def display_size(info: dict) -> tuple[int | None, int | None]:
+    """Width and height as shown to the viewer, i.e. after applying rotation."""
+    if info.get("rotation") in (90, 270):
+        return info.get("height"), info.get("width")
+    return info.get("width"), info.get("height")
+
+def apply_probe(video, info: dict):
+    """Copies a probe result onto a Video row (the caller commits)."""
+    for field in VIDEO_PROBE_FIELDS:
+        setattr(video, field, info.get(field))
+
+def video_media_info(video, path) -> dict:
+    """
+    Media info of a Video row, from its stored columns when they are filled
+    in, otherwise probed (once) and stored on the row for the next job.
+    """
+    if video.video_codec is not None:
+        return {field: getattr(video, field) for field in VIDEO_PROBE_FIELDS}
+    info = probe_media(path)
+    apply_probe(video, info)
+    return info
@@ -0,0 +1,158 @@
+# app/utils/progress.py
+"""
+Job progress from FFmpeg's `-progress` output.
+
+`run_ffmpeg()` runs an FFmpeg command like `subprocess.run(..., check=True)`
+but also reads the machine-readable progress FFmpeg writes to stdout
+(`out_time_us`, `fps`, `speed`) and hands it to a `JobProgress`, which turns
+it into percent complete and an ETA on the job row. Writes are throttled to
+one every JOB_PROGRESS_INTERVAL seconds.
+
+A job that runs FFmpeg several times (pieces of a cut, one run per
+rendition) maps every run onto one timeline with `offset`. A chunked
+encode (see app.utils.smartcut) also reports the state of every chunk in
+`chunks`.
+
+FFmpeg runs in a process group of its own, so a cancelled or timed-out job
+can stop it (see app.utils.watchdog).
+"""
+
+import os
+import subprocess
+import time
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.models import Job
+from app.utils.encoding import limit_threads
+from app.utils.job_events import EVENT_COLUMNS, notify_jobs
+from app.utils.metrics import record_child_usage, stage
+from app.utils.watchdog import (
+    JobInterrupted, check_interrupted, interrupted, register_process, unregister_process
+)
+
+class JobProgress:
+    """Throttled progress writer for one job whose work spans `total_seconds` of media."""
+
+    def __init__(self, job_id: int, total_seconds: float | None):
+        self.job_id = job_id
+        self.total_seconds = total_seconds
+        self.started = time.monotonic()
+        self.last_write = 0.0
+        self.last_percent = None
+        # Per-chunk state written along with the progress (chunked encodes)
+        self.chunks = None
+
+    def update(self, seconds_done: float, speed: float | None = None, force: bool = False):
+        if not self.total_seconds or self.total_seconds <= 0:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_write < settings.JOB_PROGRESS_INTERVAL:
+            return
+
+        fraction = min(max(seconds_done / self.total_seconds, 0.0), 1.0)
+        percent = round(fraction * 100, 1)
+        if percent == self.last_percent and not force:
+            return
+
+        eta = None
+        elapsed = now - self.started
+        if fraction > 0:
+            eta = round(elapsed * (1 - fraction) / fraction, 1)
+
+        values = {Job.progress: percent, Job.eta_seconds: eta, Job.speed: speed}
+        if self.chunks is not None:
+            values[Job.chunks] = self.chunks
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                update(Job).where(Job.id == self.job_id).values(values).returning(*EVENT_COLUMNS)
+            ).all()
+            notify_jobs(db, rows)
+            db.commit()
+        finally:
+            db.close()
+        self.last_write = now
+        self.last_percent = percent
+
+def _parse_speed(value: str) -> float | None:
+    try:
+        return float(value.rstrip("x"))
+    except ValueError:
+        return None
+
+# FFmpeg options (of those we use) that take no value
+FLAG_OPTIONS = {"-y", "-n", "-an", "-vn", "-sn", "-dn", "-nostats", "-nostdin", "-hide_banner", "-shortest", "-copyts"}
+
+def ffmpeg_outputs(command: list[str]) -> list[str]:
+    """The output files of an FFmpeg command: the arguments that are neither options nor option values."""
+    outputs = []
+    args = iter(command[1:])
+    for arg in args:
+        if arg in FLAG_OPTIONS:
+            continue
+        if arg.startswith("-") and arg != "-":
+            next(args, None)  # the option's value (inputs included)
+        elif arg != "-" and not arg.startswith("pipe:"):
+            outputs.append(arg)
+    return outputs
+
+def _remove_outputs(command: list[str]):
+    for path in ffmpeg_outputs(command):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def _popen(command: list[str], **kwargs) -> subprocess.Popen:
+    # A process group of its own: the watchdog stops FFmpeg and anything it started
+    process = subprocess.Popen(command, start_new_session=True, **kwargs)
+    register_process(process)
+    return process
+
+def _wait(process: subprocess.Popen) -> int:
+    """Reaps `process` with wait4, so the job's stats get its resource usage."""
+    _, status, usage = os.wait4(process.pid, 0)
+    unregister_process(process)
+    record_child_usage(usage)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode
+
+def run_ffmpeg(command: list[str], progress: JobProgress | None = None, offset: float = 0.0):
+    """
+    Runs an FFmpeg command, raising CalledProcessError on failure. With
+    `progress`, FFmpeg's output position (plus `offset`) is reported as it runs.
+    Decoders and filters are kept within the job's thread budget. Once the
+    job is cancelled or timed out, raises JobInterrupted instead, and removes
+    what the stopped command wrote.
+    """
+    check_interrupted(command)
+    command = limit_threads(command)
+    if progress is not None:
+        command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+
+    with stage("ffmpeg"):
+        if progress is None:
+            with _popen(command) as process:
+                returncode = _wait(process)
+        else:
+            out_time = 0.0
+            speed = None
+            with _popen(command, stdout=subprocess.PIPE, text=True) as process:
+                for line in process.stdout:
+                    key, _, value = line.strip().partition("=")
+                    if key == "out_time_us" and value.isdigit():
+                        out_time = int(value) / 1_000_000
+                    elif key == "speed":
+                        speed = _parse_speed(value)
+                    elif key == "progress":
+                        progress.update(offset + out_time, speed)
+                returncode = _wait(process)
+
+    if returncode:
+        reason = interrupted()
+        if reason:
+            _remove_outputs(command)
+            raise JobInterrupted(reason, command)
+        raise subprocess.CalledProcessError(returncode, command)
+    return subprocess.CompletedProcess(command, returncode)
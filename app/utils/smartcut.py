@@ -0,0 +1,341 @@
+# app/utils/smartcut.py
+"""
+Frame-accurate cutting at close to stream-copy speed ("smart cut").
+
+A cut [start, end) is split at the keyframes inside it:
+
+    start ... k1 ====================== k2 ... end
+    re-encode    stream copy (whole GOPs)    re-encode
+
+Only the partial GOPs at either end are decoded and encoded again; the whole
+GOPs in between are copied untouched. The video pieces are written as
+MPEG-TS (parameter sets in-band, one timescale) and joined with the concat
+demuxer; the audio is cut separately, sample-accurately, in the same final
+mux.
+
+Sources whose codec has no matching encoder here are cut with one full
+(still frame-accurate) re-encode instead.
+
+The same splicing renders an edit that only touches part of a video
+(`plan_window()` / `splice_window()`): the GOPs overlapping the edit are
+re-encoded and everything before and after them is copied.
+
+Long re-encodes are split into chunks of about CHUNK_SECONDS at the
+source's keyframes (`plan_chunks()`), encoded side by side, each by its own
+FFmpeg process with a share of the job's threads, and joined by stream
+copy (`encode_chunked()`). Every chunk uses the same encoder options,
+starts on an IDR frame and keeps the forced keyframe grid of the whole
+video, so the joined stream plays as one encode. A failed chunk is retried
+on its own, and a job that runs again after its worker died only encodes
+the chunks that were not finished.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.utils.encoding import encoding_args, job_threads, set_job_threads
+from app.utils.keyframes import EPSILON, keyframe_at_or_after, keyframe_at_or_before
+from app.utils.progress import run_ffmpeg
+from app.utils.watchdog import JobInterrupted
+
+# Container of the intermediate pieces
+PIECE_FORMAT, PIECE_EXT = "mpegts", ".ts"
+
+# Encoder that produces a stream compatible with the copied GOPs
+SMART_CUT_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+}
+
+def plan_cut(keyframes, start: float, end: float) -> list[tuple[str, float, float]]:
+    """Returns the ("encode" | "copy", start, end) pieces that make up [start, end)."""
+    k1 = keyframe_at_or_after(keyframes, start)
+    k2 = keyframe_at_or_before(keyframes, end)
+    if k1 is None or k2 is None or k2 - k1 <= EPSILON:
+        return [("encode", start, end)]
+
+    pieces = []
+    if k1 - start > EPSILON:
+        pieces.append(("encode", start, k1))
+    pieces.append(("copy", k1, k2))
+    if end - k2 > EPSILON:
+        pieces.append(("encode", k2, end))
+    return pieces
+
+def encode_args(codec: str | None) -> list[str]:
+    """Encoder options of the pieces spliced between copied GOPs."""
+    return encoding_args("intermediate", encoder=SMART_CUT_ENCODERS.get(codec, "libx264"), faststart=False)
+
+def _cut_piece(input_path: str, kind: str, start: float, end: float, codec: str, output_path: str, progress=None, offset: float = 0.0):
+    if kind == "copy":
+        # `-t` alone would cut a stream copy by decode timestamp and leak the
+        # frames that follow the closing keyframe in decode order. The segment
+        # muxer splits exactly at that keyframe; the part after it is dropped.
+        stem, ext = os.path.splitext(output_path)
+        command = [
+            "ffmpeg", "-y",
+            "-ss", f"{start:.6f}",
+            "-i", input_path,
+            "-t", f"{end - start + 1:.6f}",
+            "-map", "0:v:0", "-an",
+            "-c:v", "copy",
+            "-f", "segment",
+            "-segment_times", f"{end - start:.6f}",
+            "-segment_format", PIECE_FORMAT,
+            "-reset_timestamps", "1",
+            f"{stem}_%d{ext}"
+        ]
+        run_ffmpeg(command)
+        os.replace(f"{stem}_0{ext}", output_path)
+        return
+
+    command = [
+        "ffmpeg", "-y",
+        "-ss", f"{start:.6f}",
+        "-i", input_path,
+        "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-an",
+        *encode_args(codec),
+        "-f", PIECE_FORMAT,
+        output_path
+    ]
+    run_ffmpeg(command, progress, offset)
+
+def reencode_cut(input_path: str, output_path: str, start: float, end: float, progress=None, profile: str = "balanced"):
+    """Plain frame-accurate cut: decode and encode the whole range with encoding `profile`."""
+    command = [
+        "ffmpeg", "-y",
+        "-ss", f"{start:.6f}",
+        "-i", input_path,
+        "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-map", "0:a?",
+        *encoding_args(profile),
+        "-c:a", "aac",
+        output_path
+    ]
+    run_ffmpeg(command, progress)
+
+def _concat_pieces(piece_paths: list[str], output_path: str, work_dir: str, audio_args: list[str]):
+    """Joins video pieces with the concat demuxer and muxes in the audio input of `audio_args`."""
+    list_path = os.path.join(work_dir, "pieces.txt")
+    with open(list_path, "w") as f:
+        for piece_path in piece_paths:
+            f.write(f"file '{os.path.abspath(piece_path)}'\n")
+
+    command = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        *audio_args,
+        "-map", "0:v", "-map", "1:a?",
+        "-c:v", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    run_ffmpeg(command)
+
+def _join_pieces(input_path: str, output_path: str, pieces, work_dir: str, write_piece, audio_args: list[str],
+                 progress=None, base: float = 0.0):
+    """
+    Writes each piece with `write_piece(kind, start, end, path)`, joins them
+    with the concat demuxer and muxes the audio of `input_path` back in.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        piece_paths = []
+        for i, (kind, piece_start, piece_end) in enumerate(pieces):
+            piece_path = os.path.abspath(os.path.join(work_dir, f"piece_{i}{PIECE_EXT}"))
+            write_piece(kind, piece_start, piece_end, piece_path)
+            if progress:
+                progress.update(piece_end - base)
+            piece_paths.append(piece_path)
+
+        _concat_pieces(piece_paths, output_path, work_dir, audio_args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def smart_cut(input_path: str, output_path: str, start: float, end: float, keyframes, codec: str | None, work_dir: str,
+              progress=None, profile: str = "balanced"):
+    """
+    Cuts [start, end) of `input_path` into `output_path`; returns the plan
+    that was used. `profile` encodes the cut when it can't be spliced.
+    """
+    pieces = plan_cut(keyframes, start, end)
+    if codec not in SMART_CUT_ENCODERS or all(kind == "encode" for kind, _, _ in pieces):
+        if use_chunks(end - start):
+            chunks = plan_chunks(keyframes, start, end)
+            encode_chunked(
+                input_path, output_path, chunks,
+                chunk_args=lambda chunk_start, chunk_end: encoding_args(profile, faststart=False),
+                audio_args=["-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", input_path, "-c:a", "aac"],
+                work_dir=work_dir, progress=progress
+            )
+            return [("encode", chunk_start, chunk_end) for chunk_start, chunk_end in chunks]
+        reencode_cut(input_path, output_path, start, end, progress, profile)
+        return [("encode", start, end)]
+
+    def write_piece(kind, piece_start, piece_end, piece_path):
+        _cut_piece(input_path, kind, piece_start, piece_end, codec, piece_path, progress, piece_start - start)
+
+    # Audio is cut sample-accurately from the source and encoded again
+    audio_args = ["-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", input_path, "-c:a", "aac"]
+    _join_pieces(input_path, output_path, pieces, work_dir, write_piece, audio_args, progress, base=start)
+    return pieces
+
+def plan_window(keyframes, start: float, end: float, duration: float) -> list[tuple[str, float, float]] | None:
+    """
+    Pieces that re-encode only the GOPs overlapping [start, end) of a video of
+    `duration` seconds and copy the rest, or None when there is nothing to copy.
+    """
+    k1 = keyframe_at_or_before(keyframes, start)
+    k2 = keyframe_at_or_after(keyframes, end)
+    if k1 is None:
+        k1 = 0.0
+    if k2 is None or k2 > duration - EPSILON:
+        k2 = duration
+
+    pieces = []
+    if k1 > EPSILON:
+        pieces.append(("copy", 0.0, k1))
+    pieces.append(("encode", k1, k2))
+    if duration - k2 > EPSILON:
+        pieces.append(("copy", k2, duration))
+    return pieces if len(pieces) > 1 else None
+
+def splice_window(input_path: str, output_path: str, pieces, codec: str, work_dir: str, encode_piece, progress=None):
+    """
+    Rebuilds `input_path` from a `plan_window()` plan: copied pieces are cut
+    from the source, the encode piece is written by
+    `encode_piece(start, end, path, video_args)`, and the source audio is copied
+    through untouched.
+    """
+    def write_piece(kind, piece_start, piece_end, piece_path):
+        if kind == "copy":
+            _cut_piece(input_path, kind, piece_start, piece_end, codec, piece_path)
+        else:
+            encode_piece(piece_start, piece_end, piece_path, [*encode_args(codec), "-f", PIECE_FORMAT])
+
+    _join_pieces(input_path, output_path, pieces, work_dir, write_piece, ["-i", input_path, "-c:a", "copy"], progress)
+
+def use_chunks(seconds: float | None) -> bool:
+    """Whether an encode of `seconds` of video is split into chunks."""
+    return bool(seconds) and 0 < settings.CHUNKED_ENCODE_MIN_SECONDS <= seconds
+
+def plan_chunks(keyframes, start: float, end: float) -> list[tuple[float, float]]:
+    """
+    [start, end) split into chunks of about CHUNK_SECONDS, cut at the
+    keyframe before each even split point so every chunk seeks cheaply.
+    """
+    count = max(1, round((end - start) / settings.CHUNK_SECONDS))
+    bounds = [start]
+    for i in range(1, count):
+        target = start + (end - start) * i / count
+        cut = keyframe_at_or_before(keyframes, target) if keyframes is not None else None
+        if cut is None or cut <= bounds[-1] + EPSILON:
+            cut = target # A GOP longer than a chunk: cut between keyframes
+        bounds.append(cut)
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+class ChunkProgress:
+    """Adds up the progress of chunks encoding side by side into the job's progress."""
+
+    def __init__(self, progress, chunks):
+        self.progress = progress
+        self.lengths = [end - start for start, end in chunks]
+        self.done = [0.0] * len(chunks)
+        self.chunks = [
+            {"start": round(start, 3), "end": round(end, 3), "status": "pending", "progress": 0.0}
+            for start, end in chunks
+        ]
+        self._lock = threading.Lock()
+
+    def update(self, index: int, seconds_done: float | None = None, status: str | None = None):
+        with self._lock:
+            chunk = self.chunks[index]
+            if seconds_done is not None:
+                self.done[index] = min(max(seconds_done, 0.0), self.lengths[index])
+                chunk["progress"] = round(100 * self.done[index] / self.lengths[index], 1) if self.lengths[index] else 100.0
+            if status:
+                chunk["status"] = status
+            if self.progress:
+                self.progress.chunks = [dict(c) for c in self.chunks]
+                # Chunk status changes are always written
+                self.progress.update(sum(self.done), force=status is not None)
+
+    def reporter(self, index: int) -> "_ChunkReporter":
+        return _ChunkReporter(self, index)
+
+class _ChunkReporter:
+    """The `run_ffmpeg()` progress target of one chunk."""
+
+    def __init__(self, tracker: ChunkProgress, index: int):
+        self.tracker = tracker
+        self.index = index
+
+    def update(self, seconds_done: float, speed: float | None = None, force: bool = False):
+        self.tracker.update(self.index, seconds_done)
+
+def encode_chunked(input_path: str, output_path: str, chunks, chunk_args, audio_args: list[str], work_dir: str,
+                   progress=None):
+    """
+    Encodes each (start, end) chunk of `input_path` with the video options
+    `chunk_args(start, end)`, several chunks at a time, then joins them and
+    muxes in the audio input of `audio_args`. Chunks finished by an earlier
+    run of the job (kept in `work_dir`) are not encoded again.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    tracker = ChunkProgress(progress, chunks)
+    budget = job_threads() or os.cpu_count() or 1
+    processes = max(1, min(len(chunks), budget // max(settings.CHUNK_THREADS, 1)))
+    piece_paths = [
+        os.path.join(work_dir, f"chunk_{start:.3f}-{end:.3f}{PIECE_EXT}") for start, end in chunks
+    ]
+
+    def encode(index):
+        start, end = chunks[index]
+        piece_path = piece_paths[index]
+        if os.path.exists(piece_path):
+            tracker.update(index, end - start, "done")
+            return
+        partial_path = f"{piece_path}.part"
+        for attempt in range(settings.CHUNK_RETRIES + 1):
+            tracker.update(index, 0.0, "encoding")
+            command = [
+                "ffmpeg", "-y",
+                "-ss", f"{start:.6f}",
+                "-i", input_path,
+                "-t", f"{end - start:.6f}",
+                "-map", "0:v:0", "-an",
+                *chunk_args(start, end),
+                "-f", PIECE_FORMAT,
+                partial_path
+            ]
+            try:
+                run_ffmpeg(command, tracker.reporter(index))
+                break
+            except subprocess.CalledProcessError as e:
+                if attempt == settings.CHUNK_RETRIES or isinstance(e, JobInterrupted):
+                    tracker.update(index, status="failed")
+                    raise
+                print(f"Chunk {start:.3f}-{end:.3f} failed, retrying: {e}")
+        os.replace(partial_path, piece_path)
+        tracker.update(index, end - start, "done")
+
+    # Every chunk process gets an equal share of the job's threads
+    previous_threads = job_threads()
+    set_job_threads(max(1, budget // processes))
+    try:
+        with ThreadPoolExecutor(max_workers=processes) as pool:
+            list(pool.map(encode, range(len(chunks))))
+        _concat_pieces(piece_paths, output_path, work_dir, audio_args)
+    except subprocess.CalledProcessError:
+        # Final failure: nothing will resume these chunks
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    finally:
+        set_job_threads(previous_threads)
+    shutil.rmtree(work_dir, ignore_errors=True)
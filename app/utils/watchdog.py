@@ -0,0 +1,152 @@
+# app/utils/watchdog.py
+"""
+Cancellation and timeouts of running jobs.
+
+FFmpeg runs in a process group of its own, registered here while it runs
+(see `app.utils.progress.run_ffmpeg`). The process running a job starts a
+`JobWatchdog`: a thread that every JOB_WATCHDOG_INTERVAL seconds checks
+whether the job was cancelled (POST /jobs/{id}/cancel sets
+cancel_requested_at) or has run past its deadline. Either way it stops every
+registered process group, SIGTERM first and SIGKILL on the next check, and
+from then on FFmpeg commands of the job raise `JobInterrupted`. That is a
+CalledProcessError, so the tasks' own failure handling runs (work and
+staging directories are removed); run_ffmpeg removes the interrupted
+command's output and the worker gives the job its final status
+(`finish_interrupted_job()`).
+
+Deadlines: JOB_TIMEOUT_SECONDS plus, per second of source video, the job
+type's factor in JOB_TIMEOUT_FACTORS.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.models import Job, JobType, Video
+from app.utils.admission import job_type_setting
+
+CANCELLED = "cancelled"
+TIMED_OUT = "timed out"
+
+TIMEOUT_FACTORS = job_type_setting(settings.JOB_TIMEOUT_FACTORS, float)
+
+class JobInterrupted(subprocess.CalledProcessError):
+    """An FFmpeg command stopped (or not started) because its job was cancelled or timed out."""
+
+    def __init__(self, reason: str, command=None):
+        super().__init__(-signal.SIGTERM, command or [])
+        self.reason = reason
+
+    def __str__(self):
+        return f"Job {self.reason}"
+
+def job_timeout(job_type: JobType, duration: float | None) -> float | None:
+    """Wall-clock seconds a job may run; None without a limit."""
+    if not settings.JOB_TIMEOUT_SECONDS:
+        return None
+    return settings.JOB_TIMEOUT_SECONDS + TIMEOUT_FACTORS.get(job_type, 0.0) * (duration or 0.0)
+
+# FFmpeg processes running in this process, each leading its own process group
+_processes: set[subprocess.Popen] = set()
+_lock = threading.Lock()
+
+def register_process(process: subprocess.Popen):
+    with _lock:
+        _processes.add(process)
+
+def unregister_process(process: subprocess.Popen):
+    with _lock:
+        _processes.discard(process)
+
+def _signal_processes(signum: int):
+    with _lock:
+        processes = list(_processes)
+    for process in processes:
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+class JobWatchdog:
+    def __init__(self, job_id: int, timeout: float | None):
+        self.job_id = job_id
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _check(self) -> str | None:
+        if self.deadline and time.monotonic() > self.deadline:
+            return TIMED_OUT
+        db = SessionLocal()
+        try:
+            requested = db.query(Job.cancel_requested_at).filter(Job.id == self.job_id).scalar()
+        finally:
+            db.close()
+        return CANCELLED if requested else None
+
+    def _run(self):
+        while not self._stop.wait(settings.JOB_WATCHDOG_INTERVAL):
+            if self.reason:
+                # Still there after SIGTERM
+                _signal_processes(signal.SIGKILL)
+                continue
+            try:
+                reason = self._check()
+            except Exception as e:
+                print(f"Job {self.job_id}: watchdog check failed: {e}")
+                continue
+            if reason:
+                self.reason = reason
+                limit = f" after {self.timeout:.0f} s" if reason == TIMED_OUT else ""
+                print(f"Job {self.job_id} {reason}{limit}, stopping FFmpeg")
+                _signal_processes(signal.SIGTERM)
+
+# Watchdog of the job running in this process (None outside jobs)
+_watchdog: JobWatchdog | None = None
+
+def start_watchdog(job_id: int, job_type: JobType) -> JobWatchdog:
+    global _watchdog
+    db = SessionLocal()
+    try:
+        duration = (
+            db.query(Video.duration)
+            .join(Job, Job.video_id == Video.id)
+            .filter(Job.id == job_id)
+            .scalar()
+        )
+    finally:
+        db.close()
+    _watchdog = JobWatchdog(job_id, job_timeout(job_type, duration))
+    _watchdog.start()
+    return _watchdog
+
+def stop_watchdog() -> str | None:
+    """Stops the current job's watchdog; returns why the job was interrupted, if it was."""
+    global _watchdog
+    watchdog, _watchdog = _watchdog, None
+    if not watchdog:
+        return None
+    watchdog.stop()
+    return watchdog.reason
+
+def interrupted() -> str | None:
+    return _watchdog.reason if _watchdog else None
+
+def check_interrupted(command=None):
+    """Raises JobInterrupted once the current job has been cancelled or timed out."""
+    reason = interrupted()
+    if reason:
+        raise JobInterrupted(reason, command)
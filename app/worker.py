@@ -0,0 +1,261 @@
+# app/worker.py
+"""
+Job worker. Runs the jobs queued in the `jobs` table outside the API process:
+
+    python -m app.worker
+
+Each worker claims jobs with a lease, runs them in a bounded process pool and
+renews the leases while they run. Any number of workers (on one host or many)
+can share the same database; a job whose worker dies is picked up again once
+its lease expires, and every JOB_REAPER_INTERVAL the workers settle such jobs
+(re-queued, or failed after JOB_MAX_ATTEMPTS) even when none is free to run
+them. Running jobs are stopped when cancelled or past their timeout (see
+app.utils.watchdog).
+
+The host's WORKER_CPU_THREADS are split between the running jobs: each job
+gets an even share of the threads the others have left, and FFmpeg is held to
+it (see app.utils.encoding).
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from prometheus_client import start_http_server
+
+from app.core.config import settings
+from app.crud.job import claim_next_job, finish_interrupted_job, reap_expired_jobs, renew_leases, release_job
+from app.database import SessionLocal
+from app.models.models import JobType, VideoQuality
+from app.utils import job_events  # noqa: F401 (publishes job changes with NOTIFY)
+from app.utils.encoding import set_job_threads
+from app.utils.metrics import JOBS_IN_FLIGHT, finish_job_stats, observe_job, start_job_stats
+from app.utils.watchdog import CANCELLED, start_watchdog, stop_watchdog
+from app.utils.ffmpeg import (
+    add_overlay_in_background,
+    create_mezzanine_in_background,
+    generate_previews_in_background,
+    multi_quality_export_in_background,
+    package_hls_in_background,
+    quality_export_in_background,
+    run_pipeline_in_background,
+    trim_video_in_background,
+    upload_video_task,
+)
+
+
+def run_job(job_id: int, job_type: JobType, params: dict | None, threads: int | None = None) -> dict | None:
+    """
+    Runs a single job inside a pool process, as claimed by the worker, on
+    `threads` CPU threads, under a watchdog that stops it when it is
+    cancelled or times out. Returns what it cost (see app.utils.metrics).
+    """
+    params = params or {}
+    set_job_threads(threads)
+    start_job_stats()
+    start_watchdog(job_id, job_type)
+    try:
+        _run_job(job_id, job_type, params)
+    finally:
+        reason = stop_watchdog()
+        stats = finish_job_stats()
+    if reason:
+        db = SessionLocal()
+        try:
+            finish_interrupted_job(db, job_id, cancelled=reason == CANCELLED)
+        finally:
+            db.close()
+    return stats
+
+
+def _run_job(job_id: int, job_type: JobType, params: dict):
+    if job_type == JobType.upload:
+        upload_video_task(job_id, params["file_path"])
+    elif job_type == JobType.trim:
+        trim_video_in_background(job_id, params["input_path"])
+    elif job_type == JobType.overlay:
+        add_overlay_in_background(job_id, params["input_path"])
+    elif job_type == JobType.quality_export and "qualities" in params:
+        multi_quality_export_in_background(
+            job_id=job_id,
+            input_video_id=params["input_video_id"],
+            qualities=[VideoQuality(q) for q in params["qualities"]]
+        )
+    elif job_type == JobType.quality_export:
+        quality_export_in_background(
+            job_id=job_id,
+            input_video_id=params["input_video_id"],
+            quality=VideoQuality(params["quality"])
+        )
+    elif job_type == JobType.package:
+        package_hls_in_background(job_id, params["video_id"])
+    elif job_type == JobType.pipeline:
+        run_pipeline_in_background(job_id, params["input_path"])
+    elif job_type == JobType.previews:
+        generate_previews_in_background(job_id, params["video_id"])
+    elif job_type == JobType.mezzanine:
+        create_mezzanine_in_background(job_id, params["video_id"])
+    else:
+        raise ValueError(f"No handler for job type {job_type}")
+
+
+def _init_pool_process():
+    # Ctrl+C reaches the whole process group; let the parent decide when to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Worker:
+    def __init__(
+        self,
+        concurrency: int = settings.WORKER_CONCURRENCY,
+        cpu_threads: int = settings.WORKER_CPU_THREADS,
+        lease_seconds: int = settings.JOB_LEASE_SECONDS,
+        poll_interval: float = settings.WORKER_POLL_INTERVAL,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        reaper_interval: float = settings.JOB_REAPER_INTERVAL,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.cpu_threads = max(1, cpu_threads)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.reaper_interval = reaper_interval
+        self._last_reap = 0.0
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._in_flight = {}  # job_id -> Future
+        self._threads = {}    # job_id -> CPU threads granted
+        self._claimed = {}    # job_id -> (job type, seconds it waited in the queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()      # stop claiming new jobs
+        self._finished = threading.Event()  # everything drained; stop heartbeats
+
+    def _new_pool(self):
+        # "spawn" so pool processes never inherit the parent's DB connections.
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pool_process
+        )
+
+    def _heartbeat(self):
+        db = SessionLocal()
+        try:
+            while not self._finished.wait(self.lease_seconds / 3):
+                with self._lock:
+                    job_ids = list(self._in_flight)
+                try:
+                    renew_leases(db, self.worker_id, job_ids, self.lease_seconds)
+                except Exception as e:
+                    db.rollback()
+                    print(f"Worker {self.worker_id}: lease renewal failed: {e}", flush=True)
+        finally:
+            db.close()
+
+    def _reap(self, db):
+        """Releases the leases of jobs whose pool task has finished."""
+        with self._lock:
+            finished = [job_id for job_id, future in self._in_flight.items() if future.done()]
+        broken = False
+        for job_id in finished:
+            with self._lock:
+                future = self._in_flight.pop(job_id)
+                self._threads.pop(job_id, None)
+            job_type, queue_seconds = self._claimed.pop(job_id)
+            JOBS_IN_FLIGHT.labels(job_type.value).dec()
+            error = future.exception()
+            if error:
+                print(f"Job {job_id} crashed: {error!r}", flush=True)
+            # A dead pool process takes every in-flight job down with it, not
+            # just the guilty one, so those go back to the queue.
+            pool_died = isinstance(error, BrokenProcessPool)
+            broken = broken or pool_died
+            stats = None if error else future.result()
+            status = release_job(db, job_id, self.worker_id, requeue=pool_died, stats=stats, queue_seconds=queue_seconds)
+            observe_job(job_type, status.value if status else "lost", stats, queue_seconds)
+        return broken
+
+    def _reap_expired(self, db):
+        """Settles the jobs of workers that disappeared, once every reaper interval."""
+        now = time.monotonic()
+        if now - self._last_reap < self.reaper_interval:
+            return
+        self._last_reap = now
+        for job in reap_expired_jobs(db, self.max_attempts):
+            print(f"Worker {self.worker_id}: job {job.id} lost its worker, now {job.status.value}", flush=True)
+
+    def _job_threads(self) -> int:
+        """Threads for the next job: an even share of what the running jobs leave free."""
+        free_threads = self.cpu_threads - sum(self._threads.values())
+        free_slots = self.concurrency - len(self._in_flight)
+        return max(1, free_threads // max(1, free_slots))
+
+    def _fill(self, db, pool):
+        """Claims jobs until every pool slot is busy or the queue is empty."""
+        while len(self._in_flight) < self.concurrency and not self._stop.is_set():
+            job = claim_next_job(db, self.worker_id, self.lease_seconds, self.max_attempts)
+            if not job:
+                return
+            threads = self._job_threads()
+            created_at = job.created_at
+            if created_at and created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)  # SQLite drops the zone
+            queue_seconds = (datetime.now(timezone.utc) - created_at).total_seconds() if created_at else None
+            self._claimed[job.id] = (job.job_type, queue_seconds)
+            JOBS_IN_FLIGHT.labels(job.job_type.value).inc()
+            print(f"Worker {self.worker_id}: running job {job.id} ({job.job_type.value}, {threads} threads)", flush=True)
+            with self._lock:
+                self._threads[job.id] = threads
+                self._in_flight[job.id] = pool.submit(run_job, job.id, job.job_type, job.params, threads)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        signal.signal(signal.SIGINT, lambda *_: self._stop.set())
+
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        if settings.WORKER_METRICS_PORT:
+            start_http_server(settings.WORKER_METRICS_PORT)
+        print(f"Worker {self.worker_id} started with {self.concurrency} processes, {self.cpu_threads} threads.", flush=True)
+
+        # The claimed job's columns stay loaded after commit (no refresh query)
+        db = SessionLocal(expire_on_commit=False)
+        pool = self._new_pool()
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self._reap(db):
+                        # A pool process died; the pool is unusable from here on.
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = self._new_pool()
+                    self._reap_expired(db)
+                    self._fill(db, pool)
+                except Exception as e:
+                    db.rollback()
+                    print(f"Worker {self.worker_id}: {e}", flush=True)
+                self._stop.wait(self.poll_interval)
+
+            # Graceful shutdown: finish what is running, claim nothing new.
+            # Leases keep being renewed until the pool has drained.
+            print(f"Worker {self.worker_id} draining {len(self._in_flight)} job(s)...", flush=True)
+            pool.shutdown(wait=True)
+            self._reap(db)
+        finally:
+            self._finished.set()
+            db.close()
+        print(f"Worker {self.worker_id} stopped.", flush=True)
+
+
+def main():
+    Worker().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# benchmarks/media_jobs.py
+"""
+End-to-end benchmark of the media jobs in app.utils.ffmpeg.
+
+Generates synthetic sources locally with FFmpeg's lavfi (testsrc2 video
+with a sine tone, a keyframe every 2 s) for each resolution and duration,
+registers each one through the real upload job, then runs every job kind
+against it the way the worker does: `app.worker.run_job` in a fresh
+spawned process, on a throwaway SQLite database unless --database-url is
+given. Overlays use the bundled "Overlay assets _" files.
+
+Every run records wall time, CPU time (the job process plus its FFmpeg
+children), peak RSS (the larger of the two), output size and realtime
+factor (seconds of source media processed per second of wall time). The
+artifact cache and previews are cleared before each run, so every run
+really encodes. --json output carries the FFmpeg version and host CPU
+count, to keep results from different runs comparable.
+
+    python -m benchmarks.media_jobs
+    python -m benchmarks.media_jobs --resolutions 720p,1080p --durations 30 --jobs trim,pipeline --repeat 3 --json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+RESOLUTIONS = {
+    "360p": "640x360",
+    "480p": "854x480",
+    "720p": "1280x720",
+    "1080p": "1920x1080",
+}
+
+# In the order they run; package needs the renditions of multi_quality
+JOB_KINDS = [
+    "upload",
+    "previews",
+    "trim",
+    "overlay_full",
+    "overlay_windowed",
+    "overlay_video",
+    "quality_export",
+    "multi_quality",
+    "package",
+    "pipeline",
+]
+
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "Overlay assets _"
+IMAGE_OVERLAY = "bench_image.png"
+VIDEO_OVERLAY = "bench_clip.mp4"
+
+def generate_source(path: str, size: str, duration: float):
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-g", "60", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        path
+    ]
+    subprocess.run(command, check=True)
+
+def _measure(job_id: int, job_type, params: dict) -> dict:
+    """Runs one job in this (fresh) process and reports what it cost."""
+    from app.worker import run_job
+
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    # The jobs' own messages stay out of the --json output
+    with contextlib.redirect_stdout(sys.stderr):
+        run_job(job_id, job_type, params)
+    wall = time.perf_counter() - started
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (own.ru_utime - before.ru_utime) + (own.ru_stime - before.ru_stime) + children.ru_utime + children.ru_stime
+    return {
+        "wall_s": wall,
+        "cpu_s": cpu,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": max(own.ru_maxrss, children.ru_maxrss) / 1024,
+        "ffmpeg_peak_rss_mb": children.ru_maxrss / 1024,
+    }
+
+def _directory_bytes(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+def output_bytes(db, job) -> int:
+    from app.models.models import JobType, VideoVersion
+
+    if not job.output_file:
+        return 0
+    if job.job_type in (JobType.previews, JobType.package):
+        return _directory_bytes(os.path.dirname(job.output_file))
+    versions = db.query(VideoVersion).filter(VideoVersion.job_id == job.id).all()
+    if len(versions) > 1:
+        return sum(os.path.getsize(v.file_path) for v in versions if os.path.exists(v.file_path))
+    return os.path.getsize(job.output_file) if os.path.exists(job.output_file) else 0
+
+def create_job(db, kind: str, source_path: str, video, duration: float, profile: str | None):
+    """Queues one job of `kind` like the API would; returns (job, seconds of media it processes)."""
+    from app.crud.job import (
+        enqueue_job, package_job_fields, preview_job_fields, quality_export_job_fields, trim_job_fields
+    )
+    from app.models.models import Job, JobStatus, JobType, Overlay, OverlayType, VideoQuality
+    from app.schemas.job import TrimJobCreate
+    from app.schemas.quality_export import QualityExportCreate
+    from app.utils.ffmpeg import video_file_path
+
+    # Cuts and overlay windows start off the 2 s keyframe grid, like real edits
+    start, end = round(duration * 0.25, 3) + 0.3, round(duration * 0.75, 3) + 0.3
+
+    if kind == "upload":
+        upload_path = os.path.join("uploads", f"upload_{time.monotonic_ns()}_{os.path.basename(source_path)}")
+        shutil.copyfile(source_path, upload_path)
+        return enqueue_job(db, JobType.upload, params={"file_path": upload_path}), duration
+    if kind == "previews":
+        return enqueue_job(db, **preview_job_fields(video.id)), duration
+    if kind == "trim":
+        trim_data = TrimJobCreate(start_time=start, end_time=end, profile=profile)
+        return enqueue_job(db, **trim_job_fields(video, trim_data, video_file_path(video))), end - start
+    if kind == "quality_export":
+        quality_data = QualityExportCreate(quality=VideoQuality.p480, profile=profile)
+        return enqueue_job(db, **quality_export_job_fields(video.id, quality_data)), duration
+    if kind == "multi_quality":
+        quality_data = QualityExportCreate(qualities=list(VideoQuality), profile=profile)
+        return enqueue_job(db, **quality_export_job_fields(video.id, quality_data)), duration
+    if kind == "package":
+        return enqueue_job(db, **package_job_fields(video.id)), duration
+
+    params = {"input_path": video_file_path(video)}
+    if profile:
+        params["profile"] = profile
+    if kind == "pipeline":
+        job_type, media_seconds = JobType.pipeline, end - start
+        params.update({
+            "operations": [
+                {"op": "trim", "start_time": start, "end_time": end},
+                {"op": "overlay", "layers": 1},
+                {"op": "export", "quality": VideoQuality.p720.value},
+            ],
+            "keep_intermediates": False,
+        })
+        layer = (OverlayType.image, IMAGE_OVERLAY, start, end)
+    else:
+        job_type, media_seconds = JobType.overlay, duration
+        params["mode"] = {"overlay_full": "full", "overlay_windowed": "windowed", "overlay_video": "auto"}[kind]
+        if kind == "overlay_video":
+            layer = (OverlayType.video, VIDEO_OVERLAY, start, start + 5)
+        elif kind == "overlay_windowed":
+            layer = (OverlayType.image, IMAGE_OVERLAY, start, start + 2)
+        else:
+            layer = (OverlayType.image, IMAGE_OVERLAY, start, end)
+
+    job = Job(video_id=video.id, job_type=job_type, status=JobStatus.pending, params=params)
+    db.add(job)
+    db.flush()
+    overlay_type, content, overlay_start, overlay_end = layer
+    db.add(Overlay(
+        video_id=video.id, job_id=job.id, type=overlay_type, content=content,
+        position="top-right", start_time=overlay_start, end_time=overlay_end
+    ))
+    db.commit()
+    return job, media_seconds
+
+def clear_caches(db):
+    """Drops cached outputs so the next job encodes instead of reusing them."""
+    from app.models.models import Artifact
+
+    db.query(Artifact).delete()
+    db.commit()
+    shutil.rmtree(os.path.join("processed", "previews"), ignore_errors=True)
+
+def run_benchmark(args, sources) -> list[dict]:
+    from app.database import Base, SessionLocal, engine
+    from app.models.models import Job, JobStatus, Video
+
+    Base.metadata.create_all(bind=engine)
+    results = []
+    db = SessionLocal()
+    try:
+        for resolution, duration, source_path in sources:
+            video = None
+            for run in range(args.repeat):
+                for kind in args.jobs:
+                    if kind != "upload" and video is None:
+                        raise SystemExit("every job but upload needs an uploaded video; include 'upload' in --jobs")
+                    clear_caches(db)
+                    job, media_seconds = create_job(db, kind, source_path, video, duration, args.profile)
+                    job_id, job_type, params = job.id, job.job_type, job.params
+
+                    # A fresh process per run: the peak RSS of its FFmpeg children is this job's alone
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                        measured = pool.submit(_measure, job_id, job_type, params).result()
+
+                    db.expire_all()
+                    job = db.get(Job, job_id)
+                    if kind == "upload" and video is None and job.video_id:
+                        video = db.get(Video, job.video_id)
+                    results.append({
+                        "job": kind,
+                        "resolution": resolution,
+                        "duration": duration,
+                        "run": run,
+                        "status": job.status.value,
+                        **measured,
+                        "output_bytes": output_bytes(db, job),
+                        "realtime": media_seconds / measured["wall_s"] if job.status == JobStatus.done else None,
+                    })
+                    if not args.json:
+                        r = results[-1]
+                        print(f"  {kind:<17}{resolution:>7}{duration:>7g}s  run {run}: {r['wall_s']:.2f} s {r['status']}", flush=True)
+    finally:
+        db.close()
+    return results
+
+def summarize(results: list[dict]) -> list[dict]:
+    """Median of every metric per (job, resolution, duration)."""
+    groups = {}
+    for r in results:
+        groups.setdefault((r["job"], r["resolution"], r["duration"]), []).append(r)
+    summary = []
+    for (kind, resolution, duration), runs in groups.items():
+        done = [r for r in runs if r["status"] == "done"] or runs
+        summary.append({
+            "job": kind,
+            "resolution": resolution,
+            "duration": duration,
+            "runs": len(runs),
+            "failed": sum(r["status"] != "done" for r in runs),
+            **{
+                metric: statistics.median(r[metric] for r in done)
+                for metric in ("wall_s", "cpu_s", "peak_rss_mb", "output_bytes")
+            },
+            "realtime": statistics.median(r["realtime"] for r in done) if done[0]["realtime"] else None,
+        })
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default="480p,1080p", help=f"comma-separated, from {', '.join(RESOLUTIONS)}")
+    parser.add_argument("--durations", default="10,60", help="comma-separated source durations in seconds")
+    parser.add_argument("--jobs", default=",".join(JOB_KINDS), help="comma-separated job kinds, run in this order")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per job (medians are reported)")
+    parser.add_argument("--profile", help="encoding profile for the jobs that take one")
+    parser.add_argument("--database-url", help="empty database to use (default: a temporary SQLite file)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    args.jobs = [kind for kind in args.jobs.split(",") if kind]
+    unknown = [kind for kind in args.jobs if kind not in JOB_KINDS]
+    if unknown:
+        parser.error(f"unknown job kind(s): {', '.join(unknown)}")
+    resolutions = [r for r in args.resolutions.split(",") if r]
+    if any(r not in RESOLUTIONS for r in resolutions):
+        parser.error(f"resolutions must be among {', '.join(RESOLUTIONS)}")
+    durations = [float(d) for d in args.durations.split(",") if d]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The jobs read and write uploads/, processed/ and overlays_media/ relative to the working directory
+        os.chdir(tmp)
+        try:
+            for folder in ("uploads", "processed", "overlays_media", "sources"):
+                os.makedirs(folder)
+            shutil.copyfile(ASSETS_DIR / "Image Overlay.png", os.path.join("overlays_media", IMAGE_OVERLAY))
+            shutil.copyfile(ASSETS_DIR / "B-roll 1.mp4", os.path.join("overlays_media", VIDEO_OVERLAY))
+
+            # Set before app.database is first imported, here and in the spawned job processes
+            os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+            sources = []
+            for resolution in resolutions:
+                for duration in durations:
+                    path = os.path.join(tmp, "sources", f"{resolution}_{duration:g}s.mp4")
+                    generate_source(path, RESOLUTIONS[resolution], duration)
+                    sources.append((resolution, duration, path))
+
+            results = run_benchmark(args, sources)
+        finally:
+            os.chdir(cwd)
+
+    from app.utils.artifacts import ffmpeg_version
+
+    summary = summarize(results)
+    if args.json:
+        print(json.dumps({
+            "ffmpeg": ffmpeg_version(),
+            "cpu_count": os.cpu_count(),
+            "profile": args.profile,
+            "summary": summary,
+            "results": results,
+        }, indent=2))
+        return
+
+    print(f"{'job':<18}{'res':>6}{'dur s':>7}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'out MB':>9}{'realtime':>10}")
+    for s in summary:
+        realtime = f"{s['realtime']:.2f}x" if s["realtime"] else "failed"
+        print(
+            f"{s['job']:<18}{s['resolution']:>6}{s['duration']:>7g}{s['wall_s']:>9.2f}{s['cpu_s']:>9.2f}"
+            f"{s['peak_rss_mb']:>9.1f}{s['output_bytes'] / 1e6:>9.2f}{realtime:>10}"
+        )
+
+if __name__ == "__main__":
+    main()
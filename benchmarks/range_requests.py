@@ -0,0 +1,140 @@
+# benchmarks/range_requests.py
+"""
+Seek-heavy download benchmark for app.utils.file_response.
+
+Serves a generated file through `file_response()` on a local uvicorn server
+and replays a player-like access pattern: N seeks to random offsets, each
+reading a fixed window. Three strategies are compared:
+
+- full:        plain GET, read from byte 0 up to the end of the window
+               (what a client has to do when ranges are not supported)
+- range:       GET with `Range: bytes=<offset>-<offset+window-1>`
+- revalidate:  GET with `If-None-Match` for a file the client already has
+
+For each it reports bytes transferred and time to first useful byte (the
+first byte of the window, not merely the first byte of the response).
+
+    python -m benchmarks.range_requests --size-mb 256 --seeks 50
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+from app.utils.file_response import file_response
+
+READ_SIZE = 64 * 1024
+
+def build_app(path: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/file")
+    def get_file(request: Request):
+        return file_response(request, path, media_type="video/mp4")
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def fetch(port: int, headers: dict, offset: int, window: int):
+    """Returns (bytes received, seconds until the first byte of the window)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    started = time.perf_counter()
+    conn.request("GET", "/file", headers=headers)
+    response = conn.getresponse()
+
+    # Where the window starts in this response's body
+    skip = offset if response.status == 200 else 0
+    wanted = skip + window if response.status in (200, 206) else 0
+    received = 0
+    first_useful = None
+    while received < wanted:
+        chunk = response.read(min(READ_SIZE, wanted - received))
+        if not chunk:
+            break
+        received += len(chunk)
+        if first_useful is None and received > skip:
+            first_useful = time.perf_counter() - started
+    conn.close()  # A real client would abort the transfer here too
+    return received, first_useful if first_useful is not None else time.perf_counter() - started
+
+def summarize(name, samples):
+    sizes = [s[0] for s in samples]
+    ttfb = [s[1] * 1000 for s in samples]
+    return {
+        "strategy": name,
+        "requests": len(samples),
+        "bytes_total": sum(sizes),
+        "bytes_mean": statistics.mean(sizes),
+        "ttfb_ms_median": statistics.median(ttfb),
+        "ttfb_ms_p95": sorted(ttfb)[max(0, int(len(ttfb) * 0.95) - 1)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=128, help="size of the generated file")
+    parser.add_argument("--seeks", type=int, default=30, help="number of random seeks")
+    parser.add_argument("--window-kb", type=int, default=512, help="bytes read after each seek")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    size = args.size_mb * 1024 * 1024
+    window = args.window_kb * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "media.mp4")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(build_app(path), host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        offsets = [rng.randrange(0, size - window) for _ in range(args.seeks)]
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/file", headers={"Range": "bytes=0-0"})
+        etag = conn.getresponse().getheader("etag")
+        conn.close()
+
+        results = [
+            summarize("full", [fetch(port, {}, o, window) for o in offsets]),
+            summarize("range", [fetch(port, {"Range": f"bytes={o}-{o + window - 1}"}, o, window) for o in offsets]),
+            summarize("revalidate", [fetch(port, {"If-None-Match": etag}, o, window) for o in offsets]),
+        ]
+
+        server.should_exit = True
+        thread.join()
+
+    if args.json:
+        print(json.dumps({"size": size, "window": window, "seeks": args.seeks, "results": results}, indent=2))
+        return
+
+    print(f"{args.seeks} seeks, {args.window_kb} KiB window, {args.size_mb} MiB file")
+    print(f"{'strategy':<12}{'MiB total':>12}{'KiB/req':>12}{'TTFB p50 ms':>14}{'TTFB p95 ms':>14}")
+    for r in results:
+        print(
+            f"{r['strategy']:<12}{r['bytes_total'] / 2**20:>12.1f}{r['bytes_mean'] / 1024:>12.1f}"
+            f"{r['ttfb_ms_median']:>14.2f}{r['ttfb_ms_p95']:>14.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/video_listing.py
+"""
+Video listing benchmark for app.crud.video.get_videos.
+
+Fills a database with N synthetic video rows (a third of them derived
+versions) and times one page of the listing fetched three ways at
+increasing depth into the table:
+
+- offset:   ORDER BY id OFFSET <depth> LIMIT <page>, all columns
+- keyset:   WHERE id > <last id> ORDER BY id LIMIT <page>, all columns
+            (what GET /videos/ does with a cursor)
+- projected: keyset, only `id,filename,duration`
+
+plus a filtered keyset page (`derived=true`, `min_duration`) and,
+optionally, the old unpaginated `db.query(Video).all()`.
+
+    python -m benchmarks.video_listing --rows 1000000
+    python -m benchmarks.video_listing --database-url postgresql://... --rows 1000000 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.crud.video import VIDEO_LIST_FIELDS, get_videos
+from app.database import Base
+from app.models.models import Video
+
+INSERT_BATCH = 10_000
+
+def populate(engine, rows: int, seed: int):
+    rng = random.Random(seed)
+    epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        for first in range(1, rows + 1, INSERT_BATCH):
+            batch = []
+            for i in range(first, min(first + INSERT_BATCH, rows + 1)):
+                derived = i > 1 and i % 3 == 0
+                batch.append({
+                    "id": i,
+                    "filename": f"video_{i}.mp4",
+                    "duration": round(rng.uniform(5, 3600), 3),
+                    "size": rng.randrange(1_000_000, 2_000_000_000),
+                    "upload_time": epoch + timedelta(seconds=i * 30),
+                    "original_video_id": rng.randrange(1, i) if derived else None,
+                    "container": "mov,mp4,m4a,3gp,3g2,mj2",
+                    "video_codec": "h264",
+                    "audio_codec": "aac",
+                    "width": 1920,
+                    "height": 1080,
+                    "fps": 30.0,
+                    "bitrate": 8_000_000,
+                    "has_audio": True,
+                    "rotation": 0,
+                })
+            conn.execute(insert(Video), batch)
+
+def timed(fn, repeat: int):
+    """Returns (median milliseconds, rows returned by the last run)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), len(result)
+
+def offset_page(db: Session, depth: int, page: int):
+    columns = [getattr(Video, name) for name in VIDEO_LIST_FIELDS]
+    return db.execute(select(*columns).order_by(Video.id).offset(depth).limit(page)).mappings().all()
+
+def id_at_depth(db: Session, depth: int) -> int:
+    """The id a keyset cursor would hold after reading `depth` rows."""
+    if depth == 0:
+        return 0
+    return db.execute(select(Video.id).order_by(Video.id).offset(depth - 1).limit(1)).scalar_one()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of video rows to generate")
+    parser.add_argument("--page", type=int, default=100, help="page size")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is reported)")
+    parser.add_argument("--database-url", help="empty database to fill (default: a temporary SQLite file)")
+    parser.add_argument("--full-scan", action="store_true", help="also time the unpaginated db.query(Video).all()")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'listing.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+
+        started = time.perf_counter()
+        populate(engine, args.rows, args.seed)
+        populate_seconds = time.perf_counter() - started
+
+        depths = sorted({0, args.rows // 10, args.rows // 2, max(args.rows - args.page, 0)})
+        results = []
+        with Session(engine) as db:
+            total = db.execute(select(func.count(Video.id))).scalar_one()
+            for depth in depths:
+                after_id = id_at_depth(db, depth)
+                for strategy, fn in (
+                    ("offset", lambda: offset_page(db, depth, args.page)),
+                    ("keyset", lambda: get_videos(db, limit=args.page, after_id=after_id)),
+                    ("projected", lambda: get_videos(db, limit=args.page, after_id=after_id,
+                                                     fields=["id", "filename", "duration"])),
+                    ("filtered", lambda: get_videos(db, limit=args.page, after_id=after_id,
+                                                    derived=True, min_duration=600)),
+                ):
+                    ms, count = timed(fn, args.repeat)
+                    results.append({"strategy": strategy, "depth": depth, "rows": count, "ms_median": ms})
+
+            if args.full_scan:
+                ms, count = timed(lambda: db.query(Video).all(), 1)
+                results.append({"strategy": "full_scan", "depth": 0, "rows": count, "ms_median": ms})
+                db.expunge_all()
+
+        engine.dispose()
+
+    if args.json:
+        print(json.dumps({
+            "database": engine.dialect.name,
+            "rows": total,
+            "page": args.page,
+            "populate_seconds": populate_seconds,
+            "results": results,
+        }, indent=2))
+        return
+
+    print(f"{total} rows on {engine.dialect.name} (filled in {populate_seconds:.1f} s), page of {args.page}")
+    print(f"{'strategy':<12}{'depth':>12}{'rows':>10}{'ms p50':>12}")
+    for r in results:
+        print(f"{r['strategy']:<12}{r['depth']:>12}{r['rows']:>10}{r['ms_median']:>12.2f}")
+
+if __name__ == "__main__":
+    main()
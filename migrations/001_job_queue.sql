@@ -0,0 +1,12 @@
+-- Job queue columns used by the worker (python -m app.worker).
+-- Apply to databases created before this change:
+--   psql fastapi_db -f migrations/001_job_queue.sql
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS params JSON;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS worker_id VARCHAR;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+
+-- Jobs queued through BackgroundTasks never recorded their arguments and
+-- can't be resumed by a worker.
+UPDATE jobs SET status = 'failed' WHERE status IN ('pending', 'processing') AND params IS NULL;
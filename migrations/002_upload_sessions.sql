@@ -0,0 +1,17 @@
+-- Resumable chunked uploads (POST /uploads/).
+-- (create_db.py creates new tables itself; this is for applying by hand.)
+
+CREATE TYPE uploadstatus AS ENUM ('uploading', 'completed');
+
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id VARCHAR PRIMARY KEY,
+    filename VARCHAR,
+    size BIGINT,
+    received_bytes BIGINT NOT NULL DEFAULT 0,
+    expected_sha256 VARCHAR,
+    sha256 VARCHAR,
+    status uploadstatus,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    job_id INTEGER REFERENCES jobs (id)
+);
@@ -0,0 +1,7 @@
+-- Per-rendition status for multi-quality exports.
+
+ALTER TABLE video_versions ADD COLUMN IF NOT EXISTS job_id INTEGER REFERENCES jobs (id);
+ALTER TABLE video_versions ADD COLUMN IF NOT EXISTS status jobstatus;
+
+-- Versions created before this change only exist once their export finished.
+UPDATE video_versions SET status = 'done' WHERE status IS NULL;
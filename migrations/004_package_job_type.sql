@@ -0,0 +1,3 @@
+-- HLS packaging jobs (POST /videos/{video_id}/package).
+
+ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'package';
@@ -0,0 +1,13 @@
+-- Stream metadata persisted from a single ffprobe run per file.
+
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS container VARCHAR;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS video_codec VARCHAR;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS audio_codec VARCHAR;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS width INTEGER;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS height INTEGER;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS fps DOUBLE PRECISION;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS bitrate BIGINT;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS has_audio BOOLEAN;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS rotation INTEGER;
+
+ALTER TABLE overlays ADD COLUMN IF NOT EXISTS media_info JSON;
@@ -0,0 +1,3 @@
+-- Keyframe timestamps used by smart-cut trimming.
+
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS keyframe_index BYTEA;
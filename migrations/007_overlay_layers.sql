@@ -0,0 +1,4 @@
+-- Overlays belong to the job that renders them, so one job can composite several layers.
+
+ALTER TABLE overlays ADD COLUMN IF NOT EXISTS job_id INTEGER REFERENCES jobs(id);
+CREATE INDEX IF NOT EXISTS ix_overlays_job_id ON overlays (job_id);
@@ -0,0 +1,5 @@
+-- Live job progress reported by FFmpeg's -progress output.
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS progress DOUBLE PRECISION;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS eta_seconds DOUBLE PRECISION;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS speed DOUBLE PRECISION;
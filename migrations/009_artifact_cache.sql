@@ -0,0 +1,26 @@
+-- Content-addressed cache of derived files (see app/utils/artifacts.py).
+
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_videos_content_hash ON videos (content_hash);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    id SERIAL PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL UNIQUE,
+    operation VARCHAR NOT NULL,
+    params JSON,
+    source_video_id INTEGER REFERENCES videos(id),
+    file_path VARCHAR NOT NULL,
+    size BIGINT NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_artifacts_last_used_at ON artifacts (last_used_at);
+
+CREATE TABLE IF NOT EXISTS artifact_cache_stats (
+    operation VARCHAR PRIMARY KEY,
+    hits BIGINT NOT NULL DEFAULT 0,
+    misses BIGINT NOT NULL DEFAULT 0,
+    evictions BIGINT NOT NULL DEFAULT 0,
+    evicted_bytes BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,13 @@
+-- Indexes behind the paginated, filtered listings (see app/crud/video.py)
+-- and the foreign keys every job, overlay and version lookup filters on.
+
+CREATE INDEX IF NOT EXISTS ix_videos_original_video_id ON videos (original_video_id);
+CREATE INDEX IF NOT EXISTS ix_videos_upload_time ON videos (upload_time);
+CREATE INDEX IF NOT EXISTS ix_videos_duration ON videos (duration);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_video_id ON jobs (video_id);
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status);
+
+CREATE INDEX IF NOT EXISTS ix_overlays_video_id ON overlays (video_id);
+
+CREATE INDEX IF NOT EXISTS ix_video_versions_video_id ON video_versions (video_id);
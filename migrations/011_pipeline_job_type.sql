@@ -0,0 +1,3 @@
+-- Fused trim/overlay/export jobs (POST /videos/{video_id}/pipeline).
+
+ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'pipeline';
@@ -0,0 +1,4 @@
+-- Poster, thumbnails and scrubbing sprite sheets (GET /videos/{video_id}/previews).
+
+ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'previews';
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS preview_key VARCHAR;
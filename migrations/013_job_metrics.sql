@@ -0,0 +1,9 @@
+-- Per-job resource figures stored by the worker (see app/utils/metrics.py).
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS queue_seconds DOUBLE PRECISION;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS run_seconds DOUBLE PRECISION;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS ffmpeg_seconds DOUBLE PRECISION;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS cpu_seconds DOUBLE PRECISION;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS max_rss_bytes BIGINT;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS stage_seconds JSON;
+CREATE INDEX IF NOT EXISTS ix_jobs_run_seconds ON jobs (run_seconds);
@@ -0,0 +1,14 @@
+-- Overlay asset library: each overlay file is stored and probed once and shared by every layer that shows it.
+
+CREATE TABLE IF NOT EXISTS overlay_assets (
+    id SERIAL PRIMARY KEY,
+    sha256 VARCHAR(64) NOT NULL UNIQUE,
+    filename VARCHAR NOT NULL,
+    file_path VARCHAR NOT NULL,
+    size BIGINT NOT NULL,
+    media_info JSON,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+ALTER TABLE overlays ADD COLUMN IF NOT EXISTS asset_id INTEGER REFERENCES overlay_assets(id);
+CREATE INDEX IF NOT EXISTS ix_overlays_asset_id ON overlays (asset_id);
@@ -0,0 +1,3 @@
+-- Per-chunk state of chunk-parallel encodes (see app/utils/smartcut.py).
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS chunks JSON;
@@ -0,0 +1,4 @@
+-- Ingest normalization: normalized mezzanine copies that jobs read instead of unfriendly uploads.
+
+ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'mezzanine';
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS mezzanine_video_id INTEGER REFERENCES videos(id);
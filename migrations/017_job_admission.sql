@@ -0,0 +1,6 @@
+-- Admission control and fair scheduling: the client behind each job, and
+-- completion times for measuring throughput (see app/utils/admission.py).
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS client_id VARCHAR;
+CREATE INDEX IF NOT EXISTS ix_jobs_client_id ON jobs (client_id);
+CREATE INDEX IF NOT EXISTS ix_jobs_completed_at ON jobs (completed_at);
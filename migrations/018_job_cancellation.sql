@@ -0,0 +1,4 @@
+-- Job cancellation and timeouts (see app/utils/watchdog.py).
+
+ALTER TYPE jobstatus ADD VALUE IF NOT EXISTS 'cancelled';
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS cancel_requested_at TIMESTAMP WITH TIME ZONE;
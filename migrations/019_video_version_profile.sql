@@ -0,0 +1,3 @@
+-- Encoding profile of each video version, so repeated exports reuse it.
+
+ALTER TABLE video_versions ADD COLUMN IF NOT EXISTS profile VARCHAR;
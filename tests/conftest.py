@@ -0,0 +1,47 @@
+# tests/conftest.py
+"""
+The tests run against a throwaway SQLite database, set up before the app
+is imported. Every test starts with empty tables.
+"""
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="video-api-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import pytest
+
+from app.database import Base, SessionLocal, engine
+from app.models import models  # noqa: F401 (registers the tables)
+from app.utils.metadata_cache import metadata_cache
+
+Base.metadata.create_all(bind=engine)
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    yield
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    # Deleted outside a Session, so the metadata cache wasn't told
+    metadata_cache.invalidate(Base.metadata.tables)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    # Entering runs the lifespan, which closes the async engine's connections
+    with TestClient(app) as test_client:
+        yield test_client
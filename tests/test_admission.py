@@ -0,0 +1,126 @@
+# tests/test_admission.py
+
+import ipaddress
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import dependencies
+from app.core.config import settings
+from app.dependencies import get_client_id
+from app.models.models import Job, JobStatus, JobType, Video
+from app.utils import admission
+from app.utils.admission import admit_jobs, check_admission, job_type_setting, retry_after
+
+Counts = namedtuple("Counts", "job_type queued client_open finished client_finished")
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE_LIMIT", 10)
+    monkeypatch.setattr(settings, "CLIENT_JOB_LIMIT", 5)
+    monkeypatch.setattr(settings, "ADMISSION_WINDOW_SECONDS", 600)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_RETRY_AFTER", 3600)
+    monkeypatch.setattr(admission, "QUEUE_LIMITS", {JobType.overlay: 2})
+
+def _refusal(counts, job_types) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        check_admission(counts, job_types)
+    assert error.value.status_code == 429
+    return error.value
+
+def test_job_type_setting():
+    assert job_type_setting("trim=200, overlay=50") == {JobType.trim: 200, JobType.overlay: 50}
+    assert job_type_setting("trim=1.5", float) == {JobType.trim: 1.5}
+    assert job_type_setting("") == {}
+
+def test_retry_after():
+    # 3 jobs over the limit, 60 finished per 600 s window: 30 s
+    assert retry_after(3, 60) == 30
+    assert retry_after(1, 10_000) == 1
+    assert retry_after(1000, 1) == 3600
+    assert retry_after(1, 0) == 3600
+
+def test_admits_under_the_limits():
+    check_admission([Counts(JobType.trim, 9, 4, 0, 0)], [JobType.trim])
+    check_admission([], [JobType.trim] * 5)
+
+def test_full_queue_is_refused():
+    error = _refusal([Counts(JobType.trim, 10, 0, 60, 0)], [JobType.trim])
+
+    assert "trim queue is full" in error.detail
+    assert error.headers["Retry-After"] == "10"
+
+def test_per_type_queue_limit():
+    error = _refusal([Counts(JobType.overlay, 2, 0, 0, 0)], [JobType.overlay])
+
+    assert "limit 2" in error.detail
+    assert error.headers["Retry-After"] == "3600"
+
+def test_client_limit_counts_every_job_type():
+    counts = [Counts(JobType.trim, 0, 3, 0, 0), Counts(JobType.overlay, 0, 1, 0, 0)]
+    check_admission(counts, [JobType.trim])
+
+    error = _refusal(counts, [JobType.trim, JobType.trim])
+    assert "Too many unfinished jobs" in error.detail
+
+def test_longest_retry_after_wins():
+    counts = [Counts(JobType.trim, 10, 5, 600, 6)]
+
+    error = _refusal(counts, [JobType.trim])
+
+    # Queue: 1 over at 1 job/s; client: 1 over at 1 job per 100 s
+    assert error.headers["Retry-After"] == "100"
+    assert "Too many unfinished jobs" in error.detail
+
+def test_admit_jobs_reads_the_jobs_table(db):
+    now = datetime.now(timezone.utc)
+    db.add_all(
+        [Job(job_type=JobType.trim, status=JobStatus.pending, client_id=f"client-{i}") for i in range(9)]
+        + [Job(job_type=JobType.trim, status=JobStatus.done, client_id="b", completed_at=now) for _ in range(3)]
+    )
+    db.commit()
+
+    admit_jobs(db, "b", [JobType.trim])
+    with pytest.raises(HTTPException) as error:
+        admit_jobs(db, "b", [JobType.trim] * 2)
+    # One job over the queue limit, 3 finished per 600 s window
+    assert error.value.headers["Retry-After"] == "200"
+
+def test_endpoint_answers_429_with_retry_after(db, client):
+    video = Video(filename="source.mp4")
+    db.add(video)
+    # TestClient's address; a client id header from it is not believed
+    db.add_all([Job(job_type=JobType.package, status=JobStatus.pending, client_id="testclient") for _ in range(5)])
+    db.commit()
+
+    response = client.post(
+        "/api/v1/jobs/batch",
+        json={"jobs": [{"type": "package", "video_id": video.id}]},
+        headers={settings.CLIENT_ID_HEADER: "someone-else"},
+    )
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+def _request(peer: str, headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "client": (peer, 50000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+@pytest.mark.parametrize("peer, headers, expected", [
+    ("203.0.113.7", {}, "203.0.113.7"),
+    ("203.0.113.7", {"X-Client-Id": "spoofed"}, "203.0.113.7"),
+    ("203.0.113.7", {"X-Forwarded-For": "198.51.100.1"}, "203.0.113.7"),
+    ("10.0.0.2", {"X-Client-Id": "tenant-1"}, "tenant-1"),
+    ("10.0.0.2", {"X-Forwarded-For": "spoofed, 198.51.100.1, 10.0.0.3"}, "198.51.100.1"),
+    ("10.0.0.2", {}, "10.0.0.2"),
+])
+def test_client_id_header_is_only_trusted_from_proxies(monkeypatch, peer, headers, expected):
+    monkeypatch.setattr(dependencies, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+    assert get_client_id(_request(peer, headers)) == expected
@@ -0,0 +1,98 @@
+# tests/test_artifacts.py
+
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import Artifact, ArtifactCacheStats, Job, JobStatus, JobType, Video, VideoQuality, VideoVersion
+from app.utils import ffmpeg
+from app.utils.artifacts import enforce_budget
+
+@pytest.fixture
+def export(db, tmp_path, monkeypatch):
+    """Runs a quality export of a new video, with an FFmpeg that writes 100 bytes."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "ARTIFACT_CACHE_MAX_BYTES", 150)
+    monkeypatch.setattr(ffmpeg, "video_file_path", lambda video: str(tmp_path / video.filename))
+    monkeypatch.setattr(ffmpeg, "video_media_info", lambda video, path: {"duration": 10.0})
+    monkeypatch.setattr(ffmpeg, "video_content_hash", lambda video, path: video.filename.ljust(64, "0"))
+    encodes = []
+
+    def run_ffmpeg(command, progress):
+        encodes.append(command[-1])
+        with open(command[-1], "wb") as f:
+            f.write(os.urandom(100))
+    monkeypatch.setattr(ffmpeg, "run_ffmpeg", run_ffmpeg)
+
+    def run(video: Video) -> Job:
+        (tmp_path / video.filename).write_bytes(b"source")
+        job = Job(job_type=JobType.quality_export, status=JobStatus.processing, video_id=video.id)
+        db.add(job)
+        db.commit()
+        ffmpeg.quality_export_in_background(job.id, video.id, VideoQuality.p720)
+        db.expire_all()
+        return db.get(Job, job.id)
+
+    run.encodes = encodes
+    return run
+
+def _video(db, filename: str) -> Video:
+    video = Video(filename=filename)
+    db.add(video)
+    db.commit()
+    return video
+
+def test_cache_hit_links_the_cached_file(db, export):
+    first = export(_video(db, "a.mp4"))
+    # Same content (see the fixture's content hash), different video
+    second = export(_video(db, "a.mp4"))
+
+    assert len(export.encodes) == 1
+    assert first.status == second.status == JobStatus.done
+    cached = db.query(Artifact).one().file_path
+    assert os.path.dirname(cached) == os.path.join("processed", "artifacts")
+    with open(cached, "rb") as f:
+        content = f.read()
+    with open(second.output_file, "rb") as f:
+        assert f.read() == content
+
+def test_eviction_keeps_the_outputs_of_jobs(db, export):
+    first = export(_video(db, "a.mp4"))
+    evicted = db.query(Artifact).one().file_path
+    second = export(_video(db, "b.mp4"))
+
+    # Two 100-byte artifacts over a 150-byte budget: the older one goes
+    assert not os.path.exists(evicted)
+    assert db.query(Artifact).count() == 1
+    assert db.get(ArtifactCacheStats, "quality_export").evictions == 1
+    for job in (first, second):
+        assert os.path.getsize(job.output_file) == 100
+    assert {version.file_path for version in db.query(VideoVersion)} == {first.output_file, second.output_file}
+
+def test_eviction_of_an_artifact_outside_the_cache_folder(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "ARTIFACT_CACHE_MAX_BYTES", 1)
+    os.mkdir("processed")
+    legacy = os.path.join("processed", "trimmed_1_a.mp4")
+    with open(legacy, "wb") as f:
+        f.write(b"x" * 100)
+    db.add(Artifact(fingerprint="0" * 64, operation="trim", file_path=legacy, size=100))
+    db.commit()
+
+    enforce_budget(db)
+
+    # Cached before the cache had its own folder: a video still points at it
+    assert db.query(Artifact).count() == 0
+    assert os.path.exists(legacy)
+
+def test_repeated_export_reuses_the_version(db, export):
+    video = _video(db, "a.mp4")
+
+    first = export(video)
+    second = export(video)
+
+    assert len(export.encodes) == 1
+    assert second.status == JobStatus.done
+    assert second.output_file == first.output_file
+    assert db.query(VideoVersion).count() == 1
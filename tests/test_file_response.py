@@ -0,0 +1,110 @@
+# tests/test_file_response.py
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.file_response import file_response, parse_range_header
+
+CONTENT = bytes(range(256)) * 4
+
+@pytest.fixture
+def files(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.api_route("/video", methods=["GET", "HEAD"])
+    def video(request: Request):
+        return file_response(request, path)
+
+    return TestClient(app)
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=1000-", [(1000, 1023)]),
+    ("bytes=-24", [(1000, 1023)]),
+    ("bytes=0-5000", [(0, 1023)]),
+    ("bytes=10-19,0-9,15-30", [(0, 30)]),
+    ("bytes=0-9,100-109", [(0, 9), (100, 109)]),
+    ("bytes=2000-3000", []),
+    ("bytes=-0", []),
+    ("items=0-9", None),
+    ("bytes=9-0", None),
+    ("bytes=a-b", None),
+    ("bytes=" + ",".join(["0-1"] * 17), None),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, len(CONTENT)) == expected
+
+def test_full_response(files):
+    response = files.get("/video")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "video/mp4"
+
+def test_single_range(files):
+    response = files.get("/video", headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[100:200]
+    assert response.headers["content-range"] == "bytes 100-199/1024"
+    assert response.headers["content-length"] == "100"
+
+def test_multiple_ranges(files):
+    response = files.get("/video", headers={"Range": "bytes=0-9,500-509"})
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert int(response.headers["content-length"]) == len(response.content)
+    body = response.content
+    assert body.endswith(f"\r\n--{boundary}--\r\n".encode())
+    assert b"Content-Range: bytes 0-9/1024\r\n\r\n" + CONTENT[0:10] in body
+    assert b"Content-Range: bytes 500-509/1024\r\n\r\n" + CONTENT[500:510] in body
+
+def test_unsatisfiable_range(files):
+    response = files.get("/video", headers={"Range": "bytes=5000-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+def test_malformed_range_is_ignored(files):
+    response = files.get("/video", headers={"Range": "bytes=x-y"})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_if_none_match(files):
+    etag = files.get("/video").headers["etag"]
+
+    response = files.get("/video", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert files.get("/video", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert files.get("/video", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_if_modified_since(files):
+    last_modified = files.get("/video").headers["last-modified"]
+
+    assert files.get("/video", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert files.get("/video", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+
+def test_if_range(files):
+    etag = files.get("/video").headers["etag"]
+
+    matching = files.get("/video", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert matching.status_code == 206
+    stale = files.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == CONTENT
+
+def test_head_sends_no_body(files):
+    response = files.head("/video", headers={"Range": "bytes=0-9"})
+
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "10"
+    assert response.content == b""
@@ -0,0 +1,68 @@
+# tests/test_job_cancel.py
+
+import asyncio
+
+import pytest
+
+from app.crud.job import request_cancel
+from app.database import AsyncSessionLocal, async_engine
+from app.models.models import Job, JobStatus, JobType
+
+def _add_job(db, status: JobStatus) -> int:
+    job = Job(job_type=JobType.trim, status=status, attempts=0)
+    db.add(job)
+    db.commit()
+    return job.id
+
+def _cancel(job_id: int):
+    async def run():
+        try:
+            async with AsyncSessionLocal() as session:
+                return await request_cancel(session, job_id)
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run())
+
+def test_request_cancel_of_a_queued_job(db):
+    job_id = _add_job(db, JobStatus.pending)
+
+    job = _cancel(job_id)
+
+    assert job.status == JobStatus.cancelled
+    assert job.completed_at is not None
+    assert job.cancel_requested_at is not None
+
+def test_request_cancel_of_a_running_job(db):
+    job_id = _add_job(db, JobStatus.processing)
+
+    job = _cancel(job_id)
+
+    assert job.status == JobStatus.processing
+    assert job.completed_at is None
+    assert job.cancel_requested_at is not None
+
+@pytest.mark.parametrize("status", [JobStatus.done, JobStatus.failed, JobStatus.cancelled])
+def test_request_cancel_of_a_finished_job(db, status):
+    job_id = _add_job(db, status)
+
+    assert _cancel(job_id) is None
+    db.expire_all()
+    assert db.get(Job, job_id).cancel_requested_at is None
+
+def test_cancel_endpoint(db, client):
+    job_id = _add_job(db, JobStatus.pending)
+
+    response = client.post(f"/api/v1/jobs/{job_id}/cancel")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+
+def test_cancel_endpoint_refuses_finished_jobs(db, client):
+    job_id = _add_job(db, JobStatus.done)
+
+    response = client.post(f"/api/v1/jobs/{job_id}/cancel")
+
+    assert response.status_code == 409
+
+def test_cancel_endpoint_unknown_job(client):
+    assert client.post("/api/v1/jobs/999/cancel").status_code == 404
@@ -0,0 +1,47 @@
+# tests/test_job_endpoints.py
+
+import pytest
+
+from app.models.models import Job, JobStatus, Video
+
+@pytest.fixture
+def video(db):
+    video = Video(filename="source.mp4")
+    db.add(video)
+    db.commit()
+    return video
+
+@pytest.mark.parametrize("path, body, job_type", [
+    ("trim", {"start_time": 1, "end_time": 2}, "trim"),
+    ("quality-export", {"quality": "720p"}, "quality_export"),
+    ("package", None, "package"),
+    ("previews", None, "previews"),
+])
+def test_create_job(db, client, video, path, body, job_type):
+    response = client.post(f"/api/v1/videos/{video.id}/{path}", json=body)
+
+    assert response.status_code == 201
+    job = response.json()
+    assert (job["job_type"], job["status"], job["video_id"]) == (job_type, "pending", video.id)
+    assert job["client_id"] == "testclient"
+    assert db.get(Job, job["id"]).status == JobStatus.pending
+
+@pytest.mark.parametrize("path, body", [
+    ("trim", {"start_time": 1, "end_time": 2}),
+    ("quality-export", {"quality": "720p"}),
+    ("package", None),
+    ("previews", None),
+])
+def test_create_job_for_a_missing_video(client, path, body):
+    assert client.post(f"/api/v1/videos/999/{path}", json=body).status_code == 404
+
+def test_trim_needs_start_before_end(client, video):
+    response = client.post(f"/api/v1/videos/{video.id}/trim", json={"start_time": 2, "end_time": 1})
+
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("profile, status_code", [("hevc", 201), ("mezzanine", 422), ("intermediate", 422)])
+def test_only_public_profiles_are_accepted(client, video, profile, status_code):
+    response = client.post(f"/api/v1/videos/{video.id}/quality-export", json={"quality": "720p", "profile": profile})
+
+    assert response.status_code == status_code
@@ -0,0 +1,133 @@
+# tests/test_job_events.py
+"""Every write path of a job's status or progress publishes a job event."""
+
+import asyncio
+
+import pytest
+
+from app.crud import job as crud_job
+from app.database import AsyncSessionLocal, async_engine
+from app.models.models import Job, JobStatus, JobType
+from app.utils import job_events
+from app.utils.progress import JobProgress
+
+@pytest.fixture
+def published(monkeypatch):
+    """Pretends to be on Postgres and collects what would be sent to pg_notify."""
+    events = []
+    monkeypatch.setattr(job_events, "notifies", lambda session: True)
+    monkeypatch.setattr(job_events, "_publish", lambda connection, payload: events.append(payload))
+    return events
+
+def _async(coroutine_function, *args):
+    async def run():
+        try:
+            async with AsyncSessionLocal() as session:
+                return await coroutine_function(session, *args)
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run())
+
+def _add_job(db, **fields) -> int:
+    job = Job(job_type=JobType.trim, status=JobStatus.pending, attempts=0, **fields)
+    db.add(job)
+    db.commit()
+    return job.id
+
+def test_orm_writes_publish(db, published):
+    job_id = _add_job(db)
+    assert published[-1] == {"id": job_id, "status": "pending", "progress": None, "eta_seconds": None}
+
+    crud_job.claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+    assert published[-1]["status"] == "processing"
+
+def test_progress_update_publishes(db, published):
+    job_id = _add_job(db)
+    published.clear()
+
+    progress = JobProgress(job_id, total_seconds=10.0)
+    progress.update(5.0, speed=2.0, force=True)
+
+    assert [(event["id"], event["progress"]) for event in published] == [(job_id, 50.0)]
+
+def test_release_job_publishes_final_status(db, published):
+    job_id = _add_job(db)
+    crud_job.claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+    published.clear()
+
+    status = crud_job.release_job(db, job_id, "worker-1")
+
+    assert status == JobStatus.failed
+    assert [event["status"] for event in published] == ["failed"]
+
+def test_release_job_requeue_publishes(db, published):
+    job_id = _add_job(db)
+    crud_job.claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+    published.clear()
+
+    assert crud_job.release_job(db, job_id, "worker-1", requeue=True) == JobStatus.pending
+    assert [event["status"] for event in published] == ["pending"]
+
+def test_release_job_of_another_worker_publishes_nothing(db, published):
+    job_id = _add_job(db)
+    crud_job.claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+    published.clear()
+
+    assert crud_job.release_job(db, job_id, "worker-2") is None
+    assert published == []
+
+def test_request_cancel_publishes(db, published):
+    job_id = _add_job(db)
+    published.clear()
+
+    job = _async(crud_job.request_cancel, job_id)
+
+    assert job.status == JobStatus.cancelled
+    assert [event["status"] for event in published] == ["cancelled"]
+
+def test_enqueue_jobs_publishes(published):
+    jobs = _async(crud_job.enqueue_jobs, [{"job_type": JobType.trim}, {"job_type": JobType.overlay}])
+
+    assert [event["id"] for event in published] == [job.id for job in jobs]
+    assert {event["status"] for event in published} == {"pending"}
+
+def test_not_published_without_postgres(db, monkeypatch):
+    events = []
+    monkeypatch.setattr(job_events, "_publish", lambda connection, payload: events.append(payload))
+    job_id = _add_job(db)
+    crud_job.release_job(db, job_id, "worker-1")
+    assert events == []
+
+def test_cancel_endpoint_publishes_once(db, client, published, monkeypatch):
+    local = []
+    monkeypatch.setattr(job_events.job_events, "publish", local.append)
+    job_id = _add_job(db)
+    published.clear()
+
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel").status_code == 200
+
+    assert [event["status"] for event in published] == ["cancelled"]
+    assert local == []
+
+class _Stop(BaseException):
+    pass
+
+def test_listen_is_retried_with_backoff(monkeypatch):
+    hub = job_events.JobEventHub()
+    attempts, delays = [], []
+
+    def listen():
+        attempts.append(1)
+        if len(attempts) == 4:
+            raise _Stop
+        raise ConnectionError("connection lost")
+
+    monkeypatch.setattr(job_events.engine.dialect, "name", "postgresql")
+    monkeypatch.setattr(hub, "_listen", listen)
+    monkeypatch.setattr(hub, "_poll", lambda: pytest.fail("fell back to polling"))
+    monkeypatch.setattr(job_events.time, "sleep", delays.append)
+
+    with pytest.raises(_Stop):
+        hub._run()
+
+    assert delays == [1, 2, 4]
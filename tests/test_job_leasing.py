@@ -0,0 +1,128 @@
+# tests/test_job_leasing.py
+
+from datetime import datetime, timedelta, timezone
+
+from app.crud.job import claim_next_job, reap_expired_jobs, release_job, renew_leases
+from app.models.models import Job, JobStatus, JobType
+
+def _add_job(db, **fields) -> int:
+    job = Job(job_type=JobType.trim, **{"status": JobStatus.pending, "attempts": 0, **fields})
+    db.add(job)
+    db.commit()
+    return job.id
+
+def _ago(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+def _job(db, job_id) -> Job:
+    db.expire_all()
+    return db.get(Job, job_id)
+
+def test_claim_takes_the_oldest_pending_job(db):
+    first = _add_job(db)
+    _add_job(db)
+
+    job = claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+
+    assert job.id == first
+    assert job.status == JobStatus.processing
+    assert job.worker_id == "worker-1"
+    assert job.attempts == 1
+    assert job.lease_expires_at is not None
+
+def test_claim_returns_none_when_queue_is_empty(db):
+    _add_job(db, status=JobStatus.done)
+    assert claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3) is None
+
+def test_claim_serves_the_client_with_fewest_running_jobs(db):
+    _add_job(db, client_id="busy", status=JobStatus.processing, worker_id="w", lease_expires_at=_ago(-60))
+    _add_job(db, client_id="busy")
+    idle = _add_job(db, client_id="idle")
+
+    assert claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3).id == idle
+
+def test_claim_takes_over_an_expired_lease(db):
+    job_id = _add_job(db, status=JobStatus.processing, worker_id="dead", lease_expires_at=_ago(5), attempts=1)
+    _add_job(db, status=JobStatus.processing, worker_id="alive", lease_expires_at=_ago(-60), attempts=1)
+
+    job = claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+
+    assert job.id == job_id
+    assert job.worker_id == "worker-1"
+    assert job.attempts == 2
+
+def test_claim_skips_expired_lease_of_a_cancelled_job(db):
+    _add_job(db, status=JobStatus.processing, worker_id="dead", lease_expires_at=_ago(5),
+             attempts=1, cancel_requested_at=_ago(10))
+    assert claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3) is None
+
+def test_claim_fails_a_job_out_of_attempts(db):
+    exhausted = _add_job(db, status=JobStatus.processing, worker_id="dead", lease_expires_at=_ago(5), attempts=3)
+    next_id = _add_job(db)
+
+    assert claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3).id == next_id
+    job = _job(db, exhausted)
+    assert job.status == JobStatus.failed
+    assert job.completed_at is not None
+    assert job.worker_id is None
+
+def test_renew_leases_only_extends_own_jobs(db):
+    own = _add_job(db, status=JobStatus.processing, worker_id="worker-1", lease_expires_at=_ago(-1))
+    other = _add_job(db, status=JobStatus.processing, worker_id="worker-2", lease_expires_at=_ago(-1))
+
+    assert renew_leases(db, "worker-1", [own, other], lease_seconds=60) == 1
+
+def test_release_marks_an_unfinished_job_failed(db):
+    job_id = _add_job(db)
+    claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+
+    assert release_job(db, job_id, "worker-1", queue_seconds=1.5) == JobStatus.failed
+    job = _job(db, job_id)
+    assert job.lease_expires_at is None
+    assert job.completed_at is not None
+    assert job.queue_seconds == 1.5
+
+def test_release_keeps_a_final_status(db):
+    job_id = _add_job(db)
+    claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+    job = _job(db, job_id)
+    job.status = JobStatus.done
+    db.commit()
+
+    stats = {"stages": {"total": 2.0, "ffmpeg": 1.5}, "cpu_seconds": 1.0, "max_rss_bytes": 1024}
+    assert release_job(db, job_id, "worker-1", stats=stats) == JobStatus.done
+    job = _job(db, job_id)
+    assert (job.run_seconds, job.ffmpeg_seconds, job.max_rss_bytes) == (2.0, 1.5, 1024)
+
+def test_release_requeues(db):
+    job_id = _add_job(db)
+    claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+
+    assert release_job(db, job_id, "worker-1", requeue=True) == JobStatus.pending
+    job = _job(db, job_id)
+    assert job.completed_at is None
+    assert job.attempts == 1
+
+def test_release_by_another_worker_is_ignored(db):
+    job_id = _add_job(db)
+    claim_next_job(db, "worker-1", lease_seconds=60, max_attempts=3)
+
+    assert release_job(db, job_id, "worker-2") is None
+    assert _job(db, job_id).status == JobStatus.processing
+
+def test_reap_settles_expired_jobs(db):
+    requeued = _add_job(db, status=JobStatus.processing, worker_id="dead", lease_expires_at=_ago(5), attempts=1)
+    exhausted = _add_job(db, status=JobStatus.processing, worker_id="dead", lease_expires_at=_ago(5), attempts=3)
+    cancelled = _add_job(db, status=JobStatus.processing, worker_id="dead", lease_expires_at=_ago(5),
+                         attempts=1, cancel_requested_at=_ago(10))
+    alive = _add_job(db, status=JobStatus.processing, worker_id="alive", lease_expires_at=_ago(-60), attempts=1)
+
+    reaped = reap_expired_jobs(db, max_attempts=3)
+
+    assert {job.id for job in reaped} == {requeued, exhausted, cancelled}
+    assert _job(db, requeued).status == JobStatus.pending
+    assert _job(db, requeued).completed_at is None
+    assert _job(db, exhausted).status == JobStatus.failed
+    assert _job(db, cancelled).status == JobStatus.cancelled
+    assert _job(db, cancelled).worker_id is None
+    assert _job(db, alive).status == JobStatus.processing
@@ -0,0 +1,93 @@
+# tests/test_metadata_cache.py
+
+import time
+
+from sqlalchemy import update
+
+from app.models.models import Job, JobStatus, JobType
+from app.utils.metadata_cache import CacheEntry, MetadataCache, metadata_cache
+
+def _put(cache: MetadataCache, key, tables=("jobs",), settled=False) -> CacheEntry:
+    entry = CacheEntry(repr(key).encode(), settled=settled)
+    cache.put(key, entry, cache.generations(tables))
+    return entry
+
+def test_hit_until_a_table_is_written():
+    cache = MetadataCache(ttl=60, max_entries=10)
+    entry = _put(cache, ("job", 1))
+    _put(cache, ("video", 1), tables=("videos",))
+
+    assert cache.get(("job", 1)) is entry
+    cache.invalidate({"jobs"})
+    assert cache.get(("job", 1)) is None
+    assert cache.get(("video", 1)) is not None
+
+def test_write_during_the_read_invalidates():
+    cache = MetadataCache(ttl=60, max_entries=10)
+    generations = cache.generations(("jobs",))
+    cache.invalidate({"jobs"})
+    cache.put(("job", 1), CacheEntry(b"stale"), generations)
+
+    assert cache.get(("job", 1)) is None
+
+def test_ttl_expires_unsettled_entries():
+    cache = MetadataCache(ttl=0.01, max_entries=10)
+    _put(cache, ("job", 1))
+    settled = _put(cache, ("job", 2), settled=True)
+    time.sleep(0.02)
+
+    assert cache.get(("job", 1)) is None
+    cache.invalidate({"jobs"})
+    assert cache.get(("job", 2)) is settled
+
+def test_least_recently_used_entry_is_dropped():
+    cache = MetadataCache(ttl=60, max_entries=2)
+    _put(cache, ("job", 1))
+    _put(cache, ("job", 2))
+    cache.get(("job", 1))
+    _put(cache, ("job", 3))
+
+    assert cache.get(("job", 2)) is None
+    assert cache.get(("job", 1)) is not None
+    assert cache.get(("job", 3)) is not None
+
+def test_session_commits_invalidate_written_tables(db):
+    before = metadata_cache.generations(("jobs", "videos"))
+
+    job = Job(job_type=JobType.trim, status=JobStatus.pending)
+    db.add(job)
+    db.commit()
+    after_insert = metadata_cache.generations(("jobs", "videos"))
+    assert after_insert["jobs"] > before["jobs"]
+    assert after_insert["videos"] == before["videos"]
+
+    db.execute(update(Job).where(Job.id == job.id).values(progress=50.0))
+    db.commit()
+    assert metadata_cache.generations(("jobs",))["jobs"] > after_insert["jobs"]
+
+def test_rolled_back_writes_do_not_invalidate(db):
+    before = metadata_cache.generations(("jobs",))
+
+    db.add(Job(job_type=JobType.trim, status=JobStatus.pending))
+    db.flush()
+    db.rollback()
+
+    assert metadata_cache.generations(("jobs",)) == before
+
+def test_job_endpoint_etag_and_invalidation(db, client):
+    job = Job(job_type=JobType.trim, status=JobStatus.pending)
+    db.add(job)
+    db.commit()
+
+    first = client.get(f"/api/v1/jobs/{job.id}")
+    assert first.headers["x-cache"] == "MISS"
+    cached = client.get(f"/api/v1/jobs/{job.id}", headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["x-cache"] == "HIT"
+
+    job.status = JobStatus.processing
+    db.commit()
+    changed = client.get(f"/api/v1/jobs/{job.id}", headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.headers["x-cache"] == "MISS"
+    assert changed.json()["status"] == "processing"
@@ -0,0 +1,36 @@
+# tests/test_metrics.py
+
+from prometheus_client import CollectorRegistry, generate_latest
+from sqlalchemy.exc import OperationalError
+
+from app.models.models import Job, JobStatus, JobType
+from app.utils import metrics
+from app.utils.metrics import JobQueueCollector
+
+def test_job_queue_collector_counts_jobs(db):
+    db.add_all([
+        Job(job_type=JobType.trim, status=JobStatus.pending),
+        Job(job_type=JobType.trim, status=JobStatus.processing),
+        Job(job_type=JobType.trim, status=JobStatus.done),
+    ])
+    db.commit()
+    registry = CollectorRegistry()
+    registry.register(JobQueueCollector())
+
+    assert registry.get_sample_value("jobs_queued", {"job_type": "trim"}) == 1
+    assert registry.get_sample_value("jobs_in_flight", {"job_type": "trim"}) == 1
+
+def test_job_queue_collector_without_database(monkeypatch):
+    class Unavailable:
+        def query(self, *entities):
+            raise OperationalError("SELECT", {}, Exception("connection refused"))
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(metrics, "SessionLocal", Unavailable)
+    registry = CollectorRegistry()
+    # Registering must not touch the database, nor must a scrape fail
+    registry.register(JobQueueCollector())
+
+    assert b"jobs_queued" not in generate_latest(registry)
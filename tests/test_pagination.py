@@ -0,0 +1,74 @@
+# tests/test_pagination.py
+
+import base64
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from app.models.models import Video
+from app.utils.pagination import decode_cursor, encode_cursor, paginate
+
+def _request(query: str = "") -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "path": "/api/v1/videos/",
+        "query_string": query.encode(),
+        "headers": [],
+    })
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'{"page": 2}').decode(),
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"id": "x"}').decode(),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def test_paginate_last_page():
+    response = Response()
+    rows = [{"id": 1}, {"id": 2}]
+
+    assert paginate(rows, 2, _request(), response) == rows
+    assert "X-Next-Cursor" not in response.headers
+    assert "Link" not in response.headers
+
+def test_paginate_advertises_next_page():
+    response = Response()
+    rows = [{"id": 1}, {"id": 2}, {"id": 3}]
+
+    assert paginate(rows, 2, _request("limit=2&cursor=old"), response) == rows[:2]
+    cursor = response.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor) == 2
+    assert response.headers["Link"] == (
+        f'<http://testserver/api/v1/videos/?limit=2&cursor={cursor}>; rel="next"'
+    )
+
+def test_video_listing_walks_every_page(db, client):
+    db.add_all([Video(filename=f"video{i}.mp4") for i in range(5)])
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/videos/", params=params)
+        assert response.status_code == 200
+        ids += [video["id"] for video in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert ids == sorted(video.id for video in db.query(Video))
+    assert client.get("/api/v1/videos/", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,87 @@
+# tests/test_quality_export.py
+
+import os
+import subprocess
+
+import pytest
+
+from app.models.models import Job, JobStatus, JobType, Video, VideoQuality, VideoVersion
+from app.utils import ffmpeg
+
+@pytest.fixture
+def export_job(db, tmp_path, monkeypatch):
+    """A two-quality export job whose source needs no FFmpeg to inspect."""
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"video")
+    monkeypatch.setattr(ffmpeg, "video_file_path", lambda video: str(source))
+    monkeypatch.setattr(ffmpeg, "video_media_info", lambda video, path: {"duration": 10.0})
+    monkeypatch.setattr(ffmpeg, "display_size", lambda info: (None, None))
+    monkeypatch.setattr(ffmpeg, "video_content_hash", lambda video, path: "0" * 64)
+
+    video = Video(filename="source.mp4")
+    db.add(video)
+    db.flush()
+    job = Job(job_type=JobType.quality_export, status=JobStatus.processing, video_id=video.id)
+    db.add(job)
+    db.commit()
+    return job.id, video.id
+
+def _statuses(db, job_id):
+    db.expire_all()
+    versions = db.query(VideoVersion).filter(VideoVersion.job_id == job_id).all()
+    return db.get(Job, job_id).status, {version.status for version in versions}
+
+def test_runtime_error_fails_versions(db, export_job, monkeypatch):
+    job_id, video_id = export_job
+    def run_ffmpeg(command, progress):
+        raise RuntimeError("encoder vanished")
+    monkeypatch.setattr(ffmpeg, "run_ffmpeg", run_ffmpeg)
+
+    ffmpeg.multi_quality_export_in_background(job_id, video_id, [VideoQuality.p720, VideoQuality.p480])
+
+    assert _statuses(db, job_id) == (JobStatus.failed, {JobStatus.failed})
+
+def test_unexpected_error_fails_versions_and_propagates(db, export_job, monkeypatch):
+    job_id, video_id = export_job
+    def run_ffmpeg(command, progress):
+        raise ValueError("unexpected")
+    monkeypatch.setattr(ffmpeg, "run_ffmpeg", run_ffmpeg)
+
+    with pytest.raises(ValueError):
+        ffmpeg.multi_quality_export_in_background(job_id, video_id, [VideoQuality.p720, VideoQuality.p480])
+
+    assert _statuses(db, job_id) == (JobStatus.failed, {JobStatus.failed})
+
+def test_failed_run_keeps_the_finished_renditions(db, export_job, monkeypatch):
+    job_id, video_id = export_job
+    def run_ffmpeg(command, progress):
+        # The 720p branch got written in full, the 480p one only partly
+        for arg in command:
+            if arg.startswith("processed"):
+                with open(arg, "wb") as f:
+                    f.write(b"video")
+        raise subprocess.CalledProcessError(1, command)
+    monkeypatch.setattr(ffmpeg, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(ffmpeg, "probe_media", lambda path: {"duration": 10.0 if "720p" in path else 4.0})
+
+    ffmpeg.multi_quality_export_in_background(job_id, video_id, [VideoQuality.p720, VideoQuality.p480])
+
+    db.expire_all()
+    versions = {version.quality: version for version in db.query(VideoVersion).filter(VideoVersion.job_id == job_id)}
+    assert versions[VideoQuality.p720].status == JobStatus.done
+    assert os.path.exists(versions[VideoQuality.p720].file_path)
+    assert versions[VideoQuality.p480].status == JobStatus.failed
+    assert not os.path.exists(versions[VideoQuality.p480].file_path)
+    assert db.get(Job, job_id).status == JobStatus.failed
+
+def test_single_quality_probe_failure_fails_the_job(db, export_job, monkeypatch):
+    job_id, video_id = export_job
+    def video_media_info(video, path):
+        raise RuntimeError("Failed to probe")
+    monkeypatch.setattr(ffmpeg, "video_media_info", video_media_info)
+
+    ffmpeg.quality_export_in_background(job_id, video_id, VideoQuality.p720)
+
+    db.expire_all()
+    assert db.get(Job, job_id).status == JobStatus.failed
@@ -0,0 +1,76 @@
+# tests/test_uploads.py
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.api.endpoints import uploads
+from app.models.models import Job, UploadSession, UploadStatus
+
+DATA = b"chunked upload test data"
+
+@pytest.fixture(autouse=True)
+def upload_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_FOLDER", tmp_path)
+    monkeypatch.setattr(uploads, "PARTIAL_FOLDER", tmp_path / ".partial")
+    (tmp_path / ".partial").mkdir()
+    monkeypatch.setattr(uploads, "_hashers", {})
+    monkeypatch.setattr(uploads, "_last_expired", 0.0)
+
+def _upload(client, sha256=None) -> str:
+    response = client.post("/api/v1/uploads/", json={"filename": "a.mp4", "size": len(DATA), "sha256": sha256})
+    session_id = response.json()["id"]
+    response = client.put(
+        f"/api/v1/uploads/{session_id}", content=DATA,
+        headers={"Content-Range": f"bytes 0-{len(DATA) - 1}/{len(DATA)}"}
+    )
+    assert response.json()["received_bytes"] == len(DATA)
+    return session_id
+
+def test_complete_without_the_hasher_hashes_the_file(client):
+    session_id = _upload(client, hashlib.sha256(DATA).hexdigest())
+    uploads._hashers.clear() # The chunks went to another API process
+
+    response = client.post(f"/api/v1/uploads/{session_id}/complete")
+
+    assert response.status_code == 201
+    assert (uploads.UPLOAD_FOLDER / f"temp_upload_{session_id}_a.mp4").read_bytes() == DATA
+
+def test_checksum_mismatch_releases_the_session(db, client):
+    session_id = _upload(client, "0" * 64)
+
+    assert client.post(f"/api/v1/uploads/{session_id}/complete").status_code == 422
+
+    assert db.get(UploadSession, session_id).status == UploadStatus.uploading
+    assert uploads._partial_path(session_id).exists()
+
+def test_complete_while_another_completes(db, client):
+    session_id = _upload(client)
+    db.get(UploadSession, session_id).status = UploadStatus.completed
+    db.commit()
+
+    assert client.post(f"/api/v1/uploads/{session_id}/complete").status_code == 409
+
+def test_complete_again_returns_the_job(db, client):
+    session_id = _upload(client)
+    job_id = client.post(f"/api/v1/uploads/{session_id}/complete").json()["id"]
+
+    response = client.post(f"/api/v1/uploads/{session_id}/complete")
+
+    assert response.json()["id"] == job_id
+    assert db.query(Job).count() == 1
+
+def test_abandoned_sessions_expire(db, client):
+    session_id = _upload(client)
+    db.get(UploadSession, session_id).updated_at = datetime.now(timezone.utc) - timedelta(days=2)
+    db.commit()
+    assert session_id in uploads._hashers
+    uploads._last_expired = 0.0 # The first POST swept already
+
+    client.post("/api/v1/uploads/", json={"filename": "b.mp4", "size": 10})
+
+    db.expire_all()
+    assert db.get(UploadSession, session_id) is None
+    assert not uploads._partial_path(session_id).exists()
+    assert session_id not in uploads._hashers